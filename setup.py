@@ -29,6 +29,7 @@ setup(
     license='Apache Software License',
     author='Yoram Shamir',
     install_requires=install_requires,
+    extras_require={'numpy': ['numpy']},
     author_email='yoram@ignissoft.com',
     description='Python OO API package to automate Xena traffic generator',
     long_description=read('README.md'),
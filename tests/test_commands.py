@@ -0,0 +1,428 @@
+"""
+Commands sequences tests that do not require chassis - objects are created under fake chassis with recording API.
+
+@author yoram@ignissoft.com
+"""
+
+import logging
+from collections import OrderedDict
+
+import pytest
+
+from trafficgenerator.tgn_object import TgnObject
+from xenavalkyrie import xena_app
+from xenavalkyrie.xena_app import XenaSession, XenaChassis, XenaModule
+from xenavalkyrie.xena_chimera_module import XenaChimeraModule
+from xenavalkyrie.xena_chimera_port import XenaChimeraPort
+from xenavalkyrie.xena_inventory_cache import XenaInventoryCache
+from xenavalkyrie.xena_object import XenaReservationError
+from xenavalkyrie.xena_port import XenaPort, XenaPortCapabilities, XenaDatasetSource
+from xenavalkyrie.xena_stream import XenaStream, XenaStreamState, XenaModifierType, XenaModifierAction
+from xenavalkyrie.xena_stream import XenaModifier, XenaXModifier
+from xenavalkyrie.xena_filter import XenaFilter
+
+
+class _FakeRestApi(object):
+    """ Records all create and set commands, answers queries from attributes dictionary {(ref, attribute): value} that
+        is also updated by set_attributes and info/config queries from infos dictionary {ref: {attribute: value}}.
+        Batches of queries and commands are also recorded, as lists of (ref, command, arguments...) tuples.
+    """
+
+    def __init__(self):
+        self.commands = []
+        self.batches = []
+        self.attributes = {}
+        self.infos = {}
+
+    def connect(self, owner):
+        pass
+
+    def add_chassis(self, chassis):
+        pass
+
+    def create(self, obj):
+        self.commands.append((obj.ref, 'create'))
+
+    def send_command(self, obj, command, *arguments):
+        self.commands.append((obj.ref, command) + arguments)
+
+    def set_attributes(self, obj, **attributes):
+        for attribute, value in attributes.items():
+            self.commands.append((obj.ref, attribute, value))
+            self.attributes[(obj.ref, attribute)] = str(value)
+
+    def send_commands(self, commands):
+        self.batches.append([(c[0].ref,) + tuple(c[1:]) for c in commands])
+        for command in commands:
+            self.send_command(*command)
+        return ['<OK>'] * len(commands)
+
+    def get_attribute(self, obj, attribute):
+        return self.attributes.get((obj.ref, attribute), '')
+
+    def get_attribute_multi(self, queries):
+        self.batches.append([(obj.ref, attribute) for obj, attribute in queries])
+        return [self.get_attribute(obj, attribute) for obj, attribute in queries]
+
+    def get_attributes(self, obj):
+        return dict(self.infos.get(obj.ref, {}))
+
+    def get_attributes_multi(self, objs):
+        return [self.get_attributes(obj) for obj in objs]
+
+
+class _FakeClock(object):
+    """ Monotonic clock that advances by tick on each read and by the requested seconds on sleep. """
+
+    def __init__(self, tick=0.001):
+        self.now = 100.0
+        self.tick = tick
+
+    def __call__(self):
+        self.now += self.tick
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def _port_capabilities(**values):
+    """ :return: p_capabilities value with the requested capabilities values, all other capabilities are 0. """
+    capabilities = XenaPortCapabilities()
+    capabilities.values.update(values)
+    return ' '.join(' '.join(str(v) for v in value) if hasattr(value, '__iter__') else str(value) for
+                    value in capabilities.values.values())
+
+
+class _FakeChassis(TgnObject):
+
+    def __init__(self, api):
+        super(self.__class__, self).__init__(objRef='chassis', objType='chassis', parent=None, name='chassis')
+        self.api = api
+        self.logger = logging.getLogger('test_commands')
+        self.session = None
+        self.chassis = self
+
+
+class TestXenaCommands(object):
+
+    def setup_method(self, method):
+        self.rest = _FakeRestApi()
+        self.session = XenaSession(logging.getLogger('test_commands'), 'test', self.rest)
+        self.port = XenaPort(_FakeChassis(self.rest), '0/0')
+
+    def test_add_dataset_rest(self):
+        self.port._capabilities = XenaPortCapabilities()
+        self.port._capabilities.values['maxdatasets'] = 2
+        dataset = self.port.add_dataset(XenaDatasetSource.latency, tpld_id=3, start=0, step=100, buckets=16)
+        assert(self.rest.commands == [(dataset.ref, 'create'),
+                                      (dataset.ref, 'pd_source', 'RX_LAT', 'TGT', 3),
+                                      (dataset.ref, 'pd_range', 0, 100, 16),
+                                      (dataset.ref, 'pd_enable', 'on')])
+
+    def test_add_streams_rest(self):
+        self.rest.attributes[(self.port.ref, 'ps_indices')] = '0'
+        self.rest.attributes[(self.port.ref + '/stream/0', 'ps_tpldid')] = '0'
+        XenaStream.next_tpld_id = 0
+        streams = self.port.add_streams([{'name': 'first', 'attributes': [('ps_ratepps', 1000)]},
+                                         {'name': 'second', 'tpld_id': 7, 'state': XenaStreamState.disabled}])
+        assert([s.index for s in streams] == ['0/0/1', '0/0/2'])
+        first, second = [s.ref for s in streams]
+        assert(self.rest.commands == [(first, 'create'), (second, 'create'),
+                                      (first, 'ps_comment', '"first"'), (first, 'ps_tpldid', 1),
+                                      (first, 'ps_ratepps', 1000), (first, 'ps_enable', 'ON'),
+                                      (second, 'ps_comment', '"second"'), (second, 'ps_tpldid', 7),
+                                      (second, 'ps_enable', 'OFF')])
+        assert(XenaStream.next_tpld_id == 8)
+
+    def test_remove_modifier_rest(self):
+        stream = XenaStream(parent=self.port, index='0/0/0')
+        self.rest.attributes[(stream.ref, 'ps_modifiercount')] = '3'
+        for index, (modifier_value, range_value) in enumerate([('0 0xFFFF0000 INC 1', '0 1 10'),
+                                                               ('2 0xFF000000 DEC 2', '0 2 20'),
+                                                               ('4 0x00FF0000 RANDOM 1', '')]):
+            modifier_ref = '{}/modifier/{}'.format(stream.ref, index)
+            self.rest.attributes[(modifier_ref, 'ps_modifier')] = modifier_value
+            self.rest.attributes[(modifier_ref, 'ps_modifierrange')] = range_value
+        assert(len(stream.modifiers) == 3)
+
+        stream.remove_modifier(1)
+        modifiers = stream.modifiers
+        assert(len(modifiers) == 2)
+        assert(modifiers[0].get_values() == {'position': 0, 'mask': '0xffff0000',
+                                             'action': XenaModifierAction.increment, 'repeat': 1,
+                                             'min_val': 0, 'step': 1, 'max_val': 10})
+        assert(modifiers[1].position == 4)
+        assert(modifiers[1].action == XenaModifierAction.random)
+        assert([c for c in self.rest.commands if c[1] in ('create', 'ps_modifiercount')] ==
+               [(stream.ref, 'ps_modifiercount', 0), (modifiers[0].ref, 'create'), (modifiers[1].ref, 'create')])
+        assert(self.rest.attributes[(modifiers[1].ref, 'ps_modifier')] == '4 0xff0000 RANDOM 1')
+
+    def test_set_modifiers_rest(self):
+        stream = XenaStream(parent=self.port, index='0/0/0')
+        self.rest.attributes[(stream.ref, 'ps_modifierextcount')] = '2'
+        for index in range(2):
+            xmodifier_ref = '{}/xmodifier/{}'.format(stream.ref, index)
+            self.rest.attributes[(xmodifier_ref, 'ps_modifierext')] = '0 0xFFFFFFFF INC 1'
+            self.rest.attributes[(xmodifier_ref, 'ps_modifierextrange')] = '0 1 4294967295'
+        xmodifiers = stream.set_modifiers([{'position': 4, 'max_val': 100000}], XenaModifierType.extended)
+        assert(list(xmodifiers) == [0])
+        assert([c for c in self.rest.commands if c[1] in ('create', 'ps_modifierextcount')] ==
+               [(stream.ref, 'ps_modifierextcount', 0), (xmodifiers[0].ref, 'create')])
+        assert(self.rest.attributes[(xmodifiers[0].ref, 'ps_modifierext')] == '4 0xffffffff INC 1')
+        assert(self.rest.attributes[(xmodifiers[0].ref, 'ps_modifierextrange')] == '0 1 100000')
+
+    def test_modifiers_default_values(self):
+        stream = XenaStream(parent=self.port, index='0/0/0')
+        modifier = XenaModifier(stream, index='0/0/0/0')
+        modifier.set_values(position=2)
+        assert(modifier.get_attributes_values() == [('ps_modifier', '2 0xffff0000 INC 1'),
+                                                     ('ps_modifierrange', '0 1 65535')])
+        xmodifier = XenaXModifier(stream, index='0/0/0/0')
+        xmodifier.set_values(position=2)
+        assert(xmodifier.get_attributes_values() == [('ps_modifierext', '2 0xffffffff INC 1'),
+                                                      ('ps_modifierextrange', '0 1 4294967295')])
+
+    def test_modifiers_unknown_values(self):
+        modifier = XenaModifier(XenaStream(parent=self.port, index='0/0/1'), index='0/0/1/0')
+        with pytest.raises(ValueError) as error:
+            modifier.set_values(position=2, max_value=100)
+        assert('max_value' in str(error.value))
+        stream = XenaStream(parent=self.port, index='0/0/0')
+        self.rest.attributes[(stream.ref, 'ps_modifiercount')] = '0'
+        with pytest.raises(ValueError):
+            stream.add_modifier(postion=2)
+        with pytest.raises(ValueError):
+            stream.set_modifiers([{'position': 2}, {'mask': '0xff000000', 'steps': 2}])
+        assert(stream.get_objects_by_type('modifier') == [])
+        assert(self.rest.commands == [])
+
+    def test_update_tplds(self):
+        self.rest.attributes[(self.port.ref, 'pr_tplds')] = '1 3'
+        tplds = self.port.tplds
+        assert(sorted(tplds) == [1, 3])
+        self.rest.attributes[(self.port.ref, 'pr_tplds')] = '3 5'
+        current_tplds = self.port.tplds
+        assert(sorted(current_tplds) == [3, 5])
+        assert(current_tplds[3] is tplds[3])
+        assert(current_tplds[5].index == '0/0/5')
+        assert(self.port.get_objects_by_type('tpld') == [tplds[3], current_tplds[5]])
+        assert(self.port.update_tplds('') == {})
+        assert(self.port.get_objects_by_type('tpld') == [])
+
+    def test_read_objects_names(self):
+        streams = [XenaStream(parent=self.port, index='0/0/{}'.format(i), name=None) for i in range(3)]
+        xena_filter = XenaFilter(parent=self.port, index='0/0/0', name=None)
+        for stream, comment, tpld_id in zip(streams, ['first', '', 'third'], ['7', '1', '']):
+            self.rest.attributes[(stream.ref, 'ps_comment')] = comment
+            self.rest.attributes[(stream.ref, 'ps_tpldid')] = tpld_id
+        self.rest.attributes[(xena_filter.ref, 'pf_comment')] = 'filter'
+        XenaStream.next_tpld_id = 3
+        XenaPort._read_objects_names(streams + [xena_filter])
+        assert(self.rest.batches == [[(s.ref, a) for s in streams for a in ['ps_comment', 'ps_tpldid']] +
+                                     [(xena_filter.ref, 'pf_comment')]])
+        assert([s.name for s in streams] == ['first', None, 'third'])
+        assert(xena_filter.name == 'filter')
+        assert([s.tpld_id for s in streams] == [7, 1, -1])
+        assert(len(self.rest.batches) == 1)
+        assert(XenaStream.next_tpld_id == 8)
+
+    def test_revalidate_inventory_module_swap(self):
+        chassis = self._chassis_inventory({0: ('Odin-10G', 2), 1: ('Odin-10G', 2)})
+        module_0 = chassis.modules[0]
+        ports_0 = dict(module_0.ports)
+        self._set_module(chassis, 1, 'Chimera-100G', 1)
+        chassis.revalidate_inventory()
+        assert(chassis.modules[0] is module_0)
+        assert(module_0.ports == ports_0)
+        assert(type(chassis.modules[1]) is XenaChimeraModule)
+        assert(chassis.modules[1].m_name == 'Chimera-100G')
+        assert(list(chassis.modules[1].ports) == [0])
+        assert(type(chassis.modules[1].ports[0]) is XenaChimeraPort)
+
+    def test_inventory_chimera_ports(self):
+        chassis = self._chassis_inventory({0: ('Odin-10G', 1), 1: ('Chimera-100G', 2)})
+        assert([type(p) for p in chassis.modules[0].ports.values()] == [XenaPort])
+        assert([type(p) for p in chassis.modules[1].ports.values()] == [XenaChimeraPort, XenaChimeraPort])
+        assert(type(chassis.reserve_ports(['1/1'], reset=False)['1.1.1.1/1/1']) is XenaChimeraPort)
+
+        snapshot = XenaInventoryCache.snapshot(chassis)
+        cached_chassis = XenaChassis(chassis.session, '2.2.2.2')
+        cached_chassis._build_inventory(snapshot)
+        assert(type(cached_chassis.modules[1]) is XenaChimeraModule)
+        assert([type(p) for p in cached_chassis.modules[1].ports.values()] == [XenaChimeraPort, XenaChimeraPort])
+
+    def test_refresh_inventory_module_swap(self):
+        chassis = self._chassis_inventory({0: ('Odin-10G', 2), 1: ('Odin-10G', 2)})
+        module_0, module_1 = chassis.modules[0], chassis.modules[1]
+        ports_0 = dict(module_0.ports)
+        self._set_module(chassis, 1, 'Chimera-100G', 2)
+        changes = chassis.refresh_inventory()
+        assert(chassis.modules[0] is module_0)
+        assert(module_0.ports == ports_0)
+        assert(type(chassis.modules[1]) is XenaChimeraModule)
+        assert([type(p) for p in chassis.modules[1].ports.values()] == [XenaChimeraPort, XenaChimeraPort])
+        assert(changes['removed'] == [module_1])
+        assert(changes['added'] == [chassis.modules[1]] + list(chassis.modules[1].ports.values()))
+        assert(changes['updated'] == [])
+
+    def test_refresh_inventory_port_count(self):
+        chassis = self._chassis_inventory({0: ('Odin-10G', 4), 1: ('Odin-10G', 2)})
+        module_0, module_1 = chassis.modules[0], chassis.modules[1]
+        ports_0, ports_1 = dict(module_0.ports), dict(module_1.ports)
+        self._set_module(chassis, 0, 'Odin-10G', 2)
+        self._set_module(chassis, 1, 'Odin-10G', 3)
+        changes = chassis.refresh_inventory()
+        assert(chassis.modules == {0: module_0, 1: module_1})
+        assert(module_0.ports == {0: ports_0[0], 1: ports_0[1]})
+        assert(module_1.ports[0] is ports_1[0] and module_1.ports[1] is ports_1[1])
+        assert(changes['removed'] == [ports_0[2], ports_0[3]])
+        assert(changes['added'] == [module_1.ports[2]])
+        assert(changes['updated'] == [module_0, module_1])
+
+    def test_refresh_inventory_modules_added_removed(self):
+        chassis = self._chassis_inventory({0: ('Odin-10G', 2), 1: ('Odin-10G', 2)})
+        module_0, module_1 = chassis.modules[0], chassis.modules[1]
+        ports_0 = dict(module_0.ports)
+        self._set_module(chassis, 1, 'Odin-10G', 0)
+        self._set_module(chassis, 2, 'Odin-10G', 1)
+        changes = chassis.refresh_inventory()
+        assert(sorted(chassis.modules) == [0, 2])
+        assert(chassis.modules[0] is module_0)
+        assert(module_0.ports == ports_0)
+        assert(changes['removed'] == [module_1])
+        assert(changes['added'] == [chassis.modules[2], chassis.modules[2].ports[0]])
+        assert(changes['updated'] == [])
+
+    def test_refresh_inventory_streams_filters(self):
+        chassis = self._chassis_inventory({0: ('Odin-10G', 2)})
+        port = chassis.modules[0].ports[0]
+        self.rest.attributes[(port.ref, 'ps_indices')] = '0 1 2'
+        self.rest.attributes[(port.ref, 'pf_indices')] = '0 1'
+        streams, filters = dict(port.streams), dict(port.filters)
+        self.rest.attributes[(port.ref, 'ps_indices')] = '0 2 3'
+        self.rest.attributes[(port.ref, 'pf_indices')] = '1'
+        self.rest.attributes[(port.ref + '/stream/3', 'ps_comment')] = 'new stream'
+        changes = chassis.refresh_inventory()
+        assert(sorted(port.streams) == [0, 2, 3])
+        assert(port.streams[0] is streams[0] and port.streams[2] is streams[2])
+        assert(port.streams[3].name == 'new stream')
+        assert(port.filters == {1: filters[1]})
+        assert(changes['removed'] == [streams[1], filters[0]])
+        assert(changes['added'] == [port.streams[3]])
+        assert(changes['updated'] == [])
+
+    def test_reserve_release_ports(self):
+        chassis = self._chassis_inventory({0: ('Odin-10G', 3)})
+        refs = ['{}/module/0/port/{}'.format(chassis.ref, p) for p in range(3)]
+        for ref, reservation in zip(refs, ['RELEASED', 'RESERVED_BY_OTHER', 'RESERVED_BY_YOU']):
+            self.rest.attributes[(ref, 'p_reservation')] = reservation
+        self.rest.attributes[(refs[1], 'p_reservedby')] = 'other'
+
+        with pytest.raises(XenaReservationError) as error:
+            chassis.reserve_ports(['0/0', '0/1'])
+        assert([(str(p), r) for p, r in error.value.conflicts.items()] == [('1.1.1.1/0/1', 'other')])
+        assert(chassis.ports == {})
+        assert(self.rest.batches[-1] == [(refs[0], 'p_reservation'), (refs[0], 'p_reservedby'),
+                                         (refs[1], 'p_reservation'), (refs[1], 'p_reservedby')])
+
+        ports = chassis.reserve_ports(['0/0', '0/1', '0/2'], force=True)
+        assert(sorted(ports) == ['1.1.1.1/0/0', '1.1.1.1/0/1', '1.1.1.1/0/2'])
+        assert(self.rest.batches[-2] == [(r, a) for r in refs for a in ['p_reservation', 'p_reservedby']])
+        assert(self.rest.batches[-1] == [(refs[0], 'p_reservation', 'reserve'), (refs[0], 'p_reset'),
+                                         (refs[1], 'p_reservation', 'relinquish'),
+                                         (refs[1], 'p_reservation', 'reserve'), (refs[1], 'p_reset'),
+                                         (refs[2], 'p_reset')])
+
+        self.rest.attributes[(refs[0], 'p_reservation')] = 'RESERVED_BY_YOU'
+        self.rest.attributes[(refs[1], 'p_reservation')] = 'RELEASED'
+        chassis.release_ports()
+        assert(sorted(self.rest.batches[-2]) == sorted((r, 'p_reservation') for r in refs))
+        assert(sorted(self.rest.batches[-1]) == [(refs[0], 'p_reservation', 'release'),
+                                                 (refs[2], 'p_reservation', 'release')])
+
+    def test_start_traffic_sync(self):
+        ports = self._traffic_ports(OrderedDict([('1.1.1.1', ['0/0', '0/1']), ('2.2.2.2', ['0/0'])]))
+        self.rest.attributes[('test/chassis/1.1.1.1', 'c_time')] = '500'
+        self.rest.attributes[('test/chassis/2.2.2.2', 'c_time')] = '400'
+        skew = self.session.start_traffic_sync(*ports, delay=2)
+        assert(sorted(c.ip for c in skew) == ['1.1.1.1', '2.2.2.2'])
+        assert(sorted(c for c in self.rest.commands if c[1].startswith('c_traffic')) ==
+               [('test/chassis/1.1.1.1', 'c_trafficsync', 'on', 503, '0 0 0 1'),
+                ('test/chassis/2.2.2.2', 'c_trafficsync', 'on', 503, '0 0')])
+        with pytest.raises(TypeError):
+            self.session.start_traffic_sync(*ports, wait=True)
+
+    def test_start_traffic_sync_fallback(self):
+        ports = self._traffic_ports(OrderedDict([('1.1.1.1', ['0/0', '0/1']), ('2.2.2.2', ['0/0'])]))
+        self.rest.attributes[(ports[1].ref, 'p_capabilities')] = _port_capabilities(cansynctrafficstart=0)
+        self.session.start_traffic_sync(*ports)
+        assert(sorted(c for c in self.rest.commands if c[1].startswith('c_traffic')) ==
+               [('test/chassis/1.1.1.1', 'c_traffic', 'on', '0 0 0 1'),
+                ('test/chassis/2.2.2.2', 'c_traffic', 'on', '0 0')])
+
+    def test_run_traffic(self, monkeypatch):
+        clock = _FakeClock()
+        monkeypatch.setattr(xena_app, 'monotonic', clock)
+        monkeypatch.setattr(xena_app.time, 'sleep', clock.sleep)
+        ports = self._traffic_ports(OrderedDict([('1.1.1.1', ['0/0', '0/1'])]))
+        self.rest.attributes[(ports[0].ref, 'p_txtime')] = '10000123'
+        self.rest.attributes[(ports[1].ref, 'p_txtime')] = '9999000'
+        traffic_commands = []
+
+        def _send_command(obj, command, *arguments):
+            # Record traffic commands send time, answer after 0.2 seconds and update ports traffic state.
+            if command == 'c_traffic':
+                traffic_commands.append((clock.now, arguments[0]))
+                clock.now += 0.2
+                for port in ports:
+                    self.rest.attributes[(port.ref, 'p_traffic')] = arguments[0]
+        monkeypatch.setattr(self.rest, 'send_command', _send_command)
+
+        durations = self.session.run_traffic(10, *ports)
+        (on_time, on), (off_time, off) = traffic_commands
+        assert((on, off) == ('on', 'off'))
+        assert(0 <= off_time - (on_time + 10) < 0.01)
+        assert(durations == {ports[0]: {'requested': 10, 'achieved': 10.000123},
+                             ports[1]: {'requested': 10, 'achieved': 9.999}})
+
+    def _traffic_ports(self, locations):
+        """ Create chassis and reserve ports that can start traffic synchronously and report traffic on.
+
+        :param locations: dictionary {chassis IP: [module/port locations]}.
+        :return: list of reserved ports, in locations order.
+        """
+        ports = []
+        for ip, chassis_locations in locations.items():
+            chassis = self._chassis_inventory({0: ('Odin-10G', 2)}, ip)
+            for p_index in range(2):
+                port_ref = '{}/module/0/port/{}'.format(chassis.ref, p_index)
+                self.rest.attributes[(port_ref, 'p_capabilities')] = _port_capabilities(cansynctrafficstart=1)
+                self.rest.attributes[(port_ref, 'p_traffic')] = 'on'
+            reserved_ports = chassis.reserve_ports(chassis_locations, reset=False)
+            ports += [reserved_ports['{}/{}'.format(ip, location)] for location in chassis_locations]
+        return ports
+
+    def _chassis_inventory(self, modules, ip='1.1.1.1'):
+        """ Create chassis and read its inventory.
+
+        :param modules: dictionary {module index: (module name, port count)}.
+        :param ip: chassis IP address.
+        """
+        chassis = XenaChassis(self.session, ip)
+        for m_index, (m_name, m_portcount) in modules.items():
+            self._set_module(chassis, m_index, m_name, m_portcount)
+        chassis.inventory(modules_inventory=True, batch=True)
+        return chassis
+
+    def _set_module(self, chassis, m_index, m_name, m_portcount):
+        portcounts = (self.rest.infos.get(chassis.ref, {}).get('c_portcounts') or '0 0 0 0').split()
+        portcounts[m_index] = str(m_portcount)
+        self.rest.infos[chassis.ref] = {'c_portcounts': ' '.join(portcounts)}
+        m_ref = '{}/module/{}'.format(chassis.ref, m_index)
+        self.rest.attributes[(m_ref, 'm_name')] = m_name
+        self.rest.attributes[(m_ref, 'm_portcount')] = str(m_portcount)
+        self.rest.attributes[(m_ref, 'm_capabilities')] = '0 0 0 0 {}'.format(int(m_name.startswith('Chimera')))
+        self.rest.infos[m_ref] = {'m_model': m_name, 'm_cfptype': 'NOTCFP', 'm_portcount': str(m_portcount)}
+        for p_index in range(m_portcount):
+            self.rest.infos['{}/port/{}'.format(m_ref, p_index)] = {'p_interface': m_name}
@@ -15,8 +15,9 @@ from pypacker.layer4.udp import UDP
 
 from trafficgenerator.tgn_utils import ApiType, is_local_host
 from xenavalkyrie.xena_stream import XenaModifierType, XenaModifierAction
-from xenavalkyrie.xena_stream import XenaStream
+from xenavalkyrie.xena_stream import XenaStream, XenaStreamState
 from xenavalkyrie.xena_filter import XenaFilterState
+from xenavalkyrie.xena_inventory_cache import XenaInventoryCache
 from .test_base import TestXenaBase
 
 
@@ -38,6 +39,38 @@ class TestXenaOffline(TestXenaBase):
         save_config = path.join(path.dirname(__file__), 'configs', 'save_config.xmc')
         list(self.xm.session.chassis_list.values())[0].save_config(save_config)
 
+    def test_inventory_cache(self):
+        cache = XenaInventoryCache(path.join(self.temp_dir, 'xena_inventory_cache'))
+        #: :type chassis: xenavalkyrie.xena_app.XenaChassis
+        chassis = self.xm.session.chassis_list[self.chassis]
+        chassis.inventory(modules_inventory=True, cache=cache)
+        key = cache.get_key(chassis)
+        assert(cache.load(key))
+        ports = sorted(str(p) for m in chassis.modules.values() for p in m.ports.values())
+
+        chassis.del_objects_by_type('module')
+        chassis.inventory(modules_inventory=True, cache=cache, background=False)
+        assert(sorted(str(p) for m in chassis.modules.values() for p in m.ports.values()) == ports)
+        chassis.revalidate_inventory()
+        assert(sorted(str(p) for m in chassis.modules.values() for p in m.ports.values()) == ports)
+        cache.invalidate(key)
+
+    def test_stats_store(self):
+        np = pytest.importorskip('numpy')
+        from xenavalkyrie.xena_statistics_store import XenaStatsStore
+        from xenavalkyrie.xena_statistics_view import XenaPortsStats
+
+        self.xm.session.reserve_ports([self.port1, self.port2])
+        store = XenaStatsStore(capacity=2)
+        ports_stats = XenaPortsStats(self.xm.session)
+        for _ in range(3):
+            ports_stats.read_stats()
+            store.add_view(ports_stats)
+        assert(len(store['pt_total']) == 3)
+        assert(store['pt_total'].values.shape == (3, 2, 4))
+        assert(store['pt_total'].rate('bytes').shape == (2, 2))
+        assert(np.all(store['pt_total'].delta('packets') >= 0))
+
     def test_load_config(self):
         #: :type port: xenavalkyrie.xena_port.XenaPort
         port = self.xm.session.reserve_ports([self.port2])[self.port2]
@@ -88,6 +121,14 @@ class TestXenaOffline(TestXenaBase):
         port.streams[0].remove_modifier(0)
         assert(port.streams[0].modifiers[0].max_val == 65535)
 
+        modifiers = port.streams[1].set_modifiers([{'position': 4},
+                                                   {'position': 8, 'action': XenaModifierAction.random}])
+        assert(len(modifiers) == 2)
+        port.streams[1].del_objects_by_type('modifier')
+        modifiers = port.load_modifiers()[port.streams[1]]
+        assert(modifiers[0].position == 4)
+        assert(modifiers[1].action == XenaModifierAction.random)
+
     def test_extended_modifiers(self):
         try:
             port = self.xm.session.reserve_ports([self.port3])[self.port3]
@@ -166,6 +207,23 @@ class TestXenaOffline(TestXenaBase):
 
         port.save_config(path.join(path.dirname(__file__), 'configs', 'save_config.xpc'))
 
+    def test_add_streams(self):
+
+        #: :type port: xenavalkyrie.xena_port.XenaPort
+        port = self.xm.session.reserve_ports([self.port1], force=False, reset=True)[self.port1]
+
+        port.add_stream('first stream')
+        streams = port.add_streams([{'name': 'second stream', 'attributes': [('ps_ratepps', 1000)]},
+                                    {'tpld_id': 7, 'state': XenaStreamState.disabled}])
+        assert(len(port.streams) == 3)
+        assert(streams[0].id == 1)
+        assert(streams[0].get_attribute('ps_comment') == 'second stream')
+        assert(streams[0].get_attribute('ps_ratepps') == '1000')
+        assert(streams[0].tpld_id == 1)
+        assert(streams[1].get_attribute('ps_tpldid') == '7')
+        assert(streams[1].get_attribute('ps_enable') == 'OFF')
+        assert(XenaStream.next_tpld_id == 8)
+
     def test_rest_server(self):
 
         if self.api == ApiType.rest:
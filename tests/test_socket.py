@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+Pipelined batch tests that do not require chassis - XenaSocket over fake socket that answers from replies table.
+
+@author yoram@ignissoft.com
+"""
+
+import logging
+
+import pytest
+
+from xenavalkyrie.api.xena_socket import XenaSocket, XenaCommandError
+from xenavalkyrie.api.xena_cli import XenaCliWrapper
+
+
+class _FakeSock(object):
+    """ Answers each sent command line from replies dictionary {command: reply lines} (default - <OK>) and returns the
+        encoded replies in chunks of chunk_size bytes, so lines and multibyte characters are split between chunks.
+    """
+
+    def __init__(self, replies, chunk_size):
+        self.replies = replies
+        self.chunk_size = chunk_size
+        self.sent = []
+        self.pending = b''
+
+    def sendall(self, data):
+        lines = data.decode('utf-8').strip('\n').split('\n')
+        self.sent.append(lines)
+        for line in lines:
+            reply = ['<SYNC>'] if line == 'SYNC' else self.replies.get(line, ['<OK>'])
+            self.pending += ''.join(r + '\n' for r in reply).encode('utf-8')
+
+    def recv(self, size):
+        chunk, self.pending = self.pending[:min(size, self.chunk_size)], self.pending[min(size, self.chunk_size):]
+        return chunk
+
+    def close(self):
+        pass
+
+
+class _FakePort(object):
+
+    def __init__(self, chassis, index):
+        self.chassis = chassis
+        self.index = index
+
+    def __str__(self):
+        return '{}/{}'.format(self.chassis, self.index)
+
+    def _build_index_command(self, command, *arguments):
+        return ' '.join([self.index, command] + [str(a) for a in arguments])
+
+    def _extract_return(self, command, index_command_value):
+        return index_command_value.replace('{} {} '.format(self.index, command.upper()), '')
+
+
+def _fake_socket(replies, chunk_size=4096):
+    xena_socket = XenaSocket(logging.getLogger('test_socket'), 'fake')
+    xena_socket.bsocket.sock = _FakeSock(replies, chunk_size)
+    xena_socket.bsocket.connected = True
+    return xena_socket
+
+
+class TestXenaSocket(object):
+
+    def test_batch_split_replies(self):
+        replies = {'0/0 p_comment ?': [u'0/0 P_COMMENT "café ✓"'],
+                   '0/0 p_info ?': ['0/0 P_RECEIVESYNC IN_SYNC', '0/0 P_SPEED 10000', '0/0 P_INTERFACE "SFP+"'],
+                   '0/0 p_bad ?': ['#Syntax error in command', '          ---^'],
+                   '0/0 p_reservedby ?': ['<NOTVALID>']}
+        xena_socket = _fake_socket(replies, chunk_size=1)
+        assert(xena_socket.sendQueryBatch(list(replies)) ==
+               [[u'0/0 P_COMMENT "café ✓"'],
+                ['0/0 P_RECEIVESYNC IN_SYNC', '0/0 P_SPEED 10000', '0/0 P_INTERFACE "SFP+"'],
+                ['#Syntax error in command'],
+                ['<NOTVALID>']])
+        assert(xena_socket.bsocket.sock.sent == [['0/0 p_comment ?', 'SYNC', '0/0 p_info ?', 'SYNC',
+                                                  '0/0 p_bad ?', 'SYNC', '0/0 p_reservedby ?', 'SYNC']])
+        assert(xena_socket.metrics['commands'] == 4)
+        assert(xena_socket.metrics['round_trips'] == 1)
+        assert(xena_socket.metrics['errors'] == 2)
+
+    def test_batch_bursts(self):
+        cmds = ['0/0 ps_comment [{}] ?'.format(i) for i in range(600)]
+        replies = {c: ['0/0 PS_COMMENT [{}] "{}"'.format(i, i)] for i, c in enumerate(cmds)}
+        xena_socket = _fake_socket(replies, chunk_size=1000)
+        assert(xena_socket.sendQueryBatch(cmds) == [replies[c] for c in cmds])
+        assert([len(lines) for lines in xena_socket.bsocket.sock.sent] == [512, 512, 176])
+        assert(xena_socket.metrics['commands'] == 600)
+        assert(xena_socket.metrics['round_trips'] == 3)
+
+    def test_single_command_errors(self):
+        xena_socket = _fake_socket({'0/0 p_reservedby ?': ['<NOTVALID>'], '0/0 p_bad ?': ['<BADINDEX>']})
+        assert(xena_socket.sendQuery('0/0 p_reservedby ?') == '<NOTVALID>')
+        with pytest.raises(XenaCommandError):
+            xena_socket.sendQuery('0/0 p_bad ?')
+
+    def test_cli_batch_chassis_order(self):
+        cli = XenaCliWrapper(logging.getLogger('test_socket'))
+        ports = []
+        for chassis in ['c1', 'c2']:
+            replies = {'{} p_comment ?'.format(i): ['{} P_COMMENT "{}/{}"'.format(i, chassis, i)] for i in range(3)}
+            cli.sockets_list[chassis] = _fake_socket(replies, chunk_size=5)
+            ports += [_FakePort(chassis, str(i)) for i in range(3)]
+        ports = ports[0::2] + ports[1::2]
+        assert(cli.get_attribute_multi([(p, 'p_comment') for p in ports]) == [str(p) for p in ports])
+        assert([len(s.bsocket.sock.sent) for s in cli.sockets_list.values()] == [1, 1])
+
+        cli.sockets_list['c2'].bsocket.sock.replies['1 p_comment ?'] = ['#Index error', '---^']
+        with pytest.raises(XenaCommandError) as error:
+            cli.get_attribute_multi([(p, 'p_comment') for p in ports])
+        assert('1 queries failed' in str(error.value))
+        assert('c2/1 p_comment' in str(error.value))
+
+        cli.sockets_list['c1'].bsocket.sock.replies['0 p_reservation reserve'] = ['<RESERVEDBYOTHER>']
+        with pytest.raises(XenaCommandError) as error:
+            cli.send_commands([(p, 'p_reservation', 'reserve') for p in ports])
+        assert('1 commands failed' in str(error.value))
@@ -0,0 +1,415 @@
+"""
+Statistics utilities tests that do not require chassis - fake clocks, fake objects and synthetic counters.
+
+@author yoram@ignissoft.com
+"""
+
+import json
+import logging
+from collections import OrderedDict
+
+import pytest
+
+try:
+    from urllib.request import urlopen
+    from urllib.error import HTTPError
+except ImportError:
+    from urllib2 import urlopen, HTTPError
+
+from trafficgenerator.tgn_object import TgnObject
+from xenavalkyrie import xena_statistics_sampler
+from xenavalkyrie.xena_statistics_sampler import XenaStatsSampler
+from xenavalkyrie.xena_statistics_view import XenaCountersSelection, XenaStatsSnapshot, XenaStreamsStats
+from xenavalkyrie.xena_statistics_writer import XenaStatsCsvWriter, XenaStatsJsonLinesWriter
+
+
+class _FakeClock(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class _FakeStopEvent(object):
+    """ Stop event that advances the fake clock instead of waiting and is set when the clock reaches end time. """
+
+    def __init__(self, clock, end):
+        self.clock = clock
+        self.end = end
+
+    def is_set(self):
+        return self.clock.now >= self.end
+
+    def wait(self, timeout):
+        self.clock.now += max(timeout, 0)
+
+
+class _FakeSession(object):
+    logger = logging.getLogger('test_statistics')
+
+
+class _FakeTransportApi(object):
+
+    def get_transport_metrics(self):
+        return OrderedDict([('1.1.1.1', OrderedDict([('commands', 10), ('round_trips', 2)]))])
+
+
+class _FakeObject(TgnObject):
+
+    stats_group = 'pt_stream'
+
+    def __init__(self, ref, tpld_id=None, obj_type='port', parent=None):
+        super(self.__class__, self).__init__(objRef=ref, objType=obj_type, parent=None)
+        self._data['parent'] = parent
+        self.id = tpld_id
+        self.tpld_id = tpld_id
+
+
+class _FakeDataset(TgnObject):
+
+    def __init__(self, ref, range_):
+        super(self.__class__, self).__init__(objRef=ref, objType='dataset', parent=None)
+        self.range = range_
+
+    def get_range(self):
+        return self.range
+
+
+def _snapshot(timestamp, rows, group='pr_total', captions=('pac', 'byt')):
+    """ Build snapshot {object: {group: {caption: value}}} from rows {object: list of values}. """
+    statistics = OrderedDict()
+    for obj, values in rows.items():
+        statistics[obj] = OrderedDict([(group, OrderedDict(zip(captions, values)))])
+    return XenaStatsSnapshot(statistics, timestamp, timestamp)
+
+
+class _FakeSnapshotSession(object):
+    """ Session that returns prepared snapshots instead of reading counters from chassis. """
+
+    def __init__(self):
+        self.statistics = None
+
+    def read_counters_snapshot(self, selection):
+        return XenaStatsSnapshot(self.statistics, 0, 0)
+
+
+class TestXenaStatistics(object):
+
+    def test_sampler_overruns(self, monkeypatch):
+        clock = _FakeClock()
+        monkeypatch.setattr(xena_statistics_sampler, 'monotonic', clock)
+        reads_durations = iter([0.2, 2.5, None, 0.2, 0.2, 0.2])
+        reads_starts = []
+
+        def read():
+            reads_starts.append(clock.now)
+            duration = next(reads_durations)
+            if duration is None:
+                raise IOError('read failed')
+            clock.now += duration
+            return XenaStatsSnapshot({}, clock.now - duration, clock.now)
+
+        snapshots = []
+        sampler = XenaStatsSampler(_FakeSession(), interval=1, read=read)
+        sampler.add_sink(snapshots.append)
+        sampler._stop_event = _FakeStopEvent(clock, 6.5)
+        sampler._run()
+
+        # Second read took 2.5 seconds so samples at 2 and 3 are skipped and the schedule resumes at 4, not at 3.5.
+        assert(reads_starts == [0, 1, 4, 5, 6])
+        assert(sampler.overruns == 2)
+        assert(sampler.errors == 1)
+        assert(sampler.samples == 4)
+        assert(len(snapshots) == 4)
+        assert(sampler.last_snapshot is snapshots[-1])
+
+    def test_delta_wrap_and_clear(self):
+        pytest.importorskip('numpy')
+        from xenavalkyrie.xena_statistics_delta import XenaStatsDeltaEngine
+
+        p0, p1, p2 = _FakeObject('0/0'), _FakeObject('0/1'), _FakeObject('0/2')
+        engine = XenaStatsDeltaEngine(counter_bits=32)
+        assert(engine.update(_snapshot(0, OrderedDict([(p0, [100, 6400]), (p1, [200, 12800])]))) is None)
+
+        # p0 wraps around 2^32, p1 is cleared.
+        delta = engine.update(_snapshot(0.5, OrderedDict([(p0, [2 ** 32 - 10, 2 ** 32 - 640]),
+                                                          (p1, [20, 1280])])))
+        group = delta['pr_total']
+        assert(group.interval == 0.5)
+        assert(group.delta('pac').tolist() == [2 ** 32 - 110, 20])
+        assert(group.cleared.tolist() == [False, True])
+        delta = engine.update(_snapshot(1, OrderedDict([(p0, [15, 960]), (p1, [30, 1920])])))
+        group = delta['pr_total']
+        assert(group.delta('pac').tolist() == [25, 10])
+        assert(group.delta('byt').tolist() == [1600, 640])
+        assert(group.cleared.tolist() == [False, False])
+        assert(group.pps.tolist() == [50, 20])
+        assert(group.bps.tolist() == [25600, 10240])
+
+        # Objects are aligned by reference - new object starts with zero delta, re-created object keeps its history.
+        p1_new = _FakeObject('0/1')
+        delta = engine.update(_snapshot(2, OrderedDict([(p2, [1000, 64000]), (p1_new, [40, 2560])])))
+        group = delta['pr_total']
+        assert(group.objects == [p2, p1_new])
+        assert(group.delta('pac').tolist() == [0, 10])
+        assert(group.cleared.tolist() == [False, False])
+
+        engine.reset()
+        assert(engine.update(_snapshot(3, OrderedDict([(p0, [0, 0])]))) is None)
+
+    def test_delta_64_bits_clear(self):
+        pytest.importorskip('numpy')
+        from xenavalkyrie.xena_statistics_delta import XenaStatsDeltaEngine
+
+        p0 = _FakeObject('0/0')
+        engine = XenaStatsDeltaEngine()
+        engine.update(_snapshot(0, {p0: [2 ** 40, 0]}))
+        group = engine.update(_snapshot(1, {p0: [2 ** 40 + 5, 0]}))['pr_total']
+        assert(group.delta('pac').tolist() == [5])
+        # 64 bits counters (signed on the chassis) never reach the upper half of the range so backwards means clear.
+        group = engine.update(_snapshot(2, {p0: [3, 0]}))['pr_total']
+        assert(group.delta('pac').tolist() == [3])
+        assert(group.cleared.all())
+
+    def test_store_growth_and_queries(self):
+        np = pytest.importorskip('numpy')
+        from xenavalkyrie.xena_statistics_store import XenaStatsStore
+
+        p0, p1 = _FakeObject('0/0'), _FakeObject('0/1')
+        store = XenaStatsStore(capacity=1)
+        # Zero and negative intervals between samples 2-3 and 3-4, p1 joins at sample 2.
+        timestamps = [0, 1, 2, 2, 1.5]
+        for sample, timestamp in enumerate(timestamps):
+            rows = OrderedDict([(p0, {'pr_total': OrderedDict([('pac', 10 * sample), ('byt', 100 * sample)])})])
+            if sample >= 2:
+                rows[p1] = {'pr_total': {'byt': 1000 * sample, 'pac': sample}}
+            store.add_stats(rows, timestamp=timestamp)
+        group = store['pr_total']
+        assert(len(group) == 5)
+        assert(len(group._times) == 8)
+        assert(group.timestamps.tolist() == timestamps)
+        assert(group.objects == [p0, p1])
+
+        # Samples taken before p1 was added are 0.
+        assert(group.counter('pac').tolist() == [[0, 0], [10, 0], [20, 2], [30, 3], [40, 4]])
+        assert(group.counter('byt', p1).tolist() == [[0], [0], [2000], [3000], [4000]])
+        assert(group.last('pac') == OrderedDict([(p0, 40), (p1, 4)]))
+
+        assert(group.delta('pac').tolist() == [[10, 0], [10, 2], [10, 1], [10, 1]])
+        rate = group.rate('byt', p0, p1)
+        assert(rate[:2].tolist() == [[100, 0], [100, 2000]])
+        assert(np.isinf(rate[2]).all())
+        assert(rate[3].tolist() == [-200, -2000])
+        # Unchanged counter over zero interval is nan.
+        constant = XenaStatsStore()
+        for _ in range(2):
+            constant.add_stats({p0: {'pr_total': {'pac': 1}}}, timestamp=5)
+        assert(np.isnan(constant['pr_total'].rate('pac')).all())
+
+        assert(group.aggregate('pac').tolist() == [0, 10, 22, 33, 44])
+        assert(group.aggregate('byt', p1, function=np.max).tolist() == [0, 0, 2000, 3000, 4000])
+        with pytest.raises(TypeError):
+            group.aggregate('pac', func=np.max)
+
+    def test_streams_stats_tpld_id_change(self):
+        port0, port1 = _FakeObject('0/0'), _FakeObject('0/1')
+        stream = _FakeObject('0/0/0', tpld_id=1, obj_type='stream')
+        tpld1 = _FakeObject('0/1/[1]', tpld_id=1, obj_type='tpld', parent=port1)
+        tpld2 = _FakeObject('0/1/[2]', tpld_id=2, obj_type='tpld', parent=port1)
+        session = _FakeSnapshotSession()
+        session.statistics = OrderedDict([(stream, {'pt_stream': {'pac': 100}}),
+                                          (tpld1, {'pr_tpldtraffic': {'pac': 90}}),
+                                          (tpld2, {'pr_tpldtraffic': {'pac': 10}})])
+        streams_stats = XenaStreamsStats(session, ['pr_tpldtraffic.pac'])
+
+        statistics = streams_stats.read_stats()
+        assert(statistics[stream]['tx']['pac'] == 100)
+        assert(statistics[stream]['rx'][port1]['pr_tpldtraffic']['pac'] == 90)
+
+        # Same stream, new TPLD ID (ps_tpldid) - the stream must be matched to the new TPLD.
+        stream.tpld_id = 2
+        statistics = streams_stats.read_stats()
+        assert(statistics[stream]['rx'][port1]['pr_tpldtraffic']['pac'] == 10)
+        assert(port0 not in statistics[stream]['rx'])
+
+    def test_writers_mixed_objects(self, tmpdir, caplog):
+        port = _FakeObject('0/0')
+        tpld = _FakeObject('0/0/[1]', tpld_id=1, obj_type='tpld', parent=port)
+        statistics = OrderedDict([(port, {'pr_total': OrderedDict([('bps', 1000), ('pps', 2)])}),
+                                  (tpld, {'pr_tpldlatency': OrderedDict([('min', 1), ('avg', 2)])})])
+
+        csv_file = tmpdir.join('stats.csv').strpath
+        with XenaStatsCsvWriter(csv_file, columns=['pr_total_bps', 'pr_tpldlatency_avg'], timestamp=False) as writer:
+            writer.write(statistics)
+            writer.write(OrderedDict([(_FakeObject('port, 1'), {'pr_total': {'bps': 3000}})]))
+        with open(csv_file) as f:
+            assert(f.read().splitlines() == ['object,pr_total_bps,pr_tpldlatency_avg',
+                                             '0/0,1000,',
+                                             '0/0/[1],,2',
+                                             '"port, 1",3000,'])
+
+        json_file = tmpdir.join('stats.jsonl').strpath
+        with XenaStatsJsonLinesWriter(json_file, timestamp=False) as writer:
+            writer.write(statistics)
+        with open(json_file) as f:
+            rows = [json.loads(line) for line in f]
+        assert(rows == [{'object': '0/0', 'pr_total_bps': 1000, 'pr_total_pps': 2,
+                         'pr_tpldlatency_min': None, 'pr_tpldlatency_avg': None},
+                        {'object': '0/0/[1]', 'pr_total_bps': None, 'pr_total_pps': None,
+                         'pr_tpldlatency_min': 1, 'pr_tpldlatency_avg': 2}])
+
+        # Layout is compiled from the first sample, later statistics are dropped with one warning.
+        with XenaStatsJsonLinesWriter(json_file, timestamp=False) as writer:
+            writer.write(OrderedDict([(port, statistics[port])]))
+            with caplog.at_level(logging.WARNING, logger='xenavalkyrie.xena_statistics_writer'):
+                writer.write(statistics)
+                writer.write(statistics)
+        assert([r.getMessage().count('pr_tpldlatency_avg') for r in caplog.records] == [1])
+        with open(json_file) as f:
+            assert(json.loads(f.readlines()[-1]) == {'object': '0/0/[1]', 'pr_total_bps': None, 'pr_total_pps': None})
+
+        with XenaStatsCsvWriter(tmpdir.join('bad.csv').strpath, columns=['pr_total_bytes']) as writer:
+            with pytest.raises(ValueError) as error:
+                writer.write(statistics)
+        assert('odict_keys' not in str(error.value))
+
+    def test_exporter_metrics(self):
+        from xenavalkyrie.xena_statistics_exporter import XenaStatsExporter
+
+        session = _FakeSession()
+        session.api = _FakeTransportApi()
+        port = _FakeObject('0/0')
+        tpld = _FakeObject('0/0/[1]', tpld_id=1, obj_type='tpld', parent=port)
+        exporter = XenaStatsExporter(session, port=0)
+        exporter.start()
+        try:
+            assert(exporter.port != 0)
+            statistics = OrderedDict([(port, {'pr_pfc': OrderedDict([('CoS 0', 7)])}),
+                                      (tpld, {'pr_tpldtraffic': OrderedDict([('pac', 5)])})])
+            exporter(XenaStatsSnapshot(statistics, 100.0, 100.5))
+            url = 'http://127.0.0.1:{}'.format(exporter.port)
+            response = urlopen(url + '/metrics')
+            assert(response.headers['Content-Type'] == XenaStatsExporter.content_type)
+            assert(response.read().decode('utf-8').splitlines() ==
+                   ['# TYPE xena_pr_pfc_CoS_0 untyped',
+                    'xena_pr_pfc_CoS_0{port="0/0"} 7',
+                    '# TYPE xena_pr_tpldtraffic_pac untyped',
+                    'xena_pr_tpldtraffic_pac{port="0/0",tpld="1"} 5',
+                    '# TYPE xena_sample_timestamp_seconds gauge',
+                    'xena_sample_timestamp_seconds 100.250000',
+                    '# TYPE xena_sample_duration_seconds gauge',
+                    'xena_sample_duration_seconds 0.500000',
+                    '# TYPE xena_transport_commands_total counter',
+                    'xena_transport_commands_total{connection="1.1.1.1"} 10',
+                    '# TYPE xena_transport_round_trips_total counter',
+                    'xena_transport_round_trips_total{connection="1.1.1.1"} 2'])
+            with pytest.raises(HTTPError) as error:
+                urlopen(url + '/stats')
+            assert(error.value.code == 404)
+            assert(exporter.scrapes == 1)
+        finally:
+            exporter.stop()
+
+    def test_selection_type_columns(self):
+        selection = XenaCountersSelection(['pr_total.bps', 'pr_tpldlatency.avg', 'pt_stream_pps'])
+        assert(selection.type_columns('port') == ['pr_total_bps'])
+        assert(selection.type_columns('stream') == ['pt_stream_pps'])
+        assert(selection.type_columns('tpld') == ['pr_tpldlatency_avg'])
+
+    def test_histograms_percentiles(self):
+        np = pytest.importorskip('numpy')
+        from xenavalkyrie.xena_statistics_histogram import XenaHistograms
+
+        d0, d1, d2 = [_FakeDataset('0/0/[{}]'.format(i), (1000, 100, 4)) for i in range(3)]
+        samples = OrderedDict([(d0, [0, 10, 10, 0]), (d1, [20, 0, 0, 0]), (d2, [0, 0, 0, 0])])
+        histograms = XenaHistograms(samples)
+        assert(histograms.edges.tolist() == [1000, 1100, 1200, 1300, 1400])
+        assert(histograms.totals.tolist() == [20, 20, 0])
+
+        # Linear interpolation inside the bucket that contains the percentile, nan for dataset without samples.
+        percentiles = histograms.percentiles((25, 50, 99))
+        assert(np.allclose(percentiles[0], [1150, 1200, 1298]))
+        assert(np.allclose(percentiles[1], [1025, 1050, 1099]))
+        assert(np.isnan(percentiles[2]).all())
+        assert(histograms.as_dict((50,))[d1][50] == 1050)
+
+        # All datasets are folded into one histogram [20, 10, 10, 0].
+        merged = histograms.merged_percentiles((50, 75, 99))
+        assert(list(merged.keys()) == [50, 75, 99])
+        assert(np.allclose(list(merged.values()), [1100, 1200, 1296]))
+
+        # Samples above the range are counted in the last bucket so high percentiles are capped at the range end.
+        histograms = XenaHistograms(OrderedDict([(d0, [0, 0, 0, 50])]))
+        assert(np.allclose(histograms.percentiles((50, 99.9))[0], [1350, 1399.9]))
+
+        with pytest.raises(ValueError):
+            XenaHistograms(OrderedDict([(d0, [0, 0, 0, 0]), (_FakeDataset('0/1/[0]', (0, 10, 4)), [0, 0, 0, 0])]))
+
+    def test_history_fold_and_reconstruct(self):
+        np = pytest.importorskip('numpy')
+        from xenavalkyrie.xena_statistics_history import XenaStatsHistory
+
+        p0, p1 = _FakeObject('0/0'), _FakeObject('0/1')
+        # Small rings so samples are dropped by both limits - entries capacity and max samples.
+        history = XenaStatsHistory(capacity=8, max_samples=5, samples_capacity=1)
+        random = np.random.RandomState(17)
+        states = []
+        state = np.zeros(4, dtype=np.int64)
+        for sample in range(40):
+            # Change 0-3 counters per sample, p1 joins after 3 samples.
+            changed = random.choice(4 if sample >= 3 else 2, random.randint(0, 4 if sample >= 3 else 3), replace=False)
+            state = state.copy()
+            state[changed] += random.randint(1, 1000, len(changed))
+            rows = OrderedDict([(p0, {'pr_total': OrderedDict([('pac', state[0]), ('byt', state[1])])})])
+            if sample >= 3:
+                rows[p1] = {'pr_total': OrderedDict([('pac', state[2]), ('byt', state[3])])}
+            history.add_stats(rows, timestamp=sample)
+            states.append(state)
+
+            assert(len(history) <= 5)
+            assert(history.entries <= 8)
+            times, values = history.reconstruct()
+            assert(times.tolist() == list(range(sample - len(history) + 1, sample + 1)))
+            assert(values.tolist() == [s[:len(history.columns)].tolist() for s in states[-len(history):]])
+        assert(len(history._times) == 5)
+
+        times, values = history.reconstruct(37, 38, columns=[('0/1', 'pr_total', 'byt')])
+        assert(times.tolist() == [37, 38])
+        assert(values[:, 0].tolist() == [states[37][3], states[38][3]])
+        assert(history.reconstruct_stats(38)['0/1']['pr_total']['pac'] == states[38][2])
+        assert(history.reconstruct_stats()['0/0']['pr_total']['byt'] == states[39][1])
+        assert(history.reconstruct_stats(0) == OrderedDict())
+
+    def test_alerts_fire_and_clear(self):
+        pytest.importorskip('numpy')
+        from xenavalkyrie.xena_statistics_alerts import XenaAlertEngine, XenaAlertRule
+
+        p0, p1, p2 = _FakeObject('0/0'), _FakeObject('0/1'), _FakeObject('0/2')
+        engine_events = []
+        rule_events = []
+        engine = XenaAlertEngine(['pr_total.packets > 100'], callback=engine_events.append)
+        delta_rule = engine.add_rule(XenaAlertRule('delta(pr_total_bytes) >= 1000', callback=rule_events.append))
+        engine.add_rule('rate(pr_total.bytes) < 600', callback=rule_events.append)
+
+        def evaluate(timestamp, rows):
+            snapshot = _snapshot(timestamp, rows, captions=('packets', 'bytes'))
+            return [(e.rule.expression, e.obj, e.active) for e in engine.evaluate(snapshot)]
+
+        # First sample - only absolute rules are evaluated.
+        assert(evaluate(0, OrderedDict([(p0, [50, 0]), (p1, [150, 0])])) == [('pr_total.packets > 100', p1, True)])
+        # p1 still violates the absolute rule but it is not a transition so there is no event.
+        assert(evaluate(1, OrderedDict([(p0, [50, 1000]), (p1, [150, 1000])])) ==
+               [('delta(pr_total_bytes) >= 1000', p0, True), ('delta(pr_total_bytes) >= 1000', p1, True)])
+        assert(evaluate(2, OrderedDict([(p0, [200, 1500]), (p1, [50, 2500])])) ==
+               [('pr_total.packets > 100', p0, True), ('pr_total.packets > 100', p1, False),
+                ('delta(pr_total_bytes) >= 1000', p0, False), ('rate(pr_total.bytes) < 600', p0, True)])
+        assert(engine.get_active()[delta_rule] == [p1])
+        # Objects are aligned by reference - p0 is gone, new object p2 starts with zero delta.
+        assert(evaluate(2.5, OrderedDict([(p2, [0, 100]), (p1, [50, 2600])])) ==
+               [('delta(pr_total_bytes) >= 1000', p1, False), ('rate(pr_total.bytes) < 600', p2, True),
+                ('rate(pr_total.bytes) < 600', p1, True)])
+        assert(evaluate(3, OrderedDict([(p2, [0, 100]), (p1, [50, 2600])])) == [])
+        assert([e.rule.expression for e in engine_events] == ['pr_total.packets > 100'] * 3)
+        assert(len(rule_events) == 7)
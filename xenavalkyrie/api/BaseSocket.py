@@ -1,5 +1,6 @@
 
 import sys
+import codecs
 import socket
 import logging
 
@@ -20,6 +21,7 @@ class BaseSocket:
         self.timeout = timeout
         self.connected = False
         self.sock = None
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
 
     def __del__(self):
         self.disconnect()
@@ -40,6 +42,7 @@ class BaseSocket:
             return
 
         self.__connect()
+        self.decoder.reset()
         self.connected = True
 
     def disconnect(self):
@@ -56,7 +59,7 @@ class BaseSocket:
             raise socket.error("sendCommand() on a disconnected socket")
 
         try:
-            self.sock.send(bytearray(cmd + '\n', 'utf-8'))
+            self.sock.sendall(bytearray(cmd + '\n', 'utf-8'))
         except socket.error as error:
             self.disconnect()
             raise socket.error("Fail to send command: {}, error: {}", cmd, error)
@@ -80,6 +83,23 @@ class BaseSocket:
         logger.debug('Reply message({})'.format(str_reply))
         return str_reply
 
+    def readChunk(self):
+        """ Read whatever is available on the socket, without any reply parsing.
+
+        Chunks are decoded incrementally so multibyte characters split between chunks are decoded once complete.
+        """
+        if not self.connected:
+            raise socket.error("readChunk() on a disconnected socket")
+
+        try:
+            chunk = self.sock.recv(4096)
+            if not chunk:
+                raise socket.error('connection closed by peer')
+        except Exception as error:
+            self.disconnect()
+            raise IOError('Fail to read response, error: {}'.format(error))
+        return self.decoder.decode(chunk)
+
     def sendQuery(self, query):
         logger.debug('sendQuery({})'.format(query))
         self.sendCommand(query)
@@ -5,8 +5,9 @@ Base classes and utilities for all Xena Manager (Xena) objects.
 """
 
 import logging
+from collections import OrderedDict
 
-from xenavalkyrie.api.xena_socket import XenaSocket
+from xenavalkyrie.api.xena_socket import XenaSocket, XenaCommandError
 
 logger = logging.getLogger(__name__)
 
@@ -72,10 +73,7 @@ class XenaCliWrapper(object):
         :returns: returned value.
         :rtype: str
         """
-        raw_return = self.send_command_return(obj, attribute, '?')
-        if len(raw_return) > 2 and raw_return[0] == '"' and raw_return[-1] == '"':
-            return raw_return[1:-1]
-        return raw_return
+        return _strip_quotes(self.send_command_return(obj, attribute, '?'))
 
     def get_attributes(self, obj):
         """ Get all object's attributes.
@@ -90,16 +88,7 @@ class XenaCliWrapper(object):
         attributes = {}
         for info_config_command in obj._info_config_commands:
             index_commands_values = self.send_command_return_multilines(obj, info_config_command, '?')
-            # poor implementation...
-            li = obj._get_index_len()
-            ci = obj._get_command_len()
-            for index_command_value in index_commands_values:
-                command = index_command_value.split()[ci].lower()
-                if len(index_command_value.split()) > li + 1:
-                    value = ' '.join(index_command_value.split()[li+1:]).replace('"', '')
-                else:
-                    value = ''
-                attributes[command] = value
+            attributes.update(_parse_attributes(obj, index_commands_values))
         return attributes
 
     def set_attributes(self, obj, **attributes):
@@ -120,3 +109,105 @@ class XenaCliWrapper(object):
         :rtype: list(int)
         """
         return [int(v) for v in self.get_attribute(obj, stat_name).split()]
+
+    #
+    # Pipelined (batch) operations.
+    #
+
+    def send_commands(self, commands):
+        """ Send commands with no output, pipelined in one burst per chassis.
+
+        All commands are sent even if some of them fail, errors are reported once at the end.
+
+        :param commands: list of (obj, command, arguments...) tuples.
+        :return: list of replies, one per command.
+        :raises XenaCommandError: if any of the commands failed.
+        """
+        replies = [lines[0] if lines else '' for lines in self._send_batch(commands)]
+        errors = ['{} {} - {}'.format(c[0], ' '.join(str(a) for a in c[1:]), r) for c, r in zip(commands, replies)
+                  if r != XenaSocket.reply_ok]
+        if errors:
+            raise XenaCommandError('{} commands failed: {}'.format(len(errors), errors))
+        return replies
+
+    def get_attribute_multi(self, queries):
+        """ Returns multiple single line attributes, pipelined in one burst per chassis.
+
+        :param queries: list of (obj, attribute) tuples.
+        :returns: list of returned values, one per query.
+        :rtype: list of str
+        """
+        replies = self._send_batch([(obj, attribute, '?') for obj, attribute in queries])
+        _raise_batch_errors(queries, replies)
+        return [_strip_quotes(obj._extract_return(attribute, lines[0]))
+                for (obj, attribute), lines in zip(queries, replies)]
+
+    def get_attributes_multi(self, objs):
+        """ Get all attributes of multiple objects, pipelined in one burst per chassis.
+
+        :param objs: list of requested objects.
+        :returns: list of dictionaries of <name, value>, one per object.
+        :rtype: list of dict of (str, str)
+        """
+        queries = [(obj, command) for obj in objs for command in obj._info_config_commands]
+        replies = self._send_batch([(obj, command, '?') for obj, command in queries])
+        _raise_batch_errors(queries, replies)
+        attributes = OrderedDict((obj, {}) for obj in objs)
+        for (obj, _), lines in zip(queries, replies):
+            attributes[obj].update(_parse_attributes(obj, lines))
+        return list(attributes.values())
+
+    def get_stats_multi(self, queries):
+        """ Send multiple CLI commands that return list of integer counters, pipelined in one burst per chassis.
+
+        :param queries: list of (obj, stat_name) tuples.
+        :return: list of counters lists, one per query.
+        :rtype: list(list(int))
+        """
+        return [[int(v) for v in values.split()] for values in self.get_attribute_multi(queries)]
+
+    def get_transport_metrics(self):
+        """
+        :return: dictionary {chassis: {metric name: value}} of all chassis connections. See XenaSocket.metrics.
+        """
+        return OrderedDict((chassis, OrderedDict(socket.metrics)) for chassis, socket in self.sockets_list.items())
+
+    def _send_batch(self, commands):
+        per_chassis = OrderedDict()
+        for i, command in enumerate(commands):
+            obj = command[0]
+            per_chassis.setdefault(obj.chassis, []).append((i, obj._build_index_command(*command[1:])))
+        replies = [None] * len(commands)
+        for chassis, index_commands in per_chassis.items():
+            chassis_replies = self.sockets_list[chassis].sendQueryBatch([c for _, c in index_commands])
+            for (i, _), lines in zip(index_commands, chassis_replies):
+                replies[i] = lines
+        return replies
+
+
+def _strip_quotes(raw_return):
+    if len(raw_return) > 2 and raw_return[0] == '"' and raw_return[-1] == '"':
+        return raw_return[1:-1]
+    return raw_return
+
+
+def _parse_attributes(obj, index_commands_values):
+    # poor implementation...
+    attributes = {}
+    li = obj._get_index_len()
+    ci = obj._get_command_len()
+    for index_command_value in index_commands_values:
+        command = index_command_value.split()[ci].lower()
+        if len(index_command_value.split()) > li + 1:
+            value = ' '.join(index_command_value.split()[li+1:]).replace('"', '')
+        else:
+            value = ''
+        attributes[command] = value
+    return attributes
+
+
+def _raise_batch_errors(queries, replies):
+    errors = ['{} {} - {}'.format(q[0], q[1], lines) for q, lines in zip(queries, replies)
+              if not lines or lines[0].startswith(XenaSocket.batch_reply_errors)]
+    if errors:
+        raise XenaCommandError('{} queries failed: {}'.format(len(errors), errors))
@@ -8,6 +8,7 @@ import requests
 import json
 import time
 from enum import Enum
+from collections import OrderedDict
 
 from xenavalkyrie.api.xena_socket import XenaCommandError
 from xenavalkyrie.api.xena_keepalive import KeepAliveThread
@@ -40,6 +41,8 @@ class XenaRestWrapper(object):
         self.base_url = 'http://{}:{}'.format(server, port)
         self.keepalive_thread = None
         self.last_command_timestamp = time.time()
+        # Transport metrics - requests sent, total requests time and failed requests.
+        self.metrics = OrderedDict((('commands', 0), ('round_trips', 0), ('round_trip_seconds', 0.0), ('errors', 0)))
 
     def connect(self, owner):
         self.session_url = '{}/{}'.format(self.base_url, 'session')
@@ -151,11 +154,65 @@ class XenaRestWrapper(object):
         """
         return [int(v) for v in self.send_command_return(obj, stat_name, '?').split()]
 
+    #
+    # Batch operations. REST server has no pipelining so commands are sent one by one.
+    #
+
+    def send_commands(self, commands):
+        """ Send commands with no output.
+
+        All commands are sent even if some of them fail, errors are reported once at the end.
+
+        :param commands: list of (obj, command, arguments...) tuples.
+        :return: list of replies, one per command.
+        :raises XenaCommandError: if any of the commands failed.
+        """
+
+        replies = []
+        errors = []
+        for command in commands:
+            try:
+                self.send_command(*command)
+                replies.append('<OK>')
+            except Exception as e:
+                replies.append(str(e))
+                errors.append('{} {} - {}'.format(command[0], ' '.join(str(a) for a in command[1:]), e))
+        if errors:
+            raise XenaCommandError('{} commands failed: {}'.format(len(errors), errors))
+        return replies
+
+    def get_attribute_multi(self, queries):
+        """
+        :param queries: list of (obj, attribute) tuples.
+        :returns: list of returned values, one per query.
+        """
+        return [self.get_attribute(obj, attribute) for obj, attribute in queries]
+
+    def get_attributes_multi(self, objs):
+        """
+        :param objs: list of requested objects.
+        :returns: list of dictionaries of <name, value>, one per object.
+        """
+        return [self.get_attributes(obj) for obj in objs]
+
+    def get_stats_multi(self, queries):
+        """
+        :param queries: list of (obj, stat_name) tuples.
+        :return: list of counters lists, one per query.
+        """
+        return [self.get_stats(obj, stat_name) for obj, stat_name in queries]
+
     def keep_alive(self):
         """ Send keep alive message. """
         self.logger.debug("Send KeepAlive message")
         self._request(RestMethod.get, self.user_url)
 
+    def get_transport_metrics(self):
+        """
+        :return: dictionary {REST server: {metric name: value}}. All chassis are accessed through the REST server.
+        """
+        return OrderedDict([(self.base_url, OrderedDict(self.metrics))])
+
     #
     # Atomic operations.
     #
@@ -191,7 +248,12 @@ class XenaRestWrapper(object):
     def _request(self, method, url, **kwargs):
         self.logger.debug('method: {}, url: {}, kwargs={}'.format(method.value, url, kwargs))
         ignore = kwargs.pop('ignore', False)
+        start = time.time()
         res = requests.request(method.value, url, **kwargs)
+        self.metrics['commands'] += 1
+        self.metrics['round_trips'] += 1
+        self.metrics['round_trip_seconds'] += time.time() - start
+        self.metrics['errors'] += int(res.status_code >= 400)
         self.logger.debug('status_code: {}'.format(res.status_code))
         if not ignore and res.status_code >= 400:
             raise XenaCommandError('status_code: {}, content: {}'.format(res.status_code, res.content))
@@ -2,11 +2,15 @@
 import threading
 import socket
 import time
+from collections import OrderedDict
 
 from xenavalkyrie.api.BaseSocket import BaseSocket
 from xenavalkyrie.api.xena_keepalive import KeepAliveThread
 
 
+monotonic = getattr(time, 'monotonic', time.time)
+
+
 class XenaCommandError(Exception):
     pass
 
@@ -16,6 +20,13 @@ class XenaSocket(object):
     reply_ok = '<OK>'
     reply_errors = ('#Syntax error', '#Index error', '#Internal deparse error',
                     '<BADPARAMETER>', '<BADINDEX>', '<BADPORT>', '<NOTRESERVED>', '<NOTWRITABLE>')
+    # Batch replies are checked for all chassis error replies, single command replies keep the legacy checks above.
+    batch_reply_errors = reply_errors + ('<NOCONNECTIONS>', '<NOTLOGGEDON>', '<RESERVEDBYOTHER>', '<NOTRELEASED>',
+                                         '<NOTREADABLE>', '<NOTVALID>', '<BADMODULE>', '<BADSIZE>', '<BADVALUE>',
+                                         '<FAILED>')
+
+    # Maximum number of command lines to send in one pipelined burst.
+    max_burst = 512
 
     def __init__(self, logger, hostname, port=22611, timeout=5):
         self.logger = logger
@@ -26,6 +37,8 @@ class XenaSocket(object):
         self.access_semaphor = threading.Semaphore(1)
         self.keepalive_thread = None
         self.last_command_timestamp = time.time()
+        # Transport metrics - commands sent, round trips to the chassis, total round trips time and failed commands.
+        self.metrics = OrderedDict((('commands', 0), ('round_trips', 0), ('round_trip_seconds', 0.0), ('errors', 0)))
 
     def is_connected(self):
         return self.bsocket.is_connected()
@@ -65,6 +78,7 @@ class XenaSocket(object):
         self.access_semaphor.acquire()
         self.last_command_timestamp = time.time()
         self.bsocket.sendCommand(cmd)
+        self.metrics['commands'] += 1
         self.access_semaphor.release()
         self.logger.debug("sendCommand(%s) returning", cmd)
 
@@ -73,6 +87,7 @@ class XenaSocket(object):
         # when the last reply arrives.
         self.access_semaphor.acquire()
         self.last_command_timestamp = time.time()
+        start = monotonic()
         self.bsocket.sendCommand(cmd.strip('\n'))
         self.bsocket.sendCommand('SYNC')
         replies = []
@@ -82,11 +97,13 @@ class XenaSocket(object):
                 (reply, msgleft) = msg.split('\n', 1)
                 # check for syntax problems
                 if reply.rfind('Syntax') != -1:
+                    self.__count(1, start, 1)
                     self.access_semaphor.release()
                     raise XenaCommandError("Multiline: syntax error - {}".format(reply))
 
                 if reply.rfind('<SYNC>') == 0:
                     self.logger.debug("Multiline EOL SYNC message")
+                    self.__count(1, start)
                     self.access_semaphor.release()
                     return replies
 
@@ -101,7 +118,9 @@ class XenaSocket(object):
     def __sendQueryReply(self, cmd):
         self.access_semaphor.acquire()
         self.last_command_timestamp = time.time()
+        start = monotonic()
         reply = self.bsocket.sendQuery(cmd).strip('\n')
+        self.__count(1, start, int(reply.startswith(XenaSocket.reply_errors)))
         self.access_semaphor.release()
         return reply
 
@@ -148,6 +167,62 @@ class XenaSocket(object):
             raise XenaCommandError('Command {} Fail Expected {} Actual {}'.format(cmd, self.reply_ok, resp))
         self.logger.debug("SendQueryVerify(%s) Succeed", cmd)
 
+    def sendQueryBatch(self, cmds):
+        """ Send commands in pipelined bursts and return the reply lines of each command.
+
+        Each command is followed by SYNC so replies can be demultiplexed without knowing how many lines each command
+        returns. Errors are not raised but returned as reply lines so the caller can report them per command.
+
+        :param cmds: list of commands to send.
+        :return: list of reply lines lists, one list per command.
+        """
+        self.logger.debug('sendQueryBatch({} commands)'.format(len(cmds)))
+        if not self.is_connected():
+            raise socket.error('sendQueryBatch on a disconnected socket')
+
+        replies = []
+        burst_size = max(1, int(self.max_burst / 2))
+        for burst_start in range(0, len(cmds), burst_size):
+            replies += self.__sendBurst(cmds[burst_start:burst_start + burst_size])
+        return replies
+
+    def __sendBurst(self, cmds):
+        lines = []
+        for cmd in cmds:
+            lines.append(cmd.strip())
+            lines.append('SYNC')
+        replies = []
+        reply_lines = []
+        msg = ''
+        self.access_semaphor.acquire()
+        try:
+            self.last_command_timestamp = time.time()
+            start = monotonic()
+            self.bsocket.sendCommand('\n'.join(lines))
+            while len(replies) < len(cmds):
+                if '\n' not in msg:
+                    msg += self.bsocket.readChunk()
+                    continue
+                reply, msg = msg.split('\n', 1)
+                reply = reply.strip('\r')
+                if reply.startswith('<SYNC>'):
+                    replies.append(reply_lines)
+                    reply_lines = []
+                elif reply.strip() and '---^' not in reply and '^---' not in reply:
+                    self.logger.debug("Batch reply: %s", reply)
+                    reply_lines.append(reply)
+            errors = sum(1 for r in replies if r and r[0].startswith(XenaSocket.batch_reply_errors))
+            self.__count(len(cmds), start, errors)
+        finally:
+            self.access_semaphor.release()
+        return replies
+
+    def __count(self, commands, start, errors=0):
+        self.metrics['commands'] += commands
+        self.metrics['round_trips'] += 1
+        self.metrics['round_trip_seconds'] += monotonic() - start
+        self.metrics['errors'] += errors
+
     def keep_alive(self):
         """ Send keep alive message. """
         self.logger.debug("Send KeepAlive message")
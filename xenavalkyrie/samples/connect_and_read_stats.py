@@ -7,6 +7,8 @@ Two Xena ports connected back to back.
 @author yoram@ignissoft.com
 """
 
+from __future__ import print_function
+
 import sys
 import logging
 import time
@@ -14,7 +16,8 @@ import time
 from trafficgenerator.tgn_utils import ApiType
 from xenavalkyrie.xena_app import init_xena
 from xenavalkyrie.xena_port import XenaPort
-from xenavalkyrie.xena_statistics_view import XenaPortsStats, XenaStreamsStats
+from xenavalkyrie.xena_statistics_view import XenaStreamsStats
+from xenavalkyrie.xena_statistics_sampler import XenaStatsSampler
 
 api = ApiType.socket
 ip = '176.22.65.117'
@@ -57,19 +60,16 @@ def measure():
     XenaPort(parent=chassis, index=port0)
     XenaPort(parent=chassis, index=port1)
 
-    port_stats = XenaPortsStats(xm.session)
-    streams_stats = XenaStreamsStats(xm.session)
-
-    # Loop for 10 seconds or any condition you want
-    for _ in range(10):
+    # Sample all ports statistics every second, in background, for 10 seconds or any condition you want.
+    sampler = XenaStatsSampler(xm.session, interval=1)
+    sampler.add_sink(lambda snapshot: print(snapshot.statistics.dumps()))
+    with sampler:
+        time.sleep(10)
 
-        # Get statistics.
-        port_stats.read_stats()
-        streams_stats.read_stats()
-        print(port_stats.statistics.dumps())
-        print(streams_stats.statistics.dumps())
-
-        time.sleep(1)
+    # Get streams statistics.
+    streams_stats = XenaStreamsStats(xm.session)
+    streams_stats.read_stats()
+    print(streams_stats.statistics.dumps())
 
 
 def run_all():
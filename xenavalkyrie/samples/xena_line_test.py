@@ -7,14 +7,16 @@
 import sys
 from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter, SUPPRESS
 import logging
+import os
 import time
-import json
+from collections import OrderedDict
 
 from trafficgenerator.tgn_utils import ApiType
 from xenavalkyrie.xena_app import init_xena
 from xenavalkyrie.xena_port import XenaPort
 from xenavalkyrie.xena_stream import XenaStreamState
 from xenavalkyrie.xena_statistics_view import XenaPortsStats
+from xenavalkyrie.xena_statistics_writer import XenaStatsCsvWriter, XenaStatsJsonLinesWriter
 
 
 version = 0.3
@@ -61,9 +63,12 @@ def xena_line_test(args=None):
     run_analyze.add_argument('-t', '--time', required=True, type=int, metavar='int',
                              help='Run duration in seconds')
     run_analyze.add_argument('-r', '--results', required=True, metavar='file',
-                             help='Results output file')
+                             help='Results output file - CSV if counters are specified, else JSON Lines. '
+                                  'Gzip if ends with .gz. With CSV, streams and TPLDs counters are saved in separate '
+                                  'files named file_stream and file_tpld')
     run_analyze.add_argument('-c', '--counters', required=False, default=SUPPRESS, nargs='+', metavar='counter',
-                             help='List of counters to save in output file. (default: all)')
+                             help='List of counters to save in output file, group.stat, group_stat or group. '
+                                  '(default: all)')
 
     # Process arguments
     parsed_args = parser.parse_args(args)
@@ -118,36 +123,46 @@ def run_test(parsed_args):
     for port in parsed_args.ports:
         XenaPort(chassis, port).reserve(force=True)
 
+    chassis.clear_stats()
     for port in chassis.ports.values():
-        port.clear_stats()
         for stream in port.streams.values():
             stream.set_state(XenaStreamState.enabled)
 
-    chassis.start_traffic()
-    time.sleep(parsed_args.time)
-    chassis.stop_traffic()
+    durations = chassis.parent.run_traffic(parsed_args.time)
+    for port, duration in durations.items():
+        chassis.logger.info('{} requested duration {} achieved duration {}'.
+                            format(port, duration['requested'], duration['achieved']))
 
     time.sleep(2)
 
     counters = parsed_args.counters if hasattr(parsed_args, 'counters') else None
-    with open(parsed_args.results, 'w+') as f:
-        ports_stats = XenaPortsStats(chassis.parent)
-        ports_stats.read_stats()
-        if counters:
-            f.write('port,{}\n'.format(','.join(counters)))
-            for port in chassis.ports:
-                line = port
-                for counter in counters:
-                    line += ','
-                    line += str(ports_stats.get_flat_stats()[port][counter])
-                f.write('{}\n'.format(line))
-        else:
-            f.write(json.dumps(ports_stats.get_flat_stats(), indent=2))
+    ports_stats = XenaPortsStats(chassis.parent, counters)
+    ports_stats.read_stats()
+    if counters:
+        # CSV has one header so each object type, with its own columns, is saved in its own file.
+        for obj_type in ('port', 'stream', 'tpld'):
+            columns = ports_stats.selection.type_columns(obj_type)
+            if columns:
+                statistics = OrderedDict((o, s) for o, s in ports_stats.snapshot.statistics.items()
+                                         if o.obj_type() == obj_type)
+                with XenaStatsCsvWriter(results_file(parsed_args.results, obj_type), columns=columns,
+                                        timestamp=False, object_caption=obj_type) as writer:
+                    writer.write(statistics, ports_stats.snapshot.timestamp)
+    else:
+        with XenaStatsJsonLinesWriter(parsed_args.results) as writer:
+            writer(ports_stats.snapshot)
 
     for port in chassis.ports.values():
         port.release()
 
 
+def results_file(results, obj_type):
+    if obj_type == 'port':
+        return results
+    root, ext = os.path.splitext(results[:-3] if results.endswith('.gz') else results)
+    return root + '_' + obj_type + ext + ('.gz' if results.endswith('.gz') else '')
+
+
 def connect(log_file, chassis):
 
     # Xena manager requires standard logger. To log all low level CLI commands set DEBUG level.
@@ -6,14 +6,62 @@ Classes and utilities that represents Xena XenaManager-2G application and chassi
 
 import time
 import re
+import math
+import threading
+from enum import Enum
+from collections import OrderedDict
 
 from trafficgenerator.tgn_app import TgnApp
 from trafficgenerator.tgn_utils import ApiType
 from xenavalkyrie.api.xena_rest import XenaRestWrapper
 from xenavalkyrie.api.xena_cli import XenaCliWrapper
-from xenavalkyrie.xena_object import XenaObject, XenaObjectsDict
-from xenavalkyrie.xena_port import XenaPort
+from xenavalkyrie.xena_object import (XenaObject, XenaObjectsDict, XenaCapabilities, XenaReservationError,
+                                      monotonic)
+from xenavalkyrie.xena_port import XenaPort, XenaPortCapabilities
 from xenavalkyrie.xena_chimera_port import XenaChimeraPort
+from xenavalkyrie.xena_stream import XenaStream
+from xenavalkyrie.xena_filter import XenaFilter
+from xenavalkyrie.xena_inventory_cache import XenaInventoryCache
+from xenavalkyrie.xena_statistics_view import XenaStatsSnapshot, XenaCountersSelection
+
+
+# Chassis time stamps are seconds since 2010-01-01 00:00:00 UTC.
+XENA_EPOCH = 1262304000
+
+
+class XenaModuleFamily(Enum):
+    odin = 'Odin'
+    loki = 'Loki'
+    thor = 'Thor'
+    chimera = 'Chimera'
+    other = None
+
+    @classmethod
+    def classify(cls, m_name):
+        """
+        :param m_name: module name as returned by m_name.
+        :return: module family.
+        :rtype: XenaModuleFamily
+        """
+        for family in cls:
+            if family.value and re.match(family.value, m_name):
+                return family
+        return cls.other
+
+
+module_classes = {}
+""" Registry of module classes per module family. Modules of unregistered families are created as XenaModule. """
+
+
+def register_module_class(family, module_class):
+    """ Register module class to create for modules of the requested family.
+
+    :param family: module family.
+    :type family: XenaModuleFamily
+    :param module_class: module class, must inherit from XenaBaseModule.
+    """
+
+    module_classes[family] = module_class
 
 
 def init_xena(api, logger, owner, ip=None, port=57911):
@@ -35,6 +83,14 @@ def init_xena(api, logger, owner, ip=None, port=57911):
     return XenaApp(logger, owner, api_wrapper)
 
 
+def _sleep_until(deadline):
+    """ Sleep until deadline on monotonic clock, busy wait the last few milliseconds for accuracy. """
+    while deadline - monotonic() > 0.005:
+        time.sleep(deadline - monotonic() - 0.005)
+    while monotonic() < deadline:
+        pass
+
+
 class XenaApp(TgnApp):
     """ XenaApp object, equivalent to XenaManager-2G application. """
 
@@ -68,6 +124,7 @@ class XenaSession(XenaObject):
         super(self.__class__, self).__init__(objType='session', index='', parent=None, objRef=owner)
         self.session = self
         self.chassis = None
+        self.traffic_start_host_skew = {}
         self.api.connect(owner)
 
     def add_chassis(self, chassis, port=22611, password='xena'):
@@ -98,11 +155,16 @@ class XenaSession(XenaObject):
             
         self.api.disconnect()
 
-    def inventory(self):
-        """ Get inventory for all chassis. """
+    def inventory(self, cache=None, batch=False):
+        """ Get inventory for all chassis.
+
+        :param cache: inventory cache, see XenaChassis.inventory.
+        :type cache: xenavalkyrie.xena_inventory_cache.XenaInventoryCache
+        :param batch: True - read inventory with pipelined queries, see XenaChassis.inventory.
+        """
 
         for chassis in self.chassis_list.values():
-            chassis.inventory(modules_inventory=True)
+            chassis.inventory(modules_inventory=True, cache=cache, batch=batch)
 
     def reserve_ports(self, locations, force=False, reset=True):
         """ Reserve ports and reset factory defaults.
@@ -110,15 +172,20 @@ class XenaSession(XenaObject):
         XenaManager-2G -> Reserve/Relinquish Port.
         XenaManager-2G -> Reserve Port.
 
+        Ports are reserved in bulk per chassis, see XenaChassis.reserve_ports.
+
         :param locations: list of ports locations in the form <ip/slot/port> to reserve
         :param force: True - take forcefully. False - fail if port is reserved by other user
         :param reset: True - reset port, False - leave port configuration
         :return: ports dictionary (index: object)
         """
 
+        per_chassis_locations = OrderedDict()
         for location in locations:
             ip, module, port = location.split('/')
-            self.chassis_list[ip].reserve_ports(['{}/{}'.format(module, port)], force, reset)
+            per_chassis_locations.setdefault(ip, []).append('{}/{}'.format(module, port))
+        for ip, chassis_locations in per_chassis_locations.items():
+            self.chassis_list[ip].reserve_ports(chassis_locations, force, reset)
 
         return self.ports
 
@@ -173,6 +240,104 @@ class XenaSession(XenaObject):
             for chassis, chassis_ports in self._per_chassis_ports(*self._get_operation_ports(*ports)).items():
                 chassis.wait_traffic(*chassis_ports)
 
+    def start_traffic_sync(self, *ports, **kwargs):
+        """ Start traffic on list of ports on all chassis at the same time.
+
+        If all ports advertise cansynctrafficstart capability, traffic is scheduled with c_trafficsync to start on all
+        chassis at the same chassis time, delay seconds after the current time (c_time) of the first port chassis.
+        The host clock is not used, but all chassis clocks must be synchronized with each other.
+        Else, c_traffic is dispatched to all chassis in parallel over the already open chassis connections.
+
+        The host side estimate of the start skew of each chassis, relative to the first chassis to start, is saved in
+        traffic_start_host_skew. The estimate is the midpoint between sending the start command and receiving its
+        acknowledgement, as measured by the host clock (or the scheduled start time converted to host clock if later).
+        It is not read from the chassis clocks, so it does not reflect chassis clocks offsets and only bounds the skew
+        by the commands round trip times.
+
+        :param ports: list of ports to start traffic on. Default - all session ports.
+        :param blocking: keyword only - True - start traffic and wait until traffic ends, False - start traffic and
+            return. Default - False.
+        :param delay: keyword only - seconds from now to schedule synchronized start. Must be longer than the time it
+            takes to send the command to all chassis. Default - 1.
+        :return: dictionary {chassis: host side estimated start skew in seconds}
+        """
+
+        blocking = kwargs.pop('blocking', False)
+        delay = kwargs.pop('delay', 1)
+        if kwargs:
+            raise TypeError('Unexpected arguments {}'.format(list(kwargs)))
+
+        ports = list(self._get_operation_ports(*ports))
+        per_chassis_ports = self._per_chassis_ports(*ports)
+        for chassis, chassis_ports in per_chassis_ports.items():
+            chassis.read_capabilities(*chassis_ports)
+        sync = all(p.capabilities.values['cansynctrafficstart'] for cp in per_chassis_ports.values() for p in cp)
+        start_time = None
+        if sync:
+            read_time = time.time()
+            c_time = XENA_EPOCH + int(ports[0].chassis.get_attribute('c_time'))
+            # c_time is truncated to seconds, add one second so start is at least delay from now. As the chassis time
+            # within the second is unknown, the host time of start is estimated at the middle of that second.
+            start_time = c_time + 1 + int(math.ceil(delay))
+            host_start_time = (read_time + time.time()) / 2 + start_time - c_time - 0.5
+
+        def _start_traffic(chassis, chassis_ports):
+            sent = time.time()
+            chassis._send_traffic_command('on', start_time, *chassis_ports)
+            return sent, time.time()
+
+        estimated_starts = {}
+        for chassis, (sent, acked) in self._run_per_chassis(_start_traffic, per_chassis_ports).items():
+            estimated_starts[chassis] = max(host_start_time, (sent + acked) / 2) if sync else (sent + acked) / 2
+            if sync and acked > host_start_time:
+                self.logger.warning('Synchronized start command to {} acknowledged {:.3f} seconds after start time'.
+                                    format(chassis, acked - host_start_time))
+        first_start = min(estimated_starts.values())
+        self.traffic_start_host_skew = {c: s - first_start for c, s in estimated_starts.items()}
+
+        for chassis, chassis_ports in per_chassis_ports.items():
+            chassis._wait_traffic_state('on', *chassis_ports)
+        if blocking:
+            for chassis, chassis_ports in per_chassis_ports.items():
+                chassis.wait_traffic(*chassis_ports)
+        return self.traffic_start_host_skew
+
+    def run_traffic(self, duration, *ports):
+        """ Run traffic on list of ports for precise duration.
+
+        Traffic is started on all chassis in parallel. Stop is scheduled on monotonic clock per chassis, at the
+        estimated chassis start time plus duration, minus the measured command latency, so no state polling happens
+        while traffic is running.
+
+        :param duration: requested traffic duration in seconds.
+        :param ports: list of ports to run traffic on. Default - all session ports.
+        :return: dictionary {port: {requested: seconds, achieved: seconds}}, achieved duration is read from port
+            transmit time counter (p_txtime).
+        """
+
+        per_chassis_ports = self._per_chassis_ports(*self._get_operation_ports(*ports))
+
+        def _start_traffic(chassis, chassis_ports):
+            sent = monotonic()
+            chassis._send_traffic_command('on', None, *chassis_ports)
+            return sent, monotonic()
+        commands_times = self._run_per_chassis(_start_traffic, per_chassis_ports)
+
+        def _stop_traffic(chassis, chassis_ports):
+            sent, acked = commands_times[chassis]
+            # Estimated start (sent + acked) / 2 plus duration minus stop command latency (acked - sent) / 2.
+            _sleep_until(sent + duration)
+            chassis._send_traffic_command('off', None, *chassis_ports)
+        self._run_per_chassis(_stop_traffic, per_chassis_ports)
+
+        for chassis, chassis_ports in per_chassis_ports.items():
+            chassis._wait_traffic_state('off', *chassis_ports)
+
+        ports = [p for chassis_ports in per_chassis_ports.values() for p in chassis_ports]
+        txtimes = self.api.get_attribute_multi([(p, 'p_txtime') for p in ports])
+        return XenaObjectsDict((p, {'requested': duration, 'achieved': int(t) / 1000000.0}) for
+                               p, t in zip(ports, txtimes))
+
     def stop_traffic(self, *ports):
         """ Stop traffic on list of ports.
 
@@ -185,11 +350,20 @@ class XenaSession(XenaObject):
     def clear_stats(self, *ports):
         """ Clear stats (TX and RX) for list of ports.
 
+        All clear commands of each chassis are pipelined in one burst and all chassis are cleared in parallel.
+
         :param ports: list of ports to clear stats on. Default - all session ports.
+        :return: (start, end) time.time() window in which the counters were cleared.
         """
 
-        for port in self._get_operation_ports(*ports):
-            port.clear_stats()
+        def _clear_stats(chassis, chassis_ports):
+            sent = time.time()
+            chassis.clear_stats(*chassis_ports)
+            return sent, time.time()
+
+        per_chassis_ports = self._per_chassis_ports(*self._get_operation_ports(*ports))
+        commands_times = self._run_per_chassis(_clear_stats, per_chassis_ports).values()
+        return min(t[0] for t in commands_times), max(t[1] for t in commands_times)
 
     def read_stats(self, *ports):
         """ Read statistics on list of ports.
@@ -197,11 +371,51 @@ class XenaSession(XenaObject):
         :param ports: list of ports to read statistics. Default - all session ports.
         """
 
-        statistics = XenaObjectsDict()
-        for port in self._get_operation_ports(*ports):
-            statistics[port] = port.read_port_stats()
+        return self.read_stats_snapshot(*ports).statistics
 
-        return statistics
+    def read_stats_snapshot(self, *ports):
+        """ Read statistics on list of ports.
+
+        :param ports: list of ports to read statistics. Default - all session ports.
+        :return: snapshot of all ports statistics {port: {group name: {stat name: value}}}.
+        :rtype: xenavalkyrie.xena_statistics_view.XenaStatsSnapshot
+        """
+        return self._read_snapshot(lambda c, p: c.read_ports_stats(*p), *ports)
+
+    def read_streams_snapshot(self, *ports):
+        """ Read streams TX and TPLDs RX statistics on list of ports.
+
+        :param ports: list of ports to read statistics. Default - all session ports.
+        :return: snapshot of all streams and TPLDs statistics {stream/tpld: {group name: {stat name: value}}}.
+        :rtype: xenavalkyrie.xena_statistics_view.XenaStatsSnapshot
+        """
+        return self._read_snapshot(lambda c, p: c.read_streams_stats(*p), *ports)
+
+    def read_counters_snapshot(self, counters, *ports):
+        """ Read selected counters of list of ports and their streams and TPLDs.
+
+        :param counters: list of counters or counters selection, see XenaCountersSelection.
+        :param ports: list of ports to read statistics. Default - all session ports.
+        :return: snapshot of the selected counters {port/stream/tpld: {group name: {stat name: value}}}.
+        :rtype: xenavalkyrie.xena_statistics_view.XenaStatsSnapshot
+        """
+
+        selection = counters if isinstance(counters, XenaCountersSelection) else XenaCountersSelection(counters)
+        return self._read_snapshot(lambda c, p: c.read_counters(selection, *p), *ports)
+
+    def read_datasets(self, *ports):
+        """ Read samples of all histogram datasets on list of ports.
+
+        :param ports: list of ports to read datasets. Default - all session ports.
+        :return: dictionary {dataset: list of samples count per bucket}. See XenaDataset.
+        """
+
+        per_chassis_ports = self._per_chassis_ports(*self._get_operation_ports(*ports))
+        per_chassis_samples = self._run_per_chassis(lambda c, p: c.read_datasets(*p), per_chassis_ports)
+        samples = XenaObjectsDict()
+        for chassis in per_chassis_ports:
+            samples.update(per_chassis_samples[chassis])
+        return samples
 
     def start_capture(self, *ports):
         """ Start capture on list of ports.
@@ -271,6 +485,54 @@ class XenaSession(XenaObject):
             per_chassis_ports[chassis].append(port)
         return per_chassis_ports
 
+    def _read_snapshot(self, function, *ports):
+        """ Read statistics of all chassis with _run_per_chassis and merge them into one snapshot.
+
+        :param function: function(chassis, ports) that reads the statistics of one chassis.
+        :return: snapshot of all chassis statistics, time stamped with the time window of the read.
+        :rtype: xenavalkyrie.xena_statistics_view.XenaStatsSnapshot
+        """
+
+        per_chassis_ports = self._per_chassis_ports(*self._get_operation_ports(*ports))
+        sent = time.time()
+        per_chassis_stats = self._run_per_chassis(function, per_chassis_ports)
+        received = time.time()
+
+        statistics = XenaObjectsDict()
+        for chassis in per_chassis_ports:
+            statistics.update(per_chassis_stats[chassis])
+        return XenaStatsSnapshot(statistics, sent, received)
+
+    def _run_per_chassis(self, function, per_chassis_ports):
+        """ Run function(chassis, ports) for all chassis in parallel threads released together.
+
+        Chassis level read functions send all queries of the chassis in one pipelined burst, so reading all chassis
+        takes about one round trip to the slowest chassis.
+
+        :return: dictionary {chassis: function return value}
+        """
+
+        results = {}
+        errors = []
+        go = threading.Event()
+
+        def _run(chassis, chassis_ports):
+            go.wait()
+            try:
+                results[chassis] = function(chassis, chassis_ports)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=_run, args=(c, p)) for c, p in per_chassis_ports.items()]
+        for thread in threads:
+            thread.start()
+        go.set()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+        return results
+
     def _get_operation_modules(self, *modules):
         return modules if modules else self.modules.values()
 
@@ -312,6 +574,9 @@ class XenaChassis(XenaObject):
         self.api.add_chassis(self)
 
         self.c_info = None
+        self.revalidate_thread = None
+        self._inventory_cache = None
+        self._inventory_key = None
 
     def shutdown(self, restart=False, wait=False):
         """ Shutdown chassis.
@@ -347,20 +612,167 @@ class XenaChassis(XenaObject):
 
         raise NotImplementedError('Underlying CLI command c_stats returns internal error.')
 
-    def inventory(self, modules_inventory=False):
+    def inventory(self, modules_inventory=False, cache=None, background=False, batch=False):
         """ Get chassis inventory.
 
         :param modules_inventory: True - read modules inventory, false - don't read.
+        :param batch: True - read all modules and all ports info/config in one pipelined burst per inventory level
+            (modules, modules capabilities, ports), False - read modules and ports one by one.
+        :param cache: inventory cache. If set and modules_inventory is True, rebuild the inventory from the cached
+            snapshot of the chassis (if exists) and revalidate it, else read inventory and save snapshot in cache.
+        :type cache: xenavalkyrie.xena_inventory_cache.XenaInventoryCache
+        :param background: True - revalidate cached inventory in background thread, False - revalidate only on
+            explicit call to revalidate_inventory. The background thread replaces objects of changed modules, so the
+            caller must not iterate modules/ports or hold port references until revalidate_thread completes.
         """
 
-        self.c_info = self.get_attributes()
-        for m_index, m_portcounts in enumerate(self.c_info['c_portcounts'].split()):
-            if int(m_portcounts):
-                # TODO: Check if we are creating a Chimera module
-                module = XenaModule(parent=self, index=m_index)
+        if cache and modules_inventory:
+            self._inventory_cache = cache
+            self._inventory_key = cache.get_key(self)
+            snapshot = cache.load(self._inventory_key)
+            if snapshot and snapshot['c_info']['c_portcounts'].split() == self.get_attribute('c_portcounts').split():
+                self._build_inventory(snapshot)
+                if background:
+                    self.revalidate_thread = threading.Thread(target=self.revalidate_inventory)
+                    self.revalidate_thread.daemon = True
+                    self.revalidate_thread.start()
+                return
+
+        if batch and modules_inventory:
+            self._batch_inventory()
+        else:
+            self.c_info = self.get_attributes()
+            m_indices = [i for i, c in enumerate(self.c_info['c_portcounts'].split()) if int(c)]
+            for module in self._create_modules(*m_indices):
                 if modules_inventory:
                     module.inventory()
 
+        if cache and modules_inventory:
+            cache.save(self._inventory_key, self)
+
+    def revalidate_inventory(self):
+        """ Revalidate inventory that was built from cached snapshot.
+
+        Re-read modules info/config and re-read ports inventory only for modules that changed since the snapshot was
+        taken. Changed modules are re-classified and recreated, so a module swapped for a module of another family gets
+        the matching module class. Ports info/config of unchanged modules is re-read in one batch and updated in place.
+        Objects of unchanged modules and ports are kept as is.
+        """
+
+        modules = list(self.modules.values())
+        changed_modules = []
+        unchanged_modules = []
+        for module, m_info in zip(modules, self.api.get_attributes_multi(modules)):
+            if XenaInventoryCache.changed(module.m_info, m_info):
+                module.del_object_from_parent()
+                changed_modules.append(module)
+            else:
+                module.m_info = m_info
+                unchanged_modules.append(module)
+        changed = bool(changed_modules)
+        for module in self._create_modules(*[int(m.index) for m in changed_modules]):
+            module.inventory()
+        ports = [p for m in unchanged_modules for p in m.ports.values()]
+        for port, p_info in zip(ports, self.api.get_attributes_multi(ports)):
+            if XenaInventoryCache.changed(port.p_info, p_info):
+                changed = True
+            port.p_info = p_info
+        if changed and self._inventory_cache:
+            self._inventory_cache.save(self._inventory_key, self)
+
+    def refresh_inventory(self):
+        """ Refresh inventory after chassis reboot or modules swap.
+
+        Compare chassis port counts, modules info/config and ports streams and filters indices against the current
+        objects tree and add, remove or update only what changed. References to objects that did not change stay
+        valid.
+
+        :return: dictionary {added/removed/updated: list of objects}
+        """
+
+        changes = OrderedDict((c, []) for c in ['added', 'removed', 'updated'])
+
+        self.c_info = self.api.get_attributes_multi([self])[0]
+        m_indices = [i for i, c in enumerate(self.c_info['c_portcounts'].split()) if int(c)]
+        current_modules = {int(m.index): m for m in self.get_objects_by_type('module')}
+
+        # Remove modules (and reserved ports of modules) that are no longer present or that changed family.
+        present_modules = [m for i, m in current_modules.items() if i in m_indices]
+        m_infos = dict(zip(present_modules, self.api.get_attributes_multi(present_modules)))
+        m_names = dict(zip(present_modules, self.api.get_attribute_multi([(m, 'm_name') for m in present_modules])))
+        for m_index, module in list(current_modules.items()):
+            if module not in present_modules or self._get_module_class(m_names[module]) is not type(module):
+                module.del_object_from_parent()
+                changes['removed'].append(module)
+                for port in self.get_objects_by_type('port'):
+                    if int(port.index.split('/')[0]) == m_index:
+                        port.del_object_from_parent()
+                        changes['removed'].append(port)
+                current_modules.pop(m_index)
+            else:
+                if module.m_info is not None and XenaInventoryCache.changed(module.m_info, m_infos[module]):
+                    changes['updated'].append(module)
+                module.m_info = m_infos[module]
+                module.m_name = m_names[module]
+
+        # Add new modules.
+        new_modules = self._create_modules(*[i for i in m_indices if i not in current_modules])
+        for module, m_info in zip(new_modules, self.api.get_attributes_multi(new_modules)):
+            module.m_info = m_info
+        changes['added'] += new_modules
+        self.read_capabilities()
+
+        # Synchronize modules ports, for modules with existing ports inventory, for new modules and for modules of
+        # ports reserved at chassis level.
+        chassis_ports = self.get_objects_by_type('port')
+        modules = [m for m in current_modules.values() if m.get_objects_by_type('port')] + new_modules
+        ports_modules = modules + [m for m in current_modules.values() if m not in modules and
+                                   [p for p in chassis_ports if p.index.split('/')[0] == m.index]]
+        new_ports = []
+        existing_ports = []
+        for module, m_portcount in self._get_modules_portcount(*ports_modules).items():
+            ports = {int(p.index.split('/')[1]): p for p in module.get_objects_by_type('port')}
+            module_chassis_ports = [p for p in chassis_ports if p.index.split('/')[0] == module.index]
+            for port in list(ports.values()) + module_chassis_ports:
+                if int(port.index.split('/')[1]) >= m_portcount:
+                    port.del_object_from_parent()
+                    changes['removed'].append(port)
+                else:
+                    existing_ports.append(port)
+            if module in modules:
+                for p_index in range(m_portcount):
+                    if p_index not in ports:
+                        new_ports.append(module._port_class()(parent=module,
+                                                              index='{}/{}'.format(module.index, p_index)))
+        p_infos = self.api.get_attributes_multi(existing_ports + new_ports)
+        for port, p_info in zip(existing_ports, p_infos):
+            if port.p_info is not None and XenaInventoryCache.changed(port.p_info, p_info):
+                changes['updated'].append(port)
+            port.p_info = p_info
+        for port, p_info in zip(new_ports, p_infos[len(existing_ports):]):
+            port.p_info = p_info
+        changes['added'] += new_ports
+
+        # Synchronize streams and filters of ports that already read them.
+        ports = self.get_objects_by_type('port') + [p for m in modules for p in m.get_objects_by_type('port')]
+        queries = [(p, c) for p in ports for c, t in [('ps_indices', 'stream'), ('pf_indices', 'filter')] if
+                   p.get_objects_by_type(t)]
+        new_objects = []
+        for (port, command), indices in zip(queries, self.api.get_attribute_multi(queries)):
+            obj_type, obj_class = ('stream', XenaStream) if command == 'ps_indices' else ('filter', XenaFilter)
+            current_objects = {o.id: o for o in port.get_objects_by_type(obj_type)}
+            for obj_id, obj in current_objects.items():
+                if str(obj_id) not in indices.split():
+                    # Object no longer exists on chassis so do not call object delete (that sends delete command).
+                    port.objects.pop(obj.ref)
+                    changes['removed'].append(obj)
+            for index in indices.split():
+                if int(index) not in current_objects:
+                    new_objects.append(obj_class(parent=port, index='{}/{}'.format(port.index, index), name=None))
+        XenaPort._read_objects_names(new_objects)
+        changes['added'] += new_objects
+
+        return changes
 
     def reserve_modules(self, locations, force=False):
         """ Reserve modules.
@@ -378,8 +790,7 @@ class XenaChassis(XenaObject):
             if int(location) in self.modules:
                 module = self.modules[int(location)]
             else:
-                # TODO: Check if we are creating a Chimera module
-                module = XenaModule(parent=self, index=location)
+                module = self._create_modules(location)[0]
 
             module.reserve(force)
 
@@ -392,33 +803,78 @@ class XenaChassis(XenaObject):
         XenaManager-2G -> Reserve/Relinquish Port.
         XenaManager-2G -> Reset port.
 
+        All ports are reserved in bulk - first all reservation states are read in one pipelined burst, then all
+        required relinquish, reserve and reset commands are sent in a second burst.
+        If any port is reserved by other user and force is False, no port is reserved.
+
         :param locations: list of ports locations in the form <module/port> to reserve
         :param force: True - take forcefully, False - fail if port is reserved by other user
         :param reset: True - reset port, False - leave port configuration
         :return: ports dictionary (index: object)
+        :raises XenaReservationError: if ports are reserved by other users and force is False. The error conflicts
+            attribute holds the user that reserved each conflicting port.
         """
 
+        self.read_capabilities()
+        current_ports = {p.index: p for p in self.get_objects_by_type('port')}
+        ports = []
+        new_ports = []
         for location in locations:
-
-            if self.modules[int(location.split('/')[0])].capabilities.values['ischimera']:
-                port = XenaChimeraPort(parent=self, index=location)
-            else:
-                port = XenaPort(parent=self, index=location)
-
-            port.reserve(force)
+            if location in current_ports:
+                ports.append(current_ports[location])
+                continue
+            new_ports.append(self.modules[int(location.split('/')[0])]._port_class()(parent=self, index=location))
+            ports.append(new_ports[-1])
+
+        states = self.api.get_attribute_multi([(p, a) for p in ports for a in ['p_reservation', 'p_reservedby']])
+        conflicts = OrderedDict()
+        commands = []
+        for port, reservation, reservedby in zip(ports, states[0::2], states[1::2]):
+            if reservation == 'RESERVED_BY_OTHER' and not force:
+                conflicts[port] = reservedby
+            elif reservation != 'RESERVED_BY_YOU':
+                if reservation != 'RELEASED':
+                    commands.append((port, 'p_reservation', 'relinquish'))
+                commands.append((port, 'p_reservation', 'reserve'))
             if reset:
-                port.reset()
+                commands.append((port, 'p_reset'))
+        if conflicts:
+            # Do not leave objects of ports that were not reserved in the session.
+            for port in new_ports:
+                port.del_object_from_parent()
+            raise XenaReservationError(conflicts)
+
+        self.api.send_commands(commands)
+        if reset:
+            for port in ports:
+                port.objects = OrderedDict()
 
         return self.ports
 
+    def read_capabilities(self, *ports):
+        """ Read capabilities of all modules and of the requested ports in one pipelined burst.
+
+        Capabilities already read are not read again.
+
+        :param ports: list of ports to read capabilities for. Default - modules capabilities only.
+        """
+
+        objects = [o for o in list(self.modules.values()) + list(ports) if o._capabilities is None]
+        queries = [(o, o.cli_prefix + '_capabilities') for o in objects]
+        for obj, capabilities_str in zip(objects, self.api.get_attribute_multi(queries)):
+            obj._capabilities = XenaModuleCapabilities() if isinstance(obj, XenaBaseModule) else XenaPortCapabilities()
+            obj._capabilities.parse(capabilities_str)
+
     def release_ports(self):
         """ Release all ports that were reserved during the session.
 
         XenaManager-2G -> Release Ports.
         """
 
-        for port in self.ports.values():
-            port.release()
+        ports = list(self.ports.values())
+        reservations = self.api.get_attribute_multi([(p, 'p_reservation') for p in ports])
+        self.api.send_commands([(p, 'p_reservation', 'release') for p, r in zip(ports, reservations) if
+                                r == 'RESERVED_BY_YOU'])
 
     def release_modules(self):
         """ Release all ports that were reserved during the session.
@@ -457,6 +913,84 @@ class XenaChassis(XenaObject):
 
         self._traffic_command('off', *ports)
 
+    def clear_stats(self, *ports):
+        """ Clear stats (TX and RX) for list of ports, all clear commands are pipelined in one burst.
+
+        :param ports: list of ports to clear stats on. Default - all chassis ports.
+        """
+
+        self.api.send_commands([(p, c) for p in self._get_operation_ports(*ports) for c in ['pt_clear', 'pr_clear']])
+
+    def read_ports_stats(self, *ports):
+        """ Read statistics on list of ports, all queries are pipelined in one burst.
+
+        :param ports: list of ports to read statistics. Default - all chassis ports.
+        :return: dictionary {port: {group name: {stat name: value}}}. See XenaBasePort.stats_captions.
+        """
+        return self.read_objects_stats(*self._get_operation_ports(*ports))
+
+    def read_streams_stats(self, *ports):
+        """ Read TX statistics of all streams and RX statistics of all TPLDs on list of ports, all statistics queries
+            are pipelined in one burst.
+
+        :param ports: list of ports to read statistics. Default - all chassis ports.
+        :return: dictionary {stream/tpld: {group name: {stat name: value}}}.
+            See XenaStream.stats_captions and XenaTpld.stats_captions.
+        """
+
+        ports = self._get_operation_ports(*ports)
+        streams = [s for p in ports for s in p.streams.values()]
+        tplds = [t for port_tplds in self.read_tplds(*ports).values() for t in port_tplds.values()]
+        return self.read_objects_stats(*(streams + tplds))
+
+    def read_counters(self, counters, *ports):
+        """ Read selected counters of list of ports and their streams and TPLDs, all queries are pipelined in one burst.
+
+        :param counters: list of counters or counters selection, see XenaCountersSelection.
+        :param ports: list of ports to read statistics. Default - all chassis ports.
+        :return: dictionary {port/stream/tpld: {group name: {stat name: value}}} of the selected counters.
+        """
+
+        selection = counters if isinstance(counters, XenaCountersSelection) else XenaCountersSelection(counters)
+        ports = self._get_operation_ports(*ports)
+        tplds = self.read_tplds(*ports) if selection.has_type('tpld') else None
+        return self._read_stats(selection.get_objects(ports, tplds), selection)
+
+    def read_datasets(self, *ports):
+        """ Read samples of all histogram datasets on list of ports, all queries are pipelined in one burst.
+
+        :param ports: list of ports to read datasets. Default - all chassis ports.
+        :return: dictionary {dataset: list of samples count per bucket}. See XenaDataset.
+        """
+
+        ports = self._get_operation_ports(*ports)
+        datasets = [d for p in ports for _, d in sorted(p.datasets.items())]
+        no_range = [d for d in datasets if not d.range]
+        replies = self.api.get_stats_multi([(d, 'pd_range') for d in no_range] + [(d, 'pd_samples') for d in datasets])
+        for dataset, pd_range in zip(no_range, replies):
+            dataset.range = tuple(pd_range)
+        return XenaObjectsDict(zip(datasets, replies[len(no_range):]))
+
+    def read_tplds(self, *ports):
+        """ Read current TPLDs of list of ports, all pr_tplds queries are pipelined in one burst.
+
+        :param ports: list of ports to read TPLDs. Default - all chassis ports.
+        :return: dictionary {port: {id: tpld}} of all current TPLDs. See XenaBasePort.update_tplds.
+        """
+
+        ports = self._get_operation_ports(*ports)
+        pr_tplds = self.api.get_attribute_multi([(port, 'pr_tplds') for port in ports])
+        return OrderedDict((port, port.update_tplds(tplds)) for port, tplds in zip(ports, pr_tplds))
+
+    def read_objects_stats(self, *objects):
+        """ Read statistics of list of chassis objects (ports, streams, TPLDs...), all queries are pipelined in one
+            burst.
+
+        :param objects: list of objects to read statistics.
+        :return: dictionary {object: {group name: {stat name: value}}}.
+        """
+        return self._read_stats(objects)
+
     def read_stats(self):
         """
         :return: dictionary {own: {stat name: value}}
@@ -503,10 +1037,91 @@ class XenaChassis(XenaObject):
     # Private methods.
     #
 
+    def _create_modules(self, *m_indices):
+        """ Create modules of the registered class per module family, classify all modules in one burst. """
+        modules = [XenaModule(parent=self, index=m_index) for m_index in m_indices]
+        m_names = self.api.get_attribute_multi([(m, 'm_name') for m in modules])
+        for i, (module, m_name) in enumerate(zip(modules, m_names)):
+            module_class = self._get_module_class(m_name)
+            if type(module) is not module_class:
+                module.del_object_from_parent()
+                modules[i] = module_class(parent=self, index=module.index)
+            modules[i].m_name = m_name
+        return modules
+
+    def _get_module_class(self, m_name):
+        # Module classes register on import, import here as xena_chimera_module imports from this module.
+        import xenavalkyrie.xena_chimera_module  # noqa: F401
+        return module_classes.get(XenaModuleFamily.classify(m_name), XenaModule)
+
+    def _batch_inventory(self):
+        self.c_info = self.api.get_attributes_multi([self])[0]
+        m_indices = [i for i, c in enumerate(self.c_info['c_portcounts'].split()) if int(c)]
+        modules = self._create_modules(*m_indices)
+        for module, m_info in zip(modules, self.api.get_attributes_multi(modules)):
+            module.m_info = m_info
+        self.read_capabilities()
+
+        ports = []
+        for module, m_portcount in self._get_modules_portcount(*modules).items():
+            for p_index in range(m_portcount):
+                ports.append(module._port_class()(parent=module, index='{}/{}'.format(module.index, p_index)))
+        for port, p_info in zip(ports, self.api.get_attributes_multi(ports)):
+            port.p_info = p_info
+
+    def _read_stats(self, objects, selection=None):
+        objects_groups = []
+        for obj in objects:
+            if selection:
+                objects_groups.append((obj, selection.select(obj)))
+            else:
+                groups = XenaCountersSelection.get_object_groups(obj)
+                objects_groups.append((obj, OrderedDict((g, (c, c)) for g, c in groups.items())))
+        queries = [(obj, stat_name) for obj, groups in objects_groups for stat_name in groups]
+        counters = iter(self.api.get_stats_multi(queries))
+        statistics = XenaObjectsDict()
+        for obj, groups in objects_groups:
+            statistics[obj] = OrderedDict()
+            for stat_name, (captions, stats) in groups.items():
+                statistics[obj][stat_name] = XenaCountersSelection.parse(captions, next(counters), stats)
+        return statistics
+
+    def _get_modules_portcount(self, *modules):
+        """ Modules info/config must be read before calling this method. """
+        cfp_modules = [m for m in modules if 'NOTCFP' not in m.m_info['m_cfptype']]
+        cfp_configs = self.api.get_attribute_multi([(m, 'm_cfpconfig') for m in cfp_modules])
+        m_portcounts = {m: int(c.split()[0]) for m, c in zip(cfp_modules, cfp_configs)}
+        return OrderedDict((m, m_portcounts.get(m, int(m.m_info['m_portcount']))) for m in modules)
+
+    def _build_inventory(self, snapshot):
+        self.c_info = snapshot['c_info']
+        for m_index, m_snapshot in snapshot['modules'].items():
+            module = self._get_module_class(m_snapshot['m_name'])(parent=self, index=m_index)
+            module.m_name = m_snapshot['m_name']
+            module.m_info = m_snapshot['m_info']
+            module._capabilities = XenaModuleCapabilities()
+            module._capabilities.values.update(m_snapshot['m_capabilities'])
+            for p_index, p_snapshot in m_snapshot['ports'].items():
+                port = module._port_class()(parent=module, index='{}/{}'.format(m_index, p_index))
+                port.p_info = p_snapshot['p_info']
+
     def _traffic_command(self, command, *ports):
         ports = self._get_operation_ports(*ports)
+        self._send_traffic_command(command, None, *ports)
+        self._wait_traffic_state(command, *ports)
+
+    def _send_traffic_command(self, command, start_time, *ports):
+        """
+        :param start_time: None - start/stop now, else chassis time to start/stop at (with c_trafficsync), in seconds
+            since 1970 (XENA_EPOCH + c_time).
+        """
         ports_str = ' '.join([p.index.replace('/', ' ') for p in ports])
-        self.send_command('c_traffic', command, ports_str)
+        if start_time is None:
+            self.send_command('c_traffic', command, ports_str)
+        else:
+            self.send_command('c_trafficsync', command, int(round(start_time - XENA_EPOCH)), ports_str)
+
+    def _wait_traffic_state(self, command, *ports):
         for port in ports:
             port.wait_for_states('p_traffic', 40, command)
 
@@ -529,6 +1144,7 @@ class XenaBaseModule(XenaObject):
 
         super(XenaBaseModule, self).__init__(objType='module', index=str(index), parent=parent)
         self.m_info = None
+        self.m_name = None
         self._capabilities = None
 
     def inventory(self):
@@ -541,7 +1157,7 @@ class XenaBaseModule(XenaObject):
         else:
             m_portcount = int(self.get_attribute('m_cfpconfig').split()[0])
         for p_index in range(m_portcount):
-            XenaPort(parent=self, index='{}/{}'.format(self.index, p_index)).inventory()
+            self._port_class()(parent=self, index='{}/{}'.format(self.index, p_index)).inventory()
 
     def save_config(self, config_file_name, file_mode='w+'):
         """ Save module configuration file (including all ports under module).
@@ -562,56 +1178,25 @@ class XenaBaseModule(XenaObject):
         self.send_command('m_timesync', 'module')
 
     def get_name(self):
-        return self.get_attribute('m_name')
+        """
+        :return: module name. The name is read once, usually during inventory, and cached.
+        """
+        if self.m_name is None:
+            self.m_name = self.get_attribute('m_name')
+        return self.m_name
 
     def is_odin(self):
-        module_name = self.get_name()
-
-        is_odin_module = 1
-
-        m = re.match("Odin", module_name)
-
-        if m == None:
-            is_odin_module = 0
-
-        return is_odin_module
+        return int(self.family == XenaModuleFamily.odin)
 
     def is_loki(self):
-        module_name = self.get_name()
-
-        is_loki_module = 1
-
-        m = re.match("Loki", module_name)
-
-        if m == None:
-            is_loki_module = 0
+        return int(self.family == XenaModuleFamily.loki)
 
-        return is_loki_module
-            
     def is_thor(self):
-        module_name = self.get_name()
-
-        is_thor_module = 1
-
-        m = re.match("Thor", module_name)
-
-        if m == None:
-            is_thor_module = 0
-
-        return is_thor_module
+        return int(self.family == XenaModuleFamily.thor)
 
     def is_chimera(self):
-        module_name = self.get_name()
-        
-        is_chimera_module = 1
+        return int(self.family == XenaModuleFamily.chimera)
 
-        m = re.match("Chimera", module_name)
-
-        if m == None:
-            is_chimera_module = 0
-
-        return is_chimera_module
-    
     #
     # Properties.
     #
@@ -626,39 +1211,50 @@ class XenaBaseModule(XenaObject):
             self.inventory()
         return {int(p.index.split('/')[1]): p for p in self.get_objects_by_type('port')}
 
+    @property
+    def family(self):
+        """
+        :return: module family, classified from the cached module name.
+        :rtype: XenaModuleFamily
+        """
+
+        return XenaModuleFamily.classify(self.get_name())
+
     @property
     def capabilities(self):
+        """
+        :return: module capabilities. Capabilities are read once and cached for the session lifetime.
+        :rtype: XenaModuleCapabilities
+        """
 
-        if self._capabilities == None:
+        if self._capabilities is None:
             self._capabilities = XenaModuleCapabilities()
+            self._capabilities.parse(self.get_attribute('m_capabilities'))
+        return self._capabilities
 
-        ptr = 0
-        capabilities_lst = self.get_attribute('m_capabilities').split() 
+    #
+    # Private methods.
+    #
 
-        for k,v in self._capabilities.values.items():
-            if hasattr(v, "__iter__") :
-                self._capabilities.values[k] = [int(x) for x in capabilities_lst[ptr:ptr+len(v)]]
-                ptr += len(v)
-            else:
-                self._capabilities.values[k] = int(capabilities_lst[ptr])
-                ptr += 1
+    def _port_class(self):
+        """ Chimera modules ports are created as XenaChimeraPort, all other modules ports as XenaPort. """
+        return XenaChimeraPort if self.capabilities.values['ischimera'] else XenaPort
 
-        return self._capabilities
 
-class XenaModuleCapabilities():
+class XenaModuleCapabilities(XenaCapabilities):
     """ Structure that provides the module capabilities """
 
     def __init__(self):
         super(XenaModuleCapabilities, self).__init__()
 
-        self.values = {
-           "canadvtiming"       : 0,
-           "canlocaltimeadjust" : 0,
-           "canmediaconfig"     : 0,
-           "requiresmultiimage" : 0,
-           "ischimera"          : 0
-           #"maxppm"             : 0
-        }
+        self.values.update([
+           ("canadvtiming"       , 0),
+           ("canlocaltimeadjust" , 0),
+           ("canmediaconfig"     , 0),
+           ("requiresmultiimage" , 0),
+           ("ischimera"          , 0)
+           #("maxppm"             , 0)
+        ])
 
 class XenaModule(XenaBaseModule):
     def __init__(self, parent, index):
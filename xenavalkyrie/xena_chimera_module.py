@@ -7,7 +7,7 @@ Classes and utilities that represents a Xena Chimera port.
 import os
 from collections import OrderedDict
 
-from xenavalkyrie.xena_app import XenaBaseModule
+from xenavalkyrie.xena_app import XenaBaseModule, XenaModuleFamily, register_module_class
 
 class XenaChimeraModule(XenaBaseModule):
     def __init__(self, parent, index):
@@ -16,3 +16,6 @@ class XenaChimeraModule(XenaBaseModule):
     # Configure the module SyncE clock source
     def set_synce_source(self, source_idx):
         self.set_attributes(m_txclocksource_new=source_idx)
+
+
+register_module_class(XenaModuleFamily.chimera, XenaChimeraModule)
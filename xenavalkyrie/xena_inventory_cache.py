@@ -0,0 +1,113 @@
+"""
+Classes and utilities to persist Xena chassis inventory on disk.
+
+Reading full chassis inventory (chassis, modules and ports info/config) takes long time on fully loaded chassis.
+The inventory cache saves inventory snapshot per chassis serial number and build so following sessions can rebuild the
+objects tree from the snapshot and only revalidate what changed.
+
+:author: yoram@ignissoft.com
+"""
+
+import os
+import io
+import json
+import tempfile
+from collections import OrderedDict
+
+
+class XenaInventoryCache(object):
+    """ On disk inventory cache, one JSON file per chassis serial number and build. """
+
+    # Attributes that change during normal operation and should not invalidate cached inventory.
+    volatile_attributes = ('_reservation', '_reservedby', 'ps_indices', 'pr_tplds', 'p_receivesync', 'p_traffic')
+
+    # Snapshot format version, snapshots of other versions are ignored.
+    version = 3
+
+    def __init__(self, cache_dir=None):
+        """
+        :param cache_dir: cache directory. If None use <temp dir>/xenavalkyrie.
+        """
+
+        self.cache_dir = cache_dir if cache_dir else os.path.join(tempfile.gettempdir(), 'xenavalkyrie')
+
+    def get_key(self, chassis):
+        """
+        :param chassis: chassis object.
+        :return: cache key - chassis serial number and build.
+        """
+
+        serial = chassis.get_attribute('c_serialno')
+        build = chassis.get_attribute('c_versionno')
+        return '{}_{}'.format(serial, build).replace(' ', '_')
+
+    def get_file_name(self, key):
+        return os.path.join(self.cache_dir, 'xena_inventory_{}.json'.format(key))
+
+    def load(self, key):
+        """ Load inventory snapshot.
+
+        :param key: cache key as returned by get_key.
+        :return: inventory snapshot or None if not found or corrupted.
+        """
+
+        try:
+            with io.open(self.get_file_name(key), encoding='utf-8') as f:
+                snapshot = json.load(f, object_pairs_hook=OrderedDict)
+        except (IOError, OSError, ValueError):
+            return None
+        return snapshot if snapshot.get('version') == self.version else None
+
+    def save(self, key, chassis):
+        """ Save inventory snapshot of the chassis.
+
+        :param key: cache key as returned by get_key.
+        :param chassis: chassis object after modules inventory.
+        """
+
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        with io.open(self.get_file_name(key), 'w', encoding='utf-8') as f:
+            f.write(u'{}'.format(json.dumps(self.snapshot(chassis), indent=1)))
+
+    def invalidate(self, key):
+        """ Delete inventory snapshot.
+
+        :param key: cache key as returned by get_key.
+        """
+
+        if os.path.exists(self.get_file_name(key)):
+            os.remove(self.get_file_name(key))
+
+    @classmethod
+    def snapshot(cls, chassis):
+        """
+        :param chassis: chassis object after modules inventory.
+        :return: inventory snapshot of the chassis as dictionary.
+        """
+
+        snapshot = OrderedDict()
+        snapshot['version'] = cls.version
+        snapshot['c_info'] = chassis.c_info
+        snapshot['modules'] = OrderedDict()
+        for m_index, module in sorted(chassis.modules.items()):
+            m_snapshot = OrderedDict()
+            m_snapshot['m_name'] = module.get_name()
+            m_snapshot['m_info'] = module.m_info
+            m_snapshot['m_capabilities'] = module.capabilities.values
+            m_snapshot['ports'] = OrderedDict()
+            for p_index, port in sorted(module.ports.items()):
+                m_snapshot['ports'][str(p_index)] = OrderedDict(p_info=port.p_info)
+            snapshot['modules'][str(m_index)] = m_snapshot
+        return snapshot
+
+    @classmethod
+    def changed(cls, cached_info, info):
+        """ Compare cached info/config attributes with current attributes, ignoring volatile attributes.
+
+        :return: True if non-volatile attributes changed, else False.
+        """
+
+        def _stable(attributes):
+            return {k: v for k, v in (attributes or {}).items() if not k.endswith(cls.volatile_attributes)}
+        return _stable(cached_info) != _stable(info)
@@ -14,11 +14,27 @@ from trafficgenerator.tgn_object import TgnObject, TgnObjectsDict
 
 logger = logging.getLogger(__name__)
 
+# Clock for intervals and schedules, not affected by system clock updates (python 2.7 falls back to time.time).
+monotonic = getattr(time, 'monotonic', time.time)
+
 
 class XenaAttributeError(TgnError):
     pass
 
 
+class XenaReservationError(TgnError):
+    """ Raised when resources are reserved by other users.
+
+    :ivar conflicts: dictionary {object: reserved by} of all resources reserved by other users.
+    """
+
+    def __init__(self, conflicts):
+        self.conflicts = conflicts
+        super(XenaReservationError, self).__init__(
+            'Resources reserved by other users: {}'.format(', '.join('{} reserved by {}'.format(o, r) for
+                                                                     o, r in conflicts.items())))
+
+
 class XenaObjectsDict(TgnObjectsDict):
 
     def __getitem__(self, key):
@@ -31,6 +47,31 @@ class XenaObjectsDict(TgnObjectsDict):
                     return OrderedDict.__getitem__(self, obj)
 
 
+class XenaCapabilities(object):
+    """ Base class for structures that provide module/port capabilities. """
+
+    def __init__(self):
+        super(XenaCapabilities, self).__init__()
+        self.values = OrderedDict()
+
+    def parse(self, capabilities_str):
+        """ Parse capabilities query output into values.
+
+        :param capabilities_str: m_capabilities/p_capabilities output.
+        """
+
+        ptr = 0
+        capabilities_lst = capabilities_str.split()
+
+        for k, v in self.values.items():
+            if hasattr(v, "__iter__"):
+                self.values[k] = [int(x) for x in capabilities_lst[ptr:ptr+len(v)]]
+                ptr += len(v)
+            else:
+                self.values[k] = int(capabilities_lst[ptr])
+                ptr += 1
+
+
 class XenaObject(TgnObject):
     """ Base class for all Xena objects. """
 
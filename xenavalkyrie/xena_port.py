@@ -11,9 +11,11 @@ import math
 from collections import OrderedDict
 from enum import Enum
 
+from trafficgenerator.tgn_utils import TgnError
+from xenavalkyrie.api.xena_cli import XenaCliWrapper
 from xenavalkyrie.api.xena_socket import XenaCommandError
-from xenavalkyrie.xena_object import XenaObject, XenaObject21
-from xenavalkyrie.xena_stream import XenaStream, XenaStreamState
+from xenavalkyrie.xena_object import XenaObject, XenaObject21, XenaCapabilities
+from xenavalkyrie.xena_stream import XenaStream, XenaStreamState, XenaModifierType
 from xenavalkyrie.xena_filter import XenaFilterState, XenaFilter, XenaMatch, XenaLength
 
 
@@ -23,6 +25,15 @@ class XenaCaptureBufferType(Enum):
     pcap = 2
 
 
+class XenaDatasetSource(Enum):
+    tx_ifg = 'TX_IFG'
+    tx_length = 'TX_LEN'
+    rx_ifg = 'RX_IFG'
+    rx_length = 'RX_LEN'
+    latency = 'RX_LAT'
+    jitter = 'RX_JIT'
+
+
 class XenaBasePort(XenaObject):
     """ Represents Xena port. """
 
@@ -123,6 +134,61 @@ class XenaBasePort(XenaObject):
         stream.set_state(state)
         return stream
 
+    def add_streams(self, specs):
+        """ Add multiple streams.
+
+        Streams indices and TPLD IDs are allocated locally and with CLI API all streams commands are sent in one
+        pipelined burst. All commands are sent even if some of them fail, errors are reported once at the end.
+
+        :param specs: list of dictionaries, one per stream, with any of the following keys:
+            name - stream description.
+            tpld_id - TPLD ID. If not set a unique value will be set.
+            state - new stream state (XenaStreamState), default is enabled.
+            headers - packet headers (pypacker.layer12.ethernet.Ethernet).
+            l4_checksum - True - set tcp/udp checksum flag (see XenaStream.set_packet_headers), default is False.
+            attributes - list of (attribute, value) or ordered dictionary {attribute: value} of additional attributes
+                to set, e.g. ps_ratepps, ps_packetlength, ps_packetlimit.
+        :return: list of newly created streams.
+        :rtype: list of xenavalkyrie.xena_stream.XenaStream
+        :raises XenaCommandError: if any of the commands failed.
+        """
+
+        streams = self.streams
+        next_index = max(streams) + 1 if streams else 0
+        new_streams = []
+        commands = []
+        for index, spec in enumerate(specs, next_index):
+            stream = XenaStream(parent=self, index='{}/{}'.format(self.index, index), name=spec.get('name'))
+            tpld_id = spec['tpld_id'] if spec.get('tpld_id') is not None else XenaStream.next_tpld_id
+            XenaStream.next_tpld_id = max(XenaStream.next_tpld_id + 1, tpld_id + 1)
+            stream._tpld_id = tpld_id
+            if type(self.api) is XenaCliWrapper:
+                commands.append((stream, stream.create_command))
+            else:
+                stream._create()
+            commands.append((stream, 'ps_comment', '"{}"'.format(stream.name)))
+            commands.append((stream, 'ps_tpldid', tpld_id))
+            if spec.get('headers') is not None:
+                for attribute, value in stream._get_packet_headers_attributes(spec['headers'],
+                                                                              spec.get('l4_checksum', False)):
+                    commands.append((stream, attribute, value))
+            attributes = spec.get('attributes', [])
+            for attribute, value in attributes.items() if isinstance(attributes, dict) else attributes:
+                commands.append((stream, attribute, value))
+            commands.append((stream, 'ps_enable', spec.get('state', XenaStreamState.enabled).value))
+            new_streams.append(stream)
+        self.api.send_commands(commands)
+        return new_streams
+
+    def load_modifiers(self, m_type=XenaModifierType.standard):
+        """ Read all modifiers of all port streams in two pipelined batches, see XenaStream.load_modifiers.
+
+        :param m_type: modifier type - standard or extended.
+        :return: dictionary {stream: {index: object}} of the streams modifiers.
+        """
+
+        return XenaStream.load_modifiers(list(self.streams.values()), m_type)
+
     def remove_stream(self, index):
         """ Remove stream.
 
@@ -165,6 +231,45 @@ class XenaBasePort(XenaObject):
         match._create()
         return match
 
+    def add_dataset(self, source=XenaDatasetSource.latency, tpld_id=0, start=0, step=1000, buckets=100, which='TGT'):
+        """ Add histogram dataset and enable it. With CLI API all dataset commands are sent in one pipelined burst.
+
+        :param source: dataset source.
+        :type source: xenavalkyrie.xena_port.XenaDatasetSource
+        :param tpld_id: TPLD ID (which = TGT) or port (which = PORT) to collect samples from.
+        :param start: first bucket start value (nanoseconds for latency/jitter/IFG, bytes for lengths).
+        :param step: bucket width.
+        :param buckets: number of buckets.
+        :param which: TGT - samples of TPLD ID, PORT - samples of the whole port.
+        :return: newly created dataset.
+        :rtype: xenavalkyrie.xena_port.XenaDataset
+        """
+
+        datasets = self.datasets
+        if len(datasets) >= self.capabilities.values['maxdatasets']:
+            raise TgnError('Port {} supports up to {} datasets'.format(self.name,
+                                                                      self.capabilities.values['maxdatasets']))
+        index = max(datasets) + 1 if datasets else 0
+        dataset = XenaDataset(parent=self, index='{}/{}'.format(self.index, index))
+        if type(self.api) is XenaCliWrapper:
+            commands = [(dataset, dataset.create_command)]
+        else:
+            dataset._create()
+            commands = []
+        self.api.send_commands(commands + [(dataset, 'pd_source', source.value, which, tpld_id),
+                                           (dataset, 'pd_range', start, step, buckets),
+                                           (dataset, 'pd_enable', 'on')])
+        dataset.range = (start, step, buckets)
+        return dataset
+
+    def remove_dataset(self, index):
+        """ Remove dataset.
+
+        :param index: index of dataset to remove.
+        """
+
+        self.datasets[index].del_object_from_parent()
+
     def remove_match(self, index):
         """ Remove match.
 
@@ -282,15 +387,8 @@ class XenaBasePort(XenaObject):
         """
 
         if not self.get_objects_by_type('stream'):
-            tpld_ids = []
-            for index in self.get_attribute('ps_indices').split():
-                stream = XenaStream(parent=self, index='{}/{}'.format(self.index, index), name=None)
-                ps_comment = stream.get_attribute('ps_comment')
-                if ps_comment:
-                    stream._data['name'] = ps_comment
-                tpld_ids.append(stream.get_attribute('ps_tpldid'))
-            if tpld_ids:
-                XenaStream.next_tpld_id = max([XenaStream.next_tpld_id] + [int(t) for t in tpld_ids]) + 1
+            self._read_objects_names([XenaStream(parent=self, index='{}/{}'.format(self.index, index), name=None)
+                                      for index in self.get_attribute('ps_indices').split()])
         return {s.id: s for s in self.get_objects_by_type('stream')}
 
     @property
@@ -301,10 +399,23 @@ class XenaBasePort(XenaObject):
         """
 
         # As TPLDs are dynamic we must re-read them each time from the port.
-        self.parent.del_objects_by_type('tpld')
-        for tpld in self.get_attribute('pr_tplds').split():
-            XenaTpld(parent=self, index='{}/{}'.format(self.index, tpld))
-        return {t.id: t for t in self.get_objects_by_type('tpld')}
+        return self.update_tplds(self.get_attribute('pr_tplds'))
+
+    def update_tplds(self, pr_tplds):
+        """ Update TPLDs objects from TPLDs IDs list - create new TPLDs and remove vanished TPLDs, existing TPLDs objects
+            are kept.
+
+        :param pr_tplds: pr_tplds value - space separated list of TPLDs IDs.
+        :return: dictionary {id: object} of all current tplds.
+        """
+
+        tpld_ids = set(int(tpld_id) for tpld_id in pr_tplds.split())
+        tplds = {t.id: t for t in self.get_objects_by_type('tpld')}
+        for tpld_id in set(tplds) - tpld_ids:
+            tplds.pop(tpld_id).del_object_from_parent()
+        for tpld_id in sorted(tpld_ids - set(tplds)):
+            tplds[tpld_id] = XenaTpld(parent=self, index='{}/{}'.format(self.index, tpld_id))
+        return tplds
 
     @property
     def capture(self):
@@ -325,11 +436,8 @@ class XenaBasePort(XenaObject):
         """
 
         if not self.get_objects_by_type('filter'):
-            for index in self.get_attribute('pf_indices').split():
-                filter = XenaFilter(parent=self, index='{}/{}'.format(self.index, index), name=None)
-                pf_comment = filter.get_attribute('pf_comment')
-                if pf_comment:
-                    filter._data['name'] = pf_comment
+            self._read_objects_names([XenaFilter(parent=self, index='{}/{}'.format(self.index, index), name=None)
+                                      for index in self.get_attribute('pf_indices').split()])
         return {f.id: f for f in self.get_objects_by_type('filter')}
 
     @property
@@ -356,26 +464,62 @@ class XenaBasePort(XenaObject):
                 XenaLength(parent=self, index='{}/{}'.format(self.index, index))
         return {l.id: l for l in self.get_objects_by_type('length')}
 
+    @property
+    def datasets(self):
+        """
+        :return: dictionary {id: object} of all histogram datasets.
+        :rtype: dict of (int, xenavalkyrie.xena_port.XenaDataset)
+        """
+
+        if not self.get_objects_by_type('dataset'):
+            for index in self.get_attribute('pd_indices').split():
+                XenaDataset(parent=self, index='{}/{}'.format(self.index, index))
+        return {d.id: d for d in self.get_objects_by_type('dataset')}
+
     @property
     def capabilities(self):
+        """
+        :return: port capabilities. Capabilities are read once and cached for the session lifetime.
+        :rtype: XenaPortCapabilities
+        """
 
-        if self._capabilities == None:
+        if self._capabilities is None:
             self._capabilities = XenaPortCapabilities()
+            self._capabilities.parse(self.get_attribute('p_capabilities'))
+        return self._capabilities
 
+    #
+    # Private methods.
+    #
 
-        ptr = 0
-        capabilities_lst = self.get_attribute('p_capabilities').split() 
+    @staticmethod
+    def _read_objects_names(objects):
+        """ Read comments of new streams and filters objects, and TPLD IDs of new streams, in one pipelined batch.
 
-        for k,v in self._capabilities.values.items():
-            if hasattr(v, "__iter__") :
-                self._capabilities.values[k] = [int(x) for x in capabilities_lst[ptr:ptr+len(v)]]
-                ptr += len(v)
+        :param objects: list of new streams and filters objects, of any port.
+        """
+
+        if not objects:
+            return
+        queries = []
+        for obj in objects:
+            if type(obj) is XenaStream:
+                queries += [(obj, 'ps_comment'), (obj, 'ps_tpldid')]
             else:
-                self._capabilities.values[k] = int(capabilities_lst[ptr])
-                ptr += 1
+                queries.append((obj, 'pf_comment'))
+        values = dict(zip(queries, objects[0].api.get_attribute_multi(queries)))
+        tpld_ids = []
+        for obj in objects:
+            comment = values.get((obj, 'ps_comment'), values.get((obj, 'pf_comment')))
+            if comment:
+                obj._data['name'] = comment
+            if type(obj) is XenaStream:
+                ps_tpldid = values[(obj, 'ps_tpldid')]
+                obj._tpld_id = int(ps_tpldid) if ps_tpldid else -1
+                tpld_ids.append(obj._tpld_id)
+        if tpld_ids:
+            XenaStream.next_tpld_id = max([XenaStream.next_tpld_id] + tpld_ids) + 1
 
-        return self._capabilities
-    
 
 class XenaTpld(XenaObject21):
 
@@ -403,12 +547,57 @@ class XenaTpld(XenaObject21):
         return stats_with_captions
 
 
+class XenaDataset(XenaObject21):
+    """ Histogram dataset - distribution of latency, jitter, IFG or length samples over fixed width buckets.
+
+    Samples below the first bucket are counted in the first bucket and samples above the last bucket are counted in
+    the last bucket.
+    """
+
+    create_command = 'pd_create'
+
+    def __init__(self, parent, index):
+        """
+        :param parent: parent port object.
+        :param index: dataset index in format module/port/dataset.
+        """
+
+        super(self.__class__, self).__init__(objType='dataset', index=index, parent=parent)
+        self.range = None
+
+    def del_object_from_parent(self):
+        self.send_command('pd_delete')
+        super(self.__class__, self).del_object_from_parent()
+
+    def set_state(self, state):
+        """ Enable/disable samples collection.
+
+        :param state: True - enable, False - disable.
+        """
+        self.set_attributes(pd_enable='ON' if state else 'OFF')
+
+    def get_range(self):
+        """
+        :return: (start, step, buckets) of the dataset. Read once and then cached.
+        """
+        if not self.range:
+            self.range = tuple(int(v) for v in self.get_attribute('pd_range').split())
+        return self.range
+
+    def read_samples(self):
+        """
+        :return: list of samples count per bucket.
+        """
+        return self.api.get_stats(self, 'pd_samples')
+
+
 class XenaCapture(XenaObject):
     """ Represents capture parameters, correspond to the Capture panel of the XenaManager, and deal with configuration
         of the capture criteria and inspection of the captured data from a port.
     """
 
     _info_config_commands = ['pc_fullconfig']
+    stats_group = 'pc_stats'
     stats_captions = ['status', 'packets', 'starttime']
 
     def __init__(self, parent):
@@ -420,7 +609,7 @@ class XenaCapture(XenaObject):
         :return: dictionary {stat name: value}.
             Sea XenaCapture.stats_captions.
         """
-        return self.read_stat(XenaCapture.stats_captions, 'pc_stats')
+        return self.read_stat(XenaCapture.stats_captions, self.stats_group)
 
     def get_packets(self, from_index=0, to_index=None, cap_type=XenaCaptureBufferType.text,
                     file_name=None, tshark=None):
@@ -502,7 +691,7 @@ class XenaCapturePacket(XenaObject21):
         super(self.__class__, self).__init__(objType='cappacket', parent=parent, index=index, objRef=obj_ref)
 
 
-class XenaPortCapabilities():
+class XenaPortCapabilities(XenaCapabilities):
     """ Structure that provides the port capabilities """
 
     _MAXTXEQTAPS = 10
@@ -510,77 +699,77 @@ class XenaPortCapabilities():
     def __init__(self):
         super(self.__class__, self).__init__()
 
-        self.values = {
-           "maxspeed"                   : 0,
-           "maxspeedreduction"          : 0,
-           "mininterframegap"           : 0,
-           "maxinterframegap"           : 0,
-           "maxpreamble"                : 0,
-           "maxstreams"                 : 0,
-           "maxpercent"                 : 0,
-           "maxpps"                     : 0,
-           "maxmbps"                    : 0,
-           "maxseed"                    : 0,
-           "maxlimit"                   : 0,
-           "maxburstsize"               : 0,
-           "minpacketlength"            : 0,
-           "maxpacketlength"            : 0,
-           "maxheaderlength"            : 0,
-           "maxprotocols"               : 0,
-           "maxpatternlength"           : 0,
-           "maxmodifiers"               : 0,
-           "maxmodifierbytes"           : 0,
-           "maxrepeat"                  : 0,
-           "maxtid"                     : 0,
-           "maxmanualpackets"           : 0,
-           "maxmatchterms"              : 0,
-           "maxlengthterms"             : 0,
-           "maxors"                     : 0,
-           "maxnots"                    : 0,
-           "maxfilters"                 : 0,
-           "maxcapturepackets"          : 0,
-           "maxtpldstats"               : 0,
-           "maxdatasets"                : 0,
-           "max32bitmodifiers"          : 0,
-           "cansetautoneg"              : 0,
-           "cantcpchecksum"             : 0,
-           "canudpchecksum"             : 0,
-           "caneee"                     : 0,
-           "canhwregaccess"             : 0,
-           "cantcvrmiiregaccess"        : 0,
-           "canadvphyman"               : 0,
-           "canmicrotpld"               : 0,
-           "canmdimdix"                 : 0,
-           "canpayloadmode"             : 0,
-           "cancustomdatafields"        : 0,
-           "canextpayload"              : 0,
-           "candyntrafficchange"        : 0,
-           "cansynctrafficstart"        : 0,
-           "canpfc"                     : 0,
-           "canpcspmaconfig"            : 0,
-           "canfec"                     : 0,
-           "canfecstats"                : 0,
-           "cantxeq"                    : 0,
-           "canrxretune"                : 0,
-           "prbstypessupported"         : 0,
-           "prbsinvertionsupported"     : 0,
-           "prbspolyssupported"         : [0 for _ in range(0,5)],
-           "numserdes"                  : 0,
-           "numlanes"                   : 0,
-           "numtxeqtaps"                : 0,
-           "txeqtapmaxval"              : [0 for _ in range(0, self._MAXTXEQTAPS)],
-           "txeqtapminval"              : [0 for _ in range(0, self._MAXTXEQTAPS)],
-           "maxfeccorrectablesymbols"   : 0,
-           "maxxmitonepacketlength"     : 0,
-           "txruntpacketminlength"      : 0,
-           "rxruntpacketminlength"      : 0,
-           "canmanipulatepreamble"      : 0,
-           "cansetlinktrain"            : 0,
-           "canlinkflap"                : 0,
-           "canautonegbaser"            : 0,
-           "canpmaerrorpulse"           : 0,
-           "ischimera"                  : 0
-        }
+        self.values.update(OrderedDict([
+           ("maxspeed",                   0),
+           ("maxspeedreduction",          0),
+           ("mininterframegap",           0),
+           ("maxinterframegap",           0),
+           ("maxpreamble",                0),
+           ("maxstreams",                 0),
+           ("maxpercent",                 0),
+           ("maxpps",                     0),
+           ("maxmbps",                    0),
+           ("maxseed",                    0),
+           ("maxlimit",                   0),
+           ("maxburstsize",               0),
+           ("minpacketlength",            0),
+           ("maxpacketlength",            0),
+           ("maxheaderlength",            0),
+           ("maxprotocols",               0),
+           ("maxpatternlength",           0),
+           ("maxmodifiers",               0),
+           ("maxmodifierbytes",           0),
+           ("maxrepeat",                  0),
+           ("maxtid",                     0),
+           ("maxmanualpackets",           0),
+           ("maxmatchterms",              0),
+           ("maxlengthterms",             0),
+           ("maxors",                     0),
+           ("maxnots",                    0),
+           ("maxfilters",                 0),
+           ("maxcapturepackets",          0),
+           ("maxtpldstats",               0),
+           ("maxdatasets",                0),
+           ("max32bitmodifiers",          0),
+           ("cansetautoneg",              0),
+           ("cantcpchecksum",             0),
+           ("canudpchecksum",             0),
+           ("caneee",                     0),
+           ("canhwregaccess",             0),
+           ("cantcvrmiiregaccess",        0),
+           ("canadvphyman",               0),
+           ("canmicrotpld",               0),
+           ("canmdimdix",                 0),
+           ("canpayloadmode",             0),
+           ("cancustomdatafields",        0),
+           ("canextpayload",              0),
+           ("candyntrafficchange",        0),
+           ("cansynctrafficstart",        0),
+           ("canpfc",                     0),
+           ("canpcspmaconfig",            0),
+           ("canfec",                     0),
+           ("canfecstats",                0),
+           ("cantxeq",                    0),
+           ("canrxretune",                0),
+           ("prbstypessupported",         0),
+           ("prbsinvertionsupported",     0),
+           ("prbspolyssupported",         [0 for _ in range(0,5)]),
+           ("numserdes",                  0),
+           ("numlanes",                   0),
+           ("numtxeqtaps",                0),
+           ("txeqtapmaxval",              [0 for _ in range(0, self._MAXTXEQTAPS)]),
+           ("txeqtapminval",              [0 for _ in range(0, self._MAXTXEQTAPS)]),
+           ("maxfeccorrectablesymbols",   0),
+           ("maxxmitonepacketlength",     0),
+           ("txruntpacketminlength",      0),
+           ("rxruntpacketminlength",      0),
+           ("canmanipulatepreamble",      0),
+           ("cansetlinktrain",            0),
+           ("canlinkflap",                0),
+           ("canautonegbaser",            0),
+           ("canpmaerrorpulse",           0),
+           ("ischimera",                  0)
+        ]))
 
 class XenaPort(XenaBasePort):
     def __init__(self, parent, index):
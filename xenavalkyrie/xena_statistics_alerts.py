@@ -0,0 +1,225 @@
+"""
+Classes and utilities to evaluate threshold rules on statistics snapshots and report rules transitions.
+
+:author: yoram@ignissoft.com
+"""
+
+import re
+from collections import OrderedDict
+
+import numpy as np
+
+from xenavalkyrie.xena_statistics_view import XenaCountersSelection
+
+
+class XenaAlertRule(object):
+    """ Threshold rule over one counter, for example::
+
+        pr_tplderrors.seq > 0
+        delta(pr_extra.fcserrors) > 10
+        rate(pr_tpldtraffic.pac) < 1000
+
+    Counters are specified as in XenaCountersSelection (group.stat or group_stat). delta() is the counter change since
+    previous sample and rate() is the change per second.
+    """
+
+    operators = OrderedDict((('>=', np.greater_equal), ('<=', np.less_equal), ('==', np.equal),
+                             ('!=', np.not_equal), ('>', np.greater), ('<', np.less)))
+    expression_re = re.compile(r'^\s*(?:(delta|rate)\(\s*(.+?)\s*\)|(.+?))\s*(>=|<=|==|!=|>|<)\s*(\S+)\s*$')
+
+    def __init__(self, expression, callback=None, name=None):
+        """
+        :param expression: rule expression - [delta(|rate(]counter[)] operator threshold.
+        :param callback: function to call on transitions, see XenaAlertEngine.evaluate. Default - engine callback.
+        :param name: rule name. Default - the expression.
+        """
+
+        match = self.expression_re.match(expression)
+        if not match:
+            raise ValueError('Invalid rule expression {}'.format(expression))
+        function, function_counter, counter, operator, threshold = match.groups()
+        group, stats = list(XenaCountersSelection([function_counter or counter]).groups.items())[0]
+        if len(stats) != 1:
+            raise ValueError('Rule expression {} must refer to one counter'.format(expression))
+        self.expression = expression
+        self.name = name if name else expression
+        self.callback = callback
+        self.function = function
+        self.group = group
+        self.stat = stats[0]
+        self.operator = operator
+        self.threshold = float(threshold)
+
+    def __repr__(self):
+        return self.name
+
+
+class XenaAlertEvent(object):
+    """ Rule transition of one object. """
+
+    def __init__(self, rule, obj, value, active, timestamp):
+        """
+        :param rule: the rule.
+        :param obj: the object (port/stream/tpld) that started or stopped violating the rule.
+        :param value: the evaluated value (counter, delta or rate).
+        :param active: True - object started violating the rule, False - object stopped violating the rule.
+        :param timestamp: sample time stamp.
+        """
+
+        self.rule = rule
+        self.obj = obj
+        self.value = value
+        self.active = active
+        self.timestamp = timestamp
+
+    def __repr__(self):
+        return '{} {} {} (value {})'.format(self.obj.name, self.rule, 'active' if self.active else 'cleared',
+                                           self.value)
+
+
+class XenaAlertEngine(object):
+    """ Evaluate rules on statistics snapshots.
+
+    Callbacks are fired only on transitions - when an object starts violating a rule (active) and when it stops
+    (cleared).
+    """
+
+    def __init__(self, rules=(), callback=None):
+        """
+        :param rules: list of XenaAlertRule or rules expressions.
+        :param callback: default function to call on transitions, callback(event).
+        """
+
+        self.callback = callback
+        self.rules = []
+        self._compiled = None
+        self._layout = None
+        self._index = {}
+        self._previous_values = {}
+        self._previous_timestamp = None
+        self._active = {}
+        for rule in rules:
+            self.add_rule(rule)
+
+    def add_rule(self, rule, callback=None):
+        """
+        :param rule: XenaAlertRule or rule expression.
+        :param callback: rule callback, only if rule is expression.
+        :return: the added rule.
+        """
+
+        rule = rule if isinstance(rule, XenaAlertRule) else XenaAlertRule(rule, callback)
+        self.rules.append(rule)
+        self._compiled = None
+        return rule
+
+    def remove_rule(self, rule):
+        self.rules.remove(rule)
+        self._compiled = None
+
+    def get_active(self):
+        """
+        :return: dictionary {rule: list of objects currently violating the rule}.
+        """
+
+        active = OrderedDict((rule, []) for rule in self.rules)
+        for key, (objects, rules, _, state) in self._active.items():
+            for i, j in zip(*np.nonzero(state)):
+                active[rules[i]].append(objects[j])
+        return active
+
+    def evaluate(self, snapshot):
+        """ Evaluate all rules on statistics snapshot and fire callbacks of all transitions.
+
+        :type snapshot: xenavalkyrie.xena_statistics_view.XenaStatsSnapshot
+        :return: list of transitions.
+        :rtype: list of XenaAlertEvent
+        """
+
+        if self._compiled is None:
+            self._compile()
+
+        timestamp = snapshot.timestamp
+        interval = timestamp - self._previous_timestamp if self._previous_timestamp is not None else None
+        # Objects that have each counter are indexed once and re-indexed only when the snapshot objects change.
+        layout = tuple(snapshot.statistics)
+        if layout != self._layout:
+            self._index = {}
+            self._layout = layout
+        counters_values = {}
+        events = []
+        for (function, group, stat, operator), (rules, thresholds) in self._compiled.items():
+            if (group, stat) not in counters_values:
+                counters_values[(group, stat)] = self._get_values(snapshot, group, stat)
+            objects, refs, values, previous = counters_values[(group, stat)]
+            if function:
+                if interval is None:
+                    continue
+                values = values - previous
+                if function == 'rate':
+                    values = values / interval if interval > 0 else np.zeros(len(values))
+            state = XenaAlertRule.operators[operator](values[np.newaxis, :], thresholds[:, np.newaxis])
+            previous_state = self._get_previous_state((function, group, stat, operator), refs, len(rules))
+            self._active[(function, group, stat, operator)] = (objects, rules, refs, state)
+            for i, j in zip(*np.nonzero(state != previous_state)):
+                events.append(XenaAlertEvent(rules[i], objects[j], values[j].item(), bool(state[i, j]), timestamp))
+
+        for (group, stat), (_, refs, values, _) in counters_values.items():
+            self._previous_values[(group, stat)] = (refs, values)
+        self._previous_timestamp = timestamp
+
+        for event in events:
+            callback = event.rule.callback if event.rule.callback else self.callback
+            if callback:
+                callback(event)
+        return events
+
+    __call__ = evaluate
+
+    #
+    # Private methods.
+    #
+
+    def _compile(self):
+        per_key_rules = OrderedDict()
+        for rule in self.rules:
+            per_key_rules.setdefault((rule.function, rule.group, rule.stat, rule.operator), []).append(rule)
+        self._compiled = OrderedDict((key, (rules, np.array([r.threshold for r in rules])))
+                                     for key, rules in per_key_rules.items())
+        self._active = {}
+
+    def _get_values(self, snapshot, group, stat):
+        """ Gather counter values of all objects into one array, objects are indexed once per snapshot layout. """
+
+        if (group, stat) not in self._index:
+            objects = [obj for obj, obj_stats in snapshot.statistics.items()
+                       if group in obj_stats and stat in obj_stats[group]]
+            self._index[(group, stat)] = (objects, [obj.ref for obj in objects])
+        objects, refs = self._index[(group, stat)]
+        statistics = snapshot.statistics
+        values = np.fromiter((statistics[obj][group][stat] for obj in objects), dtype=float, count=len(objects))
+        previous_refs, previous_values = self._previous_values.get((group, stat), (None, None))
+        if previous_refs == refs:
+            return objects, refs, values, previous_values
+        # Objects changed - align previous values by reference, new objects get their current values (zero delta).
+        previous = values.copy()
+        if previous_refs:
+            previous_index = {ref: j for j, ref in enumerate(previous_refs)}
+            for j, ref in enumerate(refs):
+                if ref in previous_index:
+                    previous[j] = previous_values[previous_index[ref]]
+        return objects, refs, values, previous
+
+    def _get_previous_state(self, key, refs, rules_count):
+        """ Return previous state aligned to current objects, new objects are not active. """
+
+        previous_state = np.zeros((rules_count, len(refs)), dtype=bool)
+        if key in self._active:
+            _, _, previous_refs, state = self._active[key]
+            if previous_refs == refs:
+                return state
+            index = {ref: j for j, ref in enumerate(previous_refs)}
+            for j, ref in enumerate(refs):
+                if ref in index:
+                    previous_state[:, j] = state[:, index[ref]]
+        return previous_state
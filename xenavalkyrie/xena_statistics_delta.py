@@ -0,0 +1,206 @@
+"""
+Classes and utilities to calculate counters deltas and accurate sub second rates between statistics snapshots.
+
+:author: yoram@ignissoft.com
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+from xenavalkyrie.xena_object import XenaObjectsDict
+
+
+class XenaGroupDelta(object):
+    """ Deltas of one statistics group between two snapshots. """
+
+    byte_counters = ('bytes', 'byt')
+    packet_counters = ('packets', 'pac')
+
+    def __init__(self, name, objects, captions, values, deltas, cleared, interval):
+        """
+        :param name: statistics group name.
+        :param objects: list of objects (rows).
+        :param captions: list of counters names (columns).
+        :param values: array (object, counter) of current values.
+        :param deltas: array (object, counter) of deltas from previous snapshot.
+        :param cleared: array (object) of True for objects whose counters were cleared since previous snapshot.
+        :param interval: seconds between the snapshots.
+        """
+
+        self.name = name
+        self.objects = objects
+        self.captions = captions
+        self.values = values
+        self.deltas = deltas
+        self.cleared = cleared
+        self.interval = interval
+
+    def delta(self, caption):
+        """
+        :return: array (object) of the counter delta.
+        """
+        return self.deltas[:, self.captions.index(caption)]
+
+    def rate(self, caption):
+        """
+        :return: array (object) of the counter change per second.
+        """
+        return self.delta(caption) / self.interval if self.interval > 0 else np.zeros(len(self.objects))
+
+    @property
+    def bps(self):
+        """
+        :return: array (object) of bits per second calculated from bytes counter.
+        """
+        return 8 * self.rate(self._caption(self.byte_counters))
+
+    @property
+    def pps(self):
+        """
+        :return: array (object) of packets per second calculated from packets counter.
+        """
+        return self.rate(self._caption(self.packet_counters))
+
+    def as_dict(self, caption):
+        """
+        :return: dictionary {object: delta} of the counter.
+        """
+        return XenaObjectsDict(zip(self.objects, self.delta(caption).tolist()))
+
+    def _caption(self, options):
+        return next(c for c in options if c in self.captions)
+
+
+class XenaStatsDelta(object):
+    """ Deltas of all statistics groups between two snapshots. """
+
+    def __init__(self, groups, interval, timestamp):
+        """
+        :param groups: dictionary {group name: XenaGroupDelta}.
+        :param interval: seconds between the snapshots.
+        :param timestamp: current snapshot time stamp.
+        """
+
+        self.groups = groups
+        self.interval = interval
+        self.timestamp = timestamp
+
+    def __getitem__(self, name):
+        return self.groups[name]
+
+    def stream_loss(self, tx_group='pt_stream', rx_group='pr_tpldtraffic'):
+        """ Calculate loss per stream - TX stream packets against RX packets of all TPLDs with the stream TPLD ID.
+
+        Requires snapshots with streams and TPLDs statistics, see XenaSession.read_streams_snapshot.
+
+        :return: dictionary {stream: {'tx': packets, 'rx': packets, 'lost': packets, 'loss': lost / tx}}
+        """
+
+        tx = self.groups[tx_group]
+        rx = self.groups.get(rx_group)
+        rx_packets = {}
+        if rx:
+            for tpld, packets in zip(rx.objects, rx.delta(rx._caption(rx.packet_counters)).tolist()):
+                rx_packets[tpld.id] = rx_packets.get(tpld.id, 0) + packets
+
+        loss = XenaObjectsDict()
+        for stream, tx_packets in zip(tx.objects, tx.delta(tx._caption(tx.packet_counters)).tolist()):
+            stream_rx = rx_packets.get(stream.tpld_id, 0)
+            loss[stream] = OrderedDict((('tx', tx_packets), ('rx', stream_rx), ('lost', tx_packets - stream_rx),
+                                        ('loss', float(tx_packets - stream_rx) / tx_packets if tx_packets else 0.0)))
+        return loss
+
+
+class XenaStatsDeltaEngine(object):
+    """ Calculate deltas between consecutive statistics snapshots.
+
+    Counters that go backwards are either wrapped (previous value in the upper half of the counter range) or cleared
+    (e.g. pt_clear/pr_clear or port reset), in which case the delta is the current value.
+    """
+
+    def __init__(self, counter_bits=64):
+        """
+        :param counter_bits: counters width in bits, for wrap detection.
+        """
+
+        self.modulus = 2 ** counter_bits
+        self.previous = None
+        self.last_delta = None
+
+    def reset(self):
+        """ Forget previous snapshot, next update will not return deltas. """
+        self.previous = None
+        self.last_delta = None
+
+    def update(self, snapshot):
+        """ Calculate deltas from previous snapshot.
+
+        :type snapshot: xenavalkyrie.xena_statistics_view.XenaStatsSnapshot
+        :return: deltas from previous snapshot or None for first snapshot.
+        :rtype: XenaStatsDelta
+        """
+
+        current = self._to_arrays(snapshot)
+        delta = None
+        if self.previous:
+            previous, previous_timestamp = self.previous
+            interval = snapshot.timestamp - previous_timestamp
+            groups = OrderedDict()
+            for name, (objects, captions, values) in current.items():
+                previous_values = self._align(previous.get(name), objects, values)
+                deltas, cleared = self._delta(previous_values, values)
+                groups[name] = XenaGroupDelta(name, objects, captions, values, deltas, cleared, interval)
+            delta = XenaStatsDelta(groups, interval, snapshot.timestamp)
+        self.previous = (current, snapshot.timestamp)
+        self.last_delta = delta
+        return delta
+
+    __call__ = update
+
+    #
+    # Private methods.
+    #
+
+    def _to_arrays(self, snapshot):
+        per_group = OrderedDict()
+        for obj, obj_stats in snapshot.statistics.items():
+            for group_name, group_stats in obj_stats.items():
+                per_group.setdefault(group_name, (list(group_stats.keys()), OrderedDict()))[1][obj] = group_stats
+        arrays = OrderedDict()
+        for group_name, (captions, rows) in per_group.items():
+            values = np.array([[row[c] for c in captions] for row in rows.values()], dtype=np.int64)
+            arrays[group_name] = (list(rows.keys()), captions, values.reshape(len(rows), len(captions)))
+        return arrays
+
+    def _align(self, previous, objects, values):
+        """ Return previous values ordered as current objects, new objects get their current values (zero delta). """
+
+        if previous is None:
+            return values.copy()
+        # Align by reference as dynamic objects (TPLDs) may be re-created between snapshots.
+        previous_objects, _, previous_values = previous
+        previous_refs = [obj.ref for obj in previous_objects]
+        refs = [obj.ref for obj in objects]
+        if previous_refs == refs:
+            return previous_values
+        index = {ref: i for i, ref in enumerate(previous_refs)}
+        aligned = values.copy()
+        for i, ref in enumerate(refs):
+            if ref in index:
+                aligned[i] = previous_values[index[ref]]
+        return aligned
+
+    def _delta(self, previous, current):
+        # uint64 subtraction wraps modulo 2^64, mask to the counters width.
+        previous = previous.view(np.uint64)
+        current = current.view(np.uint64)
+        deltas = current - previous
+        if self.modulus < 2 ** 64:
+            deltas &= np.uint64(self.modulus - 1)
+        backwards = current < previous
+        wrapped = backwards & (previous >= np.uint64(self.modulus // 2))
+        cleared = backwards & ~wrapped
+        deltas = np.where(cleared, current, deltas)
+        return deltas.astype(np.int64), cleared.any(axis=1)
+
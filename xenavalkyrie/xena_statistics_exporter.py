@@ -0,0 +1,168 @@
+"""
+Classes and utilities to export live statistics over local HTTP endpoint in Prometheus text exposition format.
+
+The exporter is a XenaStatsSampler sink - each sample is rendered once and cached, and all scrapes are served from the
+cached text so any number of scrapers add no load on the chassis. The library transport metrics (commands, round trips
+etc.) are added on each scrape, from local counters only.
+
+Typical usage::
+
+    sampler = XenaStatsSampler(session, interval=1,
+                               read=lambda: session.read_counters_snapshot(['pr_total', 'pt_total', 'pt_stream',
+                                                                            'pr_tpldtraffic', 'pr_tpldlatency']))
+    exporter = XenaStatsExporter(session, port=9110)
+    sampler.add_sink(exporter)
+    exporter.start()
+    sampler.start()
+
+:author: yoram@ignissoft.com
+"""
+
+import re
+import threading
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+
+class XenaStatsExporter(object):
+    """ Embedded HTTP exporter of the latest statistics sample. """
+
+    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self, session, host='127.0.0.1', port=9110, prefix='xena'):
+        """
+        :param session: session to export its transport metrics.
+        :type session: xenavalkyrie.xena_app.XenaSession
+        :param host: local address to listen on.
+        :param port: TCP port to listen on, 0 - any free port (see port attribute after start).
+        :param prefix: metrics names prefix.
+        """
+
+        self.session = session
+        self.logger = session.logger
+        self.host = host
+        self.port = port
+        self.prefix = prefix
+        self.scrapes = 0
+        self._samples_text = ''
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def __call__(self, snapshot):
+        """ Render and cache new sample, so the exporter can be used as XenaStatsSampler sink.
+
+        :type snapshot: xenavalkyrie.xena_statistics_view.XenaStatsSnapshot
+        """
+
+        text = self.render_snapshot(snapshot)
+        with self._lock:
+            self._samples_text = text
+
+    def start(self):
+        """ Start serving /metrics in background thread. """
+
+        exporter = self
+
+        class _Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = exporter.get_metrics().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', exporter.content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                exporter.logger.debug('Exporter - ' + format % args)
+
+        self._server = _XenaHTTPServer((self.host, self.port), _Handler)
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name='XenaStatsExporter')
+        self._thread.daemon = True
+        self._thread.start()
+        self.logger.info('Statistics exporter listening on http://{}:{}/metrics'.format(self.host, self.port))
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+    def get_metrics(self):
+        """
+        :return: latest sample and current transport metrics in text exposition format.
+        """
+
+        with self._lock:
+            self.scrapes += 1
+            samples_text = self._samples_text
+        return samples_text + self.render_transport()
+
+    def render_snapshot(self, snapshot):
+        """
+        :type snapshot: xenavalkyrie.xena_statistics_view.XenaStatsSnapshot
+        :return: snapshot in text exposition format.
+        """
+
+        families = {}
+        for obj, obj_stats in snapshot.statistics.items():
+            labels = self._labels(obj)
+            for group_name, group_stats in obj_stats.items():
+                for stat_name, value in group_stats.items():
+                    name = self._metric_name(group_name, stat_name)
+                    families.setdefault(name, []).append('{}{{{}}} {}'.format(name, labels, value))
+
+        lines = []
+        for name in sorted(families):
+            lines.append('# TYPE {} untyped'.format(name))
+            lines.extend(families[name])
+        lines.append('# TYPE {}_sample_timestamp_seconds gauge'.format(self.prefix))
+        lines.append('{}_sample_timestamp_seconds {:.6f}'.format(self.prefix, snapshot.timestamp))
+        lines.append('# TYPE {}_sample_duration_seconds gauge'.format(self.prefix))
+        lines.append('{}_sample_duration_seconds {:.6f}'.format(self.prefix, snapshot.received - snapshot.sent))
+        return '\n'.join(lines) + '\n'
+
+    def render_transport(self):
+        """
+        :return: transport metrics of all connections in text exposition format.
+        """
+
+        families = {}
+        for connection, metrics in self.session.api.get_transport_metrics().items():
+            connection_name = getattr(connection, 'name', connection)
+            for metric, value in metrics.items():
+                name = '{}_transport_{}_total'.format(self.prefix, metric)
+                families.setdefault(name, []).append('{}{{connection="{}"}} {}'.format(name, connection_name, value))
+        lines = []
+        for name in sorted(families):
+            lines.append('# TYPE {} counter'.format(name))
+            lines.extend(families[name])
+        return '\n'.join(lines) + '\n' if lines else ''
+
+    #
+    # Private methods.
+    #
+
+    def _metric_name(self, group_name, stat_name):
+        return re.sub('[^a-zA-Z0-9_]', '_', '{}_{}_{}'.format(self.prefix, group_name, stat_name))
+
+    def _labels(self, obj):
+        obj_type = obj.obj_type()
+        if obj_type == 'port':
+            return 'port="{}"'.format(obj.name)
+        return 'port="{}",{}="{}"'.format(obj.parent.name, obj_type, obj.id)
+
+
+class _XenaHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
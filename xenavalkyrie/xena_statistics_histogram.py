@@ -0,0 +1,79 @@
+"""
+Classes and utilities to calculate percentiles from histogram datasets (see XenaDataset).
+
+:author: yoram@ignissoft.com
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+from xenavalkyrie.xena_object import XenaObjectsDict
+
+
+class XenaHistograms(object):
+    """ Histograms of multiple datasets with the same range, as one (dataset, bucket) array. """
+
+    def __init__(self, samples):
+        """
+        :param samples: dictionary {dataset: list of samples count per bucket} as returned by read_datasets.
+            All datasets must have the same range.
+        """
+
+        self.datasets = list(samples.keys())
+        ranges = set(d.get_range() for d in self.datasets)
+        if len(ranges) != 1:
+            raise ValueError('Datasets must have one common range, got {}'.format(sorted(ranges)))
+        self.start, self.step, buckets = ranges.pop()
+        self.counts = np.array([samples[d] for d in self.datasets], dtype=np.int64).reshape(len(self.datasets), buckets)
+
+    @property
+    def edges(self):
+        """
+        :return: array of buckets edges, buckets + 1 values.
+        """
+        return self.start + self.step * np.arange(self.counts.shape[1] + 1)
+
+    @property
+    def totals(self):
+        """
+        :return: array (dataset) of total samples per dataset.
+        """
+        return self.counts.sum(axis=1)
+
+    def percentiles(self, percentiles=(50, 99, 99.9)):
+        """
+        :param percentiles: requested percentiles.
+        :return: array (dataset, percentile) of percentiles per dataset, nan for datasets without samples.
+        """
+        return self._percentiles(self.counts, percentiles)
+
+    def merged_percentiles(self, percentiles=(50, 99, 99.9)):
+        """
+        :param percentiles: requested percentiles.
+        :return: dictionary {percentile: value} of all datasets merged into one histogram.
+        """
+        values = self._percentiles(self.counts.sum(axis=0)[np.newaxis, :], percentiles)[0]
+        return OrderedDict(zip(percentiles, values.tolist()))
+
+    def as_dict(self, percentiles=(50, 99, 99.9)):
+        """
+        :param percentiles: requested percentiles.
+        :return: dictionary {dataset: {percentile: value}}.
+        """
+
+        values = self.percentiles(percentiles).tolist()
+        return XenaObjectsDict((d, OrderedDict(zip(percentiles, v))) for d, v in zip(self.datasets, values))
+
+    def _percentiles(self, counts, percentiles):
+        cumulative = counts.cumsum(axis=1)
+        totals = cumulative[:, -1]
+        targets = totals[:, np.newaxis] * np.asarray(percentiles, dtype=float)[np.newaxis, :] / 100
+        buckets = (cumulative[:, np.newaxis, :] >= targets[:, :, np.newaxis]).argmax(axis=2)
+        rows = np.arange(counts.shape[0])[:, np.newaxis]
+        below = np.where(buckets > 0, cumulative[rows, np.maximum(buckets - 1, 0)], 0)
+        in_bucket = counts[rows, buckets]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fraction = np.where(in_bucket > 0, (targets - below) / in_bucket, 0)
+        values = self.start + self.step * (buckets + fraction)
+        return np.where(totals[:, np.newaxis] > 0, values, np.nan)
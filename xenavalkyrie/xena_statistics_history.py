@@ -0,0 +1,212 @@
+"""
+Classes and utilities to keep long statistics histories as ring buffer of changed counters, optionally spilled to file.
+
+:author: yoram@ignissoft.com
+"""
+
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class XenaStatsHistory(object):
+    """ Delta-encoded ring buffer of statistics samples.
+
+    Each sample is stored as the list of counters that changed since the previous sample (column, delta). When the ring
+    is full the oldest samples are folded into the base state (the full state of the oldest retained sample) and
+    dropped. Samples index (times, entries offsets and counts) grows as needed up to max_samples.
+    """
+
+    entry_dtype = np.dtype([('column', np.int32), ('delta', np.int64)])
+
+    def __init__(self, capacity=1024 * 1024, max_samples=7 * 24 * 3600, spill_file=None, samples_capacity=1024):
+        """
+        :param capacity: maximum number of changed counters values kept in the ring.
+        :param max_samples: maximum number of samples kept in the ring.
+        :param spill_file: if set, keep the ring entries in memory-mapped file instead of memory.
+        :param samples_capacity: initial number of samples to allocate, the samples index grows automatically.
+        """
+
+        self.capacity = capacity
+        self.max_samples = max_samples
+        self.spill_file = spill_file
+        if spill_file:
+            self._entries = np.memmap(spill_file, dtype=self.entry_dtype, mode='w+', shape=(capacity,))
+        else:
+            self._entries = np.zeros(capacity, dtype=self.entry_dtype)
+        samples_capacity = min(samples_capacity, max_samples)
+        self._times = np.zeros(samples_capacity)
+        self._offsets = np.zeros(samples_capacity, dtype=np.int64)
+        self._counts = np.zeros(samples_capacity, dtype=np.int64)
+        self._first_sample = 0
+        self._samples = 0
+        self._first_entry = 0
+        self._entries_count = 0
+        self.columns = []
+        self.column_index = {}
+        self._base = np.zeros(0, dtype=np.int64)
+        self._state = np.zeros(0, dtype=np.int64)
+
+    def __len__(self):
+        return self._samples
+
+    def add_stats(self, statistics, timestamp=None):
+        """ Append sample to the history, only counters that changed since the previous sample are stored.
+
+        :param statistics: dictionary {object: {group name: {stat name: value}}} as returned by
+            port.read_port_stats, XenaTpld.read_stats, XenaSession.read_stats etc. Counters missing from the sample keep
+            their previous value.
+        :param timestamp: sample time. Default - now.
+        """
+
+        timestamp = time.time() if timestamp is None else timestamp
+        columns = []
+        values = []
+        for obj, obj_stats in statistics.items():
+            ref = getattr(obj, 'ref', obj)
+            for group_name, group_stats in obj_stats.items():
+                for stat_name, value in group_stats.items():
+                    columns.append(self._get_column((ref, group_name, stat_name)))
+                    values.append(value)
+
+        if len(self._state) < len(self.columns):
+            self._state = np.append(self._state, np.zeros(len(self.columns) - len(self._state), dtype=np.int64))
+        sample = self._state.copy()
+        sample[columns] = values
+        changed = np.flatnonzero(sample != self._state)
+        self._append(timestamp, changed, sample[changed] - self._state[changed])
+        self._state = sample
+
+    def add_snapshot(self, snapshot):
+        """ Add one sample from statistics snapshot.
+
+        :type snapshot: xenavalkyrie.xena_statistics_view.XenaStatsSnapshot
+        """
+        self.add_stats(snapshot.statistics, snapshot.timestamp)
+
+    __call__ = add_snapshot
+
+    @property
+    def timestamps(self):
+        """
+        :return: array of all retained samples times, oldest first.
+        """
+        return self._times[self._sample_positions()]
+
+    @property
+    def entries(self):
+        """
+        :return: number of changed counters values currently kept in the ring.
+        """
+        return self._entries_count
+
+    def reconstruct(self, start=None, end=None, columns=None):
+        """ Reconstruct full counters values of all samples in time range.
+
+        :param start: range start time. Default - oldest retained sample.
+        :param end: range end time. Default - latest sample.
+        :param columns: list of (object ref, group name, stat name) to reconstruct. Default - all columns.
+        :return: (array of samples times, array (time, column) of counters values).
+        """
+
+        column_indices = [self.column_index[c] for c in columns] if columns else slice(None)
+        state = np.zeros(len(self.columns), dtype=np.int64)
+        state[:len(self._base)] = self._base
+        times = []
+        rows = []
+        for position in self._sample_positions():
+            timestamp = self._times[position]
+            if end is not None and timestamp > end:
+                break
+            entries = self._entries[self._entry_positions(self._offsets[position], self._counts[position])]
+            state[entries['column']] += entries['delta']
+            if start is None or timestamp >= start:
+                times.append(timestamp)
+                rows.append(state[column_indices].copy())
+        width = len(columns) if columns else len(self.columns)
+        return np.array(times), np.array(rows, dtype=np.int64).reshape(len(rows), width)
+
+    def reconstruct_stats(self, timestamp=None):
+        """ Reconstruct one sample in read_stats format.
+
+        :param timestamp: sample time, the latest sample at or before this time is returned. Default - latest sample.
+        :return: dictionary {object ref: {group name: {stat name: value}}}.
+        """
+
+        times, values = self.reconstruct(None, timestamp)
+        statistics = OrderedDict()
+        if not len(times):
+            return statistics
+        for (ref, group_name, stat_name), value in zip(self.columns, values[-1].tolist()):
+            statistics.setdefault(ref, OrderedDict()).setdefault(group_name, OrderedDict())[stat_name] = value
+        return statistics
+
+    def close(self):
+        """ Flush memory-mapped ring to file. """
+        if self.spill_file:
+            self._entries.flush()
+
+    #
+    # Private methods.
+    #
+
+    def _get_column(self, key):
+        if key not in self.column_index:
+            self.column_index[key] = len(self.columns)
+            self.columns.append(key)
+        return self.column_index[key]
+
+    def _append(self, timestamp, columns, deltas):
+        count = len(columns)
+        if count > self.capacity:
+            raise ValueError('Sample with {} changed counters exceeds history capacity {}'.format(count, self.capacity))
+        while self._samples and (self._samples == self.max_samples or
+                                 self._entries_count + count > self.capacity):
+            self._drop_oldest()
+        if self._samples == len(self._times):
+            self._grow()
+
+        offset = (self._first_entry + self._entries_count) % self.capacity
+        positions = self._entry_positions(offset, count)
+        self._entries['column'][positions] = columns
+        self._entries['delta'][positions] = deltas
+        self._entries_count += count
+
+        position = (self._first_sample + self._samples) % len(self._times)
+        self._times[position] = timestamp
+        self._offsets[position] = offset
+        self._counts[position] = count
+        self._samples += 1
+
+    def _drop_oldest(self):
+        """ Fold oldest sample into the base state and remove it from the ring. """
+
+        position = self._first_sample
+        count = self._counts[position]
+        entries = self._entries[self._entry_positions(self._offsets[position], count)]
+        if len(self._base) < len(self.columns):
+            self._base = np.append(self._base, np.zeros(len(self.columns) - len(self._base), dtype=np.int64))
+        np.add.at(self._base, entries['column'], entries['delta'])
+        self._first_entry = (self._first_entry + count) % self.capacity
+        self._entries_count -= count
+        self._first_sample = (self._first_sample + 1) % len(self._times)
+        self._samples -= 1
+
+    def _grow(self):
+        """ Double the samples index (up to max_samples) and unroll the ring so the oldest sample is first. """
+
+        positions = self._sample_positions()
+        samples_capacity = min(max(2 * len(self._times), 1), self.max_samples)
+        for name in ('_times', '_offsets', '_counts'):
+            array = getattr(self, name)
+            grown = np.zeros(samples_capacity, dtype=array.dtype)
+            grown[:self._samples] = array[positions]
+            setattr(self, name, grown)
+        self._first_sample = 0
+
+    def _entry_positions(self, offset, count):
+        return (offset + np.arange(count)) % self.capacity
+
+    def _sample_positions(self):
+        return (self._first_sample + np.arange(self._samples)) % len(self._times)
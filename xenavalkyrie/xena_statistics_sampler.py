@@ -0,0 +1,119 @@
+"""
+Classes and utilities to sample statistics periodically in background.
+
+The sampler reads statistics snapshots on fixed monotonic schedule - sample n is taken at start + n * interval
+regardless of how long the reads take, so the samples do not drift. Samples that could not be taken on time (read took
+longer than the interval) are skipped and reported as overruns.
+
+:author: yoram@ignissoft.com
+"""
+
+import threading
+
+from xenavalkyrie.xena_object import monotonic
+
+
+class XenaStatsSampler(object):
+    """ Background statistics sampler.
+
+    Each sample is XenaStatsSnapshot (with sent/received time stamps) and is pushed to all sinks. Sink is any callable
+    that accepts snapshot, e.g. XenaStatsStore.add_snapshot.
+    """
+
+    def __init__(self, session, interval=1, ports=None, read=None):
+        """
+        :param session: session to sample.
+        :type session: xenavalkyrie.xena_app.XenaSession
+        :param interval: sampling interval in seconds.
+        :param ports: list of ports to sample. Default - all session ports.
+        :param read: function that returns XenaStatsSnapshot. Default - session.read_stats_snapshot(*ports).
+        """
+
+        self.session = session
+        self.logger = session.logger
+        self.interval = interval
+        self.ports = ports if ports else []
+        self.read = read if read else lambda: self.session.read_stats_snapshot(*self.ports)
+        self.sinks = []
+        self.samples = 0
+        self.overruns = 0
+        self.errors = 0
+        self.last_snapshot = None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def add_sink(self, sink):
+        """
+        :param sink: callable that accepts XenaStatsSnapshot.
+        """
+        self.sinks.append(sink)
+
+    def remove_sink(self, sink):
+        self.sinks.remove(sink)
+
+    def start(self):
+        """ Start sampling in background thread. First sample is taken immediately. """
+
+        if self.is_running():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='XenaStatsSampler')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """ Stop sampling and wait for the sampling thread to finish (the current sample is completed).
+
+        :param timeout: maximum seconds to wait for the thread. None - wait forever.
+        """
+
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    #
+    # Private methods.
+    #
+
+    def _run(self):
+        start = monotonic()
+        sample = 0
+        while not self._stop_event.is_set():
+            self._sample()
+            sample += 1
+            now = monotonic()
+            deadline = start + sample * self.interval
+            if now > deadline:
+                missed = int((now - deadline) // self.interval) + 1
+                self.overruns += missed
+                self.logger.warning('Statistics sample took {:.3f} seconds, skipped {} sample(s) of {} seconds'.
+                                    format(now - (deadline - self.interval), missed, self.interval))
+                sample += missed
+                deadline = start + sample * self.interval
+            self._stop_event.wait(deadline - monotonic())
+
+    def _sample(self):
+        try:
+            snapshot = self.read()
+        except Exception as e:
+            self.errors += 1
+            self.logger.error('Failed to read statistics - {}'.format(e))
+            return
+        self.samples += 1
+        self.last_snapshot = snapshot
+        for sink in self.sinks:
+            try:
+                sink(snapshot)
+            except Exception as e:
+                self.logger.error('Statistics sink {} failed - {}'.format(sink, e))
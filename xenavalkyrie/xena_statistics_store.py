@@ -0,0 +1,210 @@
+"""
+Classes and utilities to keep statistics time series as growable (time, object, counter) NumPy arrays per group.
+
+:author: yoram@ignissoft.com
+"""
+
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class XenaStatsGroup(object):
+    """ Time series of one statistics group (e.g. pr_total) for a list of objects. """
+
+    def __init__(self, name, captions, capacity=1024):
+        """
+        :param name: statistics group name.
+        :param captions: counters names.
+        :param capacity: initial number of samples to allocate, the group grows automatically.
+        """
+
+        self.name = name
+        self.captions = list(captions)
+        self.counter_index = {caption: i for i, caption in enumerate(self.captions)}
+        self.objects = []
+        self.object_index = {}
+        self.length = 0
+        self._times = np.zeros(capacity)
+        self._values = np.zeros((capacity, 0, len(self.captions)), dtype=np.int64)
+
+    def __len__(self):
+        return self.length
+
+    def add_objects(self, *objects):
+        """ Add objects (columns) to the group. Samples taken before the objects were added are 0.
+
+        :param objects: new objects.
+        """
+
+        objects = [o for o in objects if o not in self.object_index]
+        if not objects:
+            return
+        for obj in objects:
+            self.object_index[obj] = len(self.objects)
+            self.objects.append(obj)
+        padding = np.zeros((self._values.shape[0], len(objects), len(self.captions)), dtype=np.int64)
+        self._values = np.concatenate((self._values, padding), axis=1)
+
+    def append(self, timestamp, rows):
+        """ Append one sample.
+
+        :param timestamp: sample time in seconds.
+        :param rows: dictionary {object: list of counters} or {object: {counter name: value}}.
+            New objects are added, objects missing from rows keep their previous value.
+        """
+
+        self.add_objects(*rows.keys())
+        if self.length == len(self._times):
+            self._grow()
+        sample = self._values[self.length]
+        sample[:] = self._values[self.length - 1] if self.length else 0
+        for obj, counters in rows.items():
+            if isinstance(counters, dict):
+                counters = [counters[caption] for caption in self.captions]
+            sample[self.object_index[obj]] = counters
+        self._times[self.length] = timestamp
+        self.length += 1
+
+    #
+    # Queries.
+    #
+
+    @property
+    def timestamps(self):
+        """
+        :return: array of samples times.
+        """
+        return self._times[:self.length]
+
+    @property
+    def values(self):
+        """
+        :return: array (time, object, counter) of all samples. Note that this is a view, not a copy.
+        """
+        return self._values[:self.length]
+
+    def counter(self, caption, *objects):
+        """
+        :param caption: counter name.
+        :param objects: requested objects. Default - all objects.
+        :return: array (time, object) of the requested counter.
+        """
+
+        values = self.values[:, :, self.counter_index[caption]]
+        if objects:
+            values = values[:, [self.object_index[o] for o in objects]]
+        return values
+
+    def last(self, caption=None):
+        """
+        :param caption: counter name. Default - all counters.
+        :return: dictionary {object: value or array of counters} of the last sample.
+        """
+
+        sample = self._values[self.length - 1]
+        if caption:
+            sample = sample[:, self.counter_index[caption]]
+        return OrderedDict(zip(self.objects, sample))
+
+    def delta(self, caption, *objects):
+        """
+        :param caption: counter name.
+        :param objects: requested objects. Default - all objects.
+        :return: array (time - 1, object) of the counter difference between consecutive samples.
+        """
+        return np.diff(self.counter(caption, *objects), axis=0)
+
+    def rate(self, caption, *objects):
+        """
+        :param caption: counter name.
+        :param objects: requested objects. Default - all objects.
+        :return: array (time - 1, object) of the counter change per second between consecutive samples. Samples with
+            zero interval are inf (nan if the counter did not change), samples with negative interval are negative.
+        """
+
+        intervals = np.diff(self.timestamps)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self.delta(caption, *objects) / intervals[:, np.newaxis]
+
+    def aggregate(self, caption, *objects, **kwargs):
+        """
+        :param caption: counter name.
+        :param objects: requested objects. Default - all objects.
+        :param function: keyword only - NumPy reduction function (sum, min, max, mean...). Default - sum.
+        :return: array (time) of the reduced counter over all requested objects.
+        """
+        function = kwargs.pop('function', np.sum)
+        if kwargs:
+            raise TypeError('Unexpected arguments {}'.format(list(kwargs)))
+        return function(self.counter(caption, *objects), axis=1)
+
+    #
+    # Private methods.
+    #
+
+    def _grow(self):
+        capacity = max(2 * len(self._times), 1)
+        self._times = np.resize(self._times, capacity)
+        values = np.zeros((capacity,) + self._values.shape[1:], dtype=np.int64)
+        values[:self.length] = self._values[:self.length]
+        self._values = values
+
+
+class XenaStatsStore(object):
+    """ Statistics store - one XenaStatsGroup per statistics group name. """
+
+    def __init__(self, capacity=1024):
+        """
+        :param capacity: initial number of samples to allocate per group.
+        """
+
+        self.capacity = capacity
+        self.groups = OrderedDict()
+
+    def __getitem__(self, name):
+        return self.groups[name]
+
+    def add_stats(self, statistics, timestamp=None):
+        """ Add one sample of read_stats output.
+
+        :param statistics: dictionary {object: {group name: {stat name: value}}} as returned by
+            XenaSession.read_stats, XenaPortsStats.read_stats, XenaTpldsStats.read_stats, port.read_port_stats etc.
+        :param timestamp: sample time. Default - now.
+        """
+
+        timestamp = time.time() if timestamp is None else timestamp
+        per_group_rows = OrderedDict()
+        for obj, obj_stats in statistics.items():
+            for group_name, group_stats in obj_stats.items():
+                per_group_rows.setdefault(group_name, OrderedDict())[obj] = group_stats
+        for group_name, rows in per_group_rows.items():
+            if group_name not in self.groups:
+                captions = list(next(iter(rows.values())).keys())
+                self.groups[group_name] = XenaStatsGroup(group_name, captions, self.capacity)
+            self.groups[group_name].append(timestamp, rows)
+
+    def add_snapshot(self, snapshot):
+        """ Add one sample from statistics snapshot.
+
+        :type snapshot: xenavalkyrie.xena_statistics_view.XenaStatsSnapshot
+        """
+        self.add_stats(snapshot.statistics, snapshot.timestamp)
+
+    def add_view(self, view, timestamp=None):
+        """ Add one sample from statistics view after read_stats.
+
+        Streams view is added as pt_stream group of the streams TX statistics.
+
+        :type view: xenavalkyrie.xena_statistics_view.XenaStats
+        :param timestamp: sample time. Default - view snapshot time if available, else now.
+        """
+
+        if timestamp is None and getattr(view, 'snapshot', None):
+            timestamp = view.snapshot.timestamp
+        tx_statistics = getattr(view, 'tx_statistics', None)
+        if tx_statistics is not None:
+            self.add_stats(OrderedDict((s, {'pt_stream': v}) for s, v in tx_statistics.items()), timestamp)
+        else:
+            self.add_stats(view.statistics, timestamp)
@@ -11,19 +11,182 @@ from collections import OrderedDict
 
 from trafficgenerator.tgn_object import TgnSubStatsDict
 from xenavalkyrie.xena_object import XenaObjectsDict
+from xenavalkyrie.xena_port import XenaBasePort, XenaTpld
+from xenavalkyrie.xena_stream import XenaStream
+
+
+class XenaStatsSnapshot(object):
+    """ Statistics of multiple objects read together, with the time window in which they were read.
+
+    :ivar statistics: dictionary {object: {group name: {stat name: value}}}
+    :ivar sent: time.time() just before the first query was sent.
+    :ivar received: time.time() just after the last reply was received.
+    """
+
+    def __init__(self, statistics, sent, received):
+        self.statistics = statistics
+        self.sent = sent
+        self.received = received
+
+    @property
+    def timestamp(self):
+        """
+        :return: estimated time the counters were sampled - middle of the read window.
+        """
+        return (self.sent + self.received) / 2
+
+
+class XenaCountersSelection(object):
+    """ Selection of statistics counters, compiled into the minimal set of statistics queries.
+
+    Counters are specified as group.stat (e.g. pr_total.bps), group_stat (e.g. pr_total_bps, as in get_flat_stats) or
+    group (e.g. pr_tpldlatency) for all counters of the group. Each selected group is read with one query per object,
+    groups without selected counters are not read at all.
+    """
+
+    def __init__(self, counters):
+        """
+        :param counters: list of counters specifications.
+        """
+
+        self.counters = list(counters)
+        self.groups = OrderedDict()
+        all_groups = self.get_all_groups()
+        for counter in self.counters:
+            group, stat = self._parse_counter(counter, all_groups)
+            stats = self.groups.setdefault(group, [])
+            for stat in [stat] if stat else all_groups[group]:
+                if stat not in stats:
+                    stats.append(stat)
+
+    @classmethod
+    def of_types(cls, *obj_types):
+        """
+        :param obj_types: objects types - port, stream, tpld.
+        :return: selection of all counters of the requested objects types.
+        """
+        return cls([group for obj_type in obj_types for group in cls.get_types_groups()[obj_type]])
+
+    @property
+    def columns(self):
+        """
+        :return: list of selected counters in group_stat format, as in get_flat_stats.
+        """
+        return ['{}_{}'.format(group, stat) for group, stats in self.groups.items() for stat in stats]
+
+    def type_columns(self, obj_type):
+        """
+        :param obj_type: object type - port, stream or tpld.
+        :return: list of selected counters of the object type in group_stat format.
+        """
+        type_groups = self.get_types_groups()[obj_type]
+        return ['{}_{}'.format(group, stat) for group, stats in self.groups.items() if group in type_groups
+                for stat in stats]
+
+    def select(self, obj):
+        """
+        :param obj: object to read statistics from.
+        :return: dictionary {group name: (group captions, selected captions)} of the selected groups of the object.
+        """
+
+        obj_groups = self.get_object_groups(obj)
+        return OrderedDict((group, (obj_groups[group], stats)) for group, stats in self.groups.items()
+                           if group in obj_groups)
+
+    def has_type(self, obj_type):
+        """
+        :param obj_type: object type - port, stream or tpld.
+        :return: True if any counter of the object type is selected, else False.
+        """
+        return bool(set(self.get_types_groups()[obj_type]) & set(self.groups))
+
+    def get_objects(self, ports, tplds=None):
+        """
+        :param ports: list of ports.
+        :param tplds: dictionary {port: {id: tpld}} of already read TPLDs. Default - read TPLDs from ports.
+        :return: list of all objects (ports, streams, TPLDs) of the ports that have selected counters.
+        """
+
+        objects = []
+        if self.has_type('port'):
+            objects.extend(ports)
+        if self.has_type('stream'):
+            objects.extend(s for p in ports for s in p.streams.values())
+        if self.has_type('tpld'):
+            tplds = tplds if tplds is not None else OrderedDict((p, p.tplds) for p in ports)
+            objects.extend(t for p in ports for _, t in sorted(tplds[p].items()))
+        return objects
+
+    @staticmethod
+    def parse(captions, values, stats):
+        """
+        :param captions: group captions.
+        :param values: group values as returned by the statistics query.
+        :param stats: selected captions.
+        :return: dictionary {stat name: value} of the selected captions.
+        """
+
+        all_values = dict(zip(captions, values))
+        return dict((stat, all_values[stat]) for stat in stats)
+
+    @staticmethod
+    def get_object_groups(obj):
+        """
+        :return: dictionary {group name: captions} of the object statistics.
+        """
+        if isinstance(obj.stats_captions, dict):
+            return obj.stats_captions
+        return {obj.stats_group: obj.stats_captions}
+
+    @staticmethod
+    def get_types_groups():
+        """
+        :return: dictionary {object type: {group name: captions}} of all statistics objects types.
+        """
+        return OrderedDict((('port', XenaBasePort.stats_captions),
+                            ('stream', {XenaStream.stats_group: XenaStream.stats_captions}),
+                            ('tpld', XenaTpld.stats_captions)))
+
+    @classmethod
+    def get_all_groups(cls):
+        return OrderedDict((g, c) for groups in cls.get_types_groups().values() for g, c in groups.items())
+
+    def _parse_counter(self, counter, all_groups):
+        if '.' in counter:
+            group, stat = counter.split('.', 1)
+        elif counter in all_groups:
+            group, stat = counter, None
+        else:
+            groups = [g for g in all_groups if counter.startswith(g + '_')]
+            if not groups:
+                raise ValueError('Unknown statistics counter {}'.format(counter))
+            group = max(groups, key=len)
+            stat = counter[len(group) + 1:]
+        if group not in all_groups or (stat and stat not in all_groups[group]):
+            raise ValueError('Unknown statistics counter {}, available groups {}'.format(counter, list(all_groups)))
+        return group, stat
 
 
 class XenaStats(object):
     """ Base class for all statistics views. """
 
-    def __init__(self, session):
+    # Types of the objects represented by the view.
+    obj_types = ()
+
+    def __init__(self, session, counters=None):
         """
         :param session: current session
         :type session: xenavalkyrie.xena_app.XenaSession
+        :param counters: list of counters to read, see XenaCountersSelection. Default - all counters.
         """
 
         self.session = session
         self.statistics = None
+        self.snapshot = None
+        if counters:
+            self.selection = XenaCountersSelection(counters)
+        else:
+            self.selection = XenaCountersSelection.of_types(*self.obj_types)
 
     def get_flat_stats(self):
         """
@@ -56,15 +219,18 @@ class XenaPortsStats(XenaStats):
     +----------------+-------+-------+-----+-------+-------+-----+-----+
     """
 
+    obj_types = ('port',)
+
     def read_stats(self):
         """ Read current ports statistics from chassis.
 
+        All ports statistics are read in one pipelined burst per chassis, see XenaSession.read_counters_snapshot.
+
         :return: dictionary {port name {group name, {stat name: stat value}}}
         """
 
-        self.statistics = XenaObjectsDict()
-        for port in self.session.ports.values():
-            self.statistics[port] = port.read_port_stats()
+        self.snapshot = self.session.read_counters_snapshot(self.selection)
+        self.statistics = self.snapshot.statistics
         return self.statistics
 
 
@@ -88,31 +254,51 @@ class XenaStreamsStats(XenaStats):
     +--------+-------+-----+-------+-----+-------+-----+-------+-----+-------+-----+
     """
 
+    obj_types = ('stream', 'tpld')
+
+    def __init__(self, session, counters=None):
+        super(self.__class__, self).__init__(session, counters)
+        if XenaStream.stats_group not in self.selection.groups:
+            self.selection.groups[XenaStream.stats_group] = list(XenaStream.stats_captions)
+        self.tx_statistics = None
+        self._streams_keys = None
+        self._tpld_index = {}
+
     def read_stats(self):
         """ Read current statistics from chassis.
 
+        Streams and TPLDs statistics are read in one pipelined burst per chassis, see
+        XenaSession.read_counters_snapshot. TX streams are matched to RX TPLDs by TPLD ID index that is rebuilt only
+        when the streams or their TPLD IDs change.
+
         :return: dictionary {stream: {tx: {stat name: stat value}} rx: {tpld: {stat group {stat name: value}}}}
         """
 
-        self.tx_statistics = XenaObjectsDict()
-        for port in self.session.ports.values():
-            for stream in port.streams.values():
-                self.tx_statistics[stream] = stream.read_stats()
-
-        tpld_statistics = XenaTpldsStats(self.session).read_stats()
+        self.snapshot = self.session.read_counters_snapshot(self.selection)
+        streams = [obj for obj in self.snapshot.statistics if obj.obj_type() == 'stream']
+        self._update_tpld_index(streams)
 
+        self.tx_statistics = XenaObjectsDict()
         self.statistics = XenaObjectsDict()
-        for stream, stream_stats in self.tx_statistics.items():
+        for stream in streams:
+            self.tx_statistics[stream] = self.snapshot.statistics[stream][stream.stats_group]
             self.statistics[stream] = OrderedDict()
-            self.statistics[stream]['tx'] = stream_stats
+            self.statistics[stream]['tx'] = self.tx_statistics[stream]
             self.statistics[stream]['rx'] = TgnSubStatsDict()
-            ps_tpldid = stream.get_attribute('ps_tpldid')
-            stream_tpld = int(ps_tpldid) if ps_tpldid else -1
-            for tpld, tpld_stats in tpld_statistics.items():
-                if tpld.id == stream_tpld:
+        for tpld, tpld_stats in self.snapshot.statistics.items():
+            if tpld.obj_type() == 'tpld':
+                for stream in self._tpld_index.get(tpld.id, []):
                     self.statistics[stream]['rx'][tpld.parent] = tpld_stats
         return self.statistics
 
+    def _update_tpld_index(self, streams):
+        streams_keys = [(stream.ref, stream.tpld_id) for stream in streams]
+        if streams_keys != self._streams_keys:
+            self._tpld_index = {}
+            for stream in streams:
+                self._tpld_index.setdefault(stream.tpld_id, []).append(stream)
+            self._streams_keys = streams_keys
+
     def get_flat_stats(self):
         return OrderedDict({str(k): v for k, v in self.tx_statistics.items()})
 
@@ -133,14 +319,16 @@ class XenaTpldsStats(XenaStats):
     +-------------------+-------+-------+-----+-------+-------+-----+-----+
     """
 
+    obj_types = ('tpld',)
+
     def read_stats(self):
         """ Read current statistics from chassis.
 
+        All TPLDs statistics are read in one pipelined burst per chassis, see XenaSession.read_counters_snapshot.
+
         :return: dictionary {tpld full index {group name {stat name: stat value}}}
         """
 
-        self.statistics = XenaObjectsDict()
-        for port in self.session.ports.values():
-            for tpld in port.tplds.values():
-                self.statistics[tpld] = tpld.read_stats()
+        self.snapshot = self.session.read_counters_snapshot(self.selection)
+        self.statistics = self.snapshot.statistics
         return self.statistics
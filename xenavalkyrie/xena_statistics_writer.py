@@ -0,0 +1,171 @@
+"""
+Classes and utilities to stream statistics samples to CSV and JSON Lines files.
+
+Each sample is appended to the file as it arrives (one row/line per object) and the file is flushed, so memory is
+constant regardless of the test duration and the files can be tailed live. The columns layout is compiled once, from
+all objects of the first sample or from the requested columns, objects without some column get blank value. Statistics
+that first appear in later samples (e.g. objects added during the test) are not written, a warning is logged once.
+
+Writers accept statistics in read_stats format - {object: {group name: {stat name: value}}} - and can be used as
+XenaStatsSampler sinks.
+
+:author: yoram@ignissoft.com
+"""
+
+import io
+import csv
+import gzip
+import json
+import time
+import logging
+from collections import OrderedDict
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+logger = logging.getLogger(__name__)
+
+
+class XenaStatsWriter(object):
+    """ Base class for all statistics writers. """
+
+    def __init__(self, file_name, columns=None, timestamp=True, compress=None, flush=True):
+        """
+        :param file_name: output file name.
+        :param columns: list of columns names in group_stat format (e.g. pr_total_bps). Default - all statistics of
+            all objects in the first sample.
+        :param timestamp: True - add timestamp column, False - do not add timestamp column.
+        :param compress: True - gzip output, False - plain text. Default - gzip if file name ends with .gz.
+        :param flush: True - flush after each sample so the file can be tailed, False - let the OS buffer.
+        """
+
+        self.file_name = file_name
+        self.requested_columns = columns
+        self.timestamp = timestamp
+        self.compress = file_name.endswith('.gz') if compress is None else compress
+        self.flush = flush
+        self.columns = None
+        self.names = None
+        self.samples = 0
+        self._known_columns = set()
+        self._file = gzip.open(file_name, 'wb') if self.compress else io.open(file_name, 'wb')
+
+    def write(self, statistics, timestamp=None):
+        """ Append one sample.
+
+        :param statistics: dictionary {object: {group name: {stat name: value}}}.
+        :param timestamp: sample time. Default - now.
+        """
+
+        if not statistics:
+            return
+        if self.columns is None:
+            self._compile(statistics)
+        elif not self.requested_columns:
+            self._check_layout(statistics)
+        timestamp = time.time() if timestamp is None else timestamp
+        lines = []
+        for obj, obj_stats in statistics.items():
+            values = [obj_stats.get(group, {}).get(stat) for group, stat in self.columns]
+            lines.append(self._format_row(timestamp, getattr(obj, 'name', obj), values))
+        self._write_lines(lines)
+        self.samples += 1
+
+    def __call__(self, snapshot):
+        """ Append one sample from statistics snapshot, so the writer can be used as XenaStatsSampler sink.
+
+        :type snapshot: xenavalkyrie.xena_statistics_view.XenaStatsSnapshot
+        """
+        self.write(snapshot.statistics, snapshot.timestamp)
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    #
+    # Private methods.
+    #
+
+    def _compile(self, statistics):
+        # Objects of different types (e.g. ports and TPLDs) have different groups so the layout is the union of all.
+        all_columns = OrderedDict()
+        for obj_stats in statistics.values():
+            for group, group_stats in obj_stats.items():
+                for stat in group_stats:
+                    all_columns.setdefault('{}_{}'.format(group, stat), (group, stat))
+        names = self.requested_columns if self.requested_columns else list(all_columns.keys())
+        unknown = [name for name in names if name not in all_columns]
+        if unknown:
+            raise ValueError('Unknown statistics columns {}, available columns {}'.format(unknown,
+                                                                                         list(all_columns.keys())))
+        self.names = list(names)
+        self.columns = [all_columns[name] for name in self.names]
+        self._known_columns = set(all_columns.values())
+        header = self._format_header()
+        if header:
+            self._write_lines([header])
+
+    def _check_layout(self, statistics):
+        new_columns = set((group, stat) for obj_stats in statistics.values() for group, group_stats in obj_stats.items()
+                          for stat in group_stats) - self._known_columns
+        if new_columns:
+            self._known_columns |= new_columns
+            logger.warning('{}: statistics {} are not in the columns layout compiled from the first sample and are not '
+                           'written'.format(self.file_name, sorted('{}_{}'.format(g, s) for g, s in new_columns)))
+
+    def _write_lines(self, lines):
+        self._file.write(''.join(line + '\n' for line in lines).encode('utf-8'))
+        if self.flush:
+            self._file.flush()
+
+    def _format_header(self):
+        return None
+
+    def _format_row(self, timestamp, name, values):
+        raise NotImplementedError()
+
+
+class XenaStatsCsvWriter(XenaStatsWriter):
+    """ Write statistics as CSV - header line and then one line per object per sample, blank for missing values. """
+
+    def __init__(self, file_name, columns=None, timestamp=True, compress=None, flush=True, object_caption='object'):
+        """
+        :param object_caption: header of the objects names column.
+        """
+
+        super(self.__class__, self).__init__(file_name, columns, timestamp, compress, flush)
+        self.object_caption = object_caption
+        self._buffer = StringIO()
+        self._csv = csv.writer(self._buffer, lineterminator='')
+
+    def _format_header(self):
+        return self._format_line((['timestamp'] if self.timestamp else []) + [self.object_caption] + self.names)
+
+    def _format_row(self, timestamp, name, values):
+        return self._format_line((['{:.6f}'.format(timestamp)] if self.timestamp else []) + [str(name)] + values)
+
+    def _format_line(self, fields):
+        """ Quote fields with csv module (names may contain commas), None is written as blank. """
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        self._csv.writerow(fields)
+        return self._buffer.getvalue()
+
+
+class XenaStatsJsonLinesWriter(XenaStatsWriter):
+    """ Write statistics as JSON Lines - one JSON object per object per sample, null for missing values. """
+
+    def _format_row(self, timestamp, name, values):
+        row = OrderedDict([('timestamp', timestamp)] if self.timestamp else [])
+        row['object'] = str(name)
+        row.update(zip(self.names, values))
+        return json.dumps(row)
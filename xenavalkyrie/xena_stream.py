@@ -37,6 +37,7 @@ class XenaStream(XenaObject21):
 
     create_command = 'ps_create'
     _info_config_commands = ['ps_config']
+    stats_group = 'pt_stream'
     stats_captions = ['bps', 'pps', 'bytes', 'packets']
 
     next_tpld_id = 0
@@ -49,6 +50,12 @@ class XenaStream(XenaObject21):
         """
 
         super(self.__class__, self).__init__(objType='stream', index=index, parent=parent, name=name)
+        self._tpld_id = None
+
+    def set_attributes(self, **attributes):
+        super(self.__class__, self).set_attributes(**attributes)
+        if 'ps_tpldid' in attributes:
+            self._tpld_id = int(attributes['ps_tpldid'])
 
     def del_object_from_parent(self):
         self.send_command('ps_delete')
@@ -67,7 +74,7 @@ class XenaStream(XenaObject21):
         :return: dictionary {stat name: value}
             See XenaStream.stats_captions
         """
-        return self.read_stat(XenaStream.stats_captions, 'pt_stream')
+        return self.read_stat(XenaStream.stats_captions, self.stats_group)
 
     def get_packet_headers(self):
         """
@@ -92,32 +99,8 @@ class XenaStream(XenaObject21):
         :param l4_checksum: True - set tcp/udp checksum flag, False - do not set
         """
 
-        body_handler = headers
-        ps_headerprotocol = []
-        while body_handler:
-            segment = pypacker_2_xena.get(str(body_handler).split('(')[0].lower(), None)
-            if not segment:
-                self.logger.warning('pypacker header {} not in conversion list'.
-                                    format(str(body_handler).split('(')[0].lower()))
-                break
-            ps_headerprotocol.append(segment)
-            if type(body_handler) is Ethernet and body_handler.vlan:
-                for _ in range(len(body_handler.vlan)):
-                    ps_headerprotocol.append('vlan')
-            body_handler = body_handler.body_handler
-        if l4_checksum:
-            l4 = headers.upper_layer.upper_layer
-            l4.sum_au_active = False
-            l4.sum = 0
-            if 'udp' in ps_headerprotocol:
-                ps_headerprotocol[ps_headerprotocol.index('udp')] = 'udpcheck'
-            if 'tcp' in ps_headerprotocol:
-                ps_headerprotocol[ps_headerprotocol.index('tcp')] = 'tcpcheck'
-        self.set_attributes(ps_headerprotocol=' '.join(ps_headerprotocol))
-
-        headers_str = binascii.hexlify(headers.bin())
-        bin_headers = '0x' + headers_str.decode('utf-8')
-        self.set_attributes(ps_packetheader=bin_headers)
+        for attribute, value in self._get_packet_headers_attributes(headers, l4_checksum):
+            self.set_attributes(**{attribute: value})
 
     #
     # Modifiers.
@@ -126,59 +109,139 @@ class XenaStream(XenaObject21):
     def add_modifier(self, m_type=XenaModifierType.standard, **kwargs):
         """ Add modifier.
 
+        Values not in kwargs are set to the modifier type default values (see XenaModifier and XenaXModifier
+        default_values). With CLI API the new modifiers count and the modifier values are sent in one pipelined burst.
+
         :param m_type: modifier type - standard or extended.
         :type: xenavalkyrie.xena_stram.ModifierType
         :return: newly created modifier.
         :rtype: xenavalkyrie.xena_stream.XenaModifier
+        :raises ValueError: if kwargs contain unknown modifier values.
         """
 
-        if m_type == XenaModifierType.standard:
-            modifier = XenaModifier(self, index='{}/{}'.format(self.index, len(self.modifiers)))
+        modifier_class, _ = _modifier_types[m_type]
+        modifier_class._check_values(kwargs)
+        modifiers = self.modifiers if m_type == XenaModifierType.standard else self.xmodifiers
+        modifier = modifier_class(self, index='{}/{}'.format(self.index, len(modifiers)))
+        if type(self.api) is XenaCliWrapper:
+            modifier.set_values(**kwargs)
+            self.api.send_commands([(self, modifier_class.count_command, len(modifiers) + 1)] +
+                                   [(modifier, a, v) for a, v in modifier.get_attributes_values()])
         else:
-            modifier = XenaXModifier(self, index='{}/{}'.format(self.index, len(self.xmodifiers)))
-        modifier._create()
-        modifier.get()
-        modifier.set(**kwargs)
+            modifier._create()
+            modifier.get()
+            modifier.set(**kwargs)
         return modifier
 
+    def set_modifiers(self, modifiers, m_type=XenaModifierType.standard):
+        """ Set full modifiers table.
+
+        With CLI API the modifiers count and all modifiers values are sent in one pipelined burst. With REST API the
+        modifiers count is reset and the modifiers are added one by one.
+
+        :param modifiers: list of dictionaries {value name: value}, one per modifier, with the same keys as
+            add_modifier kwargs (position, mask, action, repeat, min_val, step, max_val). Missing values are set to the
+            modifier default values.
+        :param m_type: modifier type - standard or extended.
+        :return: dictionary {index: object} of the new modifiers.
+        """
+
+        modifier_class, obj_type = _modifier_types[m_type]
+        for values in modifiers:
+            modifier_class._check_values(values)
+        self.del_objects_by_type(obj_type)
+        if type(self.api) is XenaCliWrapper:
+            commands = [(self, modifier_class.count_command, len(modifiers))]
+            for index, values in enumerate(modifiers):
+                modifier = modifier_class(self, index='{}/{}'.format(self.index, index))
+                modifier.set_values(**values)
+                commands += [(modifier, a, v) for a, v in modifier.get_attributes_values()]
+            self.api.send_commands(commands)
+        else:
+            self.set_attributes(**{modifier_class.count_command: 0})
+            for values in modifiers:
+                self.add_modifier(m_type, **values)
+        return {m.id: m for m in self.get_objects_by_type(obj_type)}
+
     def remove_modifier(self, index, m_type=XenaModifierType.standard):
         """ Remove modifier.
 
+        With CLI API only the modifiers after the removed modifier are rewritten, one slot down, and the modifiers count
+        is reduced, all in one pipelined burst. Existing modifiers objects are kept and updated with their new slot
+        values. With REST API all modifiers are removed and the remaining modifiers are re-created.
+
         :param m_type: modifier type - standard or extended.
         :param index: index of modifier to remove.
         """
 
-        if m_type == XenaModifierType.standard:
-            current_modifiers = OrderedDict(self.modifiers)
-            del current_modifiers[index]
-
-            self.set_attributes(ps_modifiercount=0)
-            self.del_objects_by_type('modifier')
+        modifier_class, obj_type = _modifier_types[m_type]
+        modifiers = self.modifiers if m_type == XenaModifierType.standard else self.xmodifiers
+        if index not in modifiers:
+            raise KeyError('Stream {} has no modifier {}'.format(self.name, index))
 
+        if type(self.api) is XenaCliWrapper:
+            commands = []
+            for slot in range(index, len(modifiers) - 1):
+                modifiers[slot].copy_values(modifiers[slot + 1])
+                commands += [(modifiers[slot], attribute, value)
+                             for attribute, value in modifiers[slot].get_attributes_values()]
+            commands.append((self, modifier_class.count_command, len(modifiers) - 1))
+            self.api.send_commands(commands)
+            modifiers[len(modifiers) - 1].del_object_from_parent()
         else:
-            current_modifiers = OrderedDict(self.xmodifiers)
-            del current_modifiers[index]
-
-            self.set_attributes(ps_modifierextcount=0)
-            self.del_objects_by_type('xmodifier')
+            current_modifiers = [m.get_values() for i, m in sorted(modifiers.items()) if i != index]
+            self.set_attributes(**{modifier_class.count_command: 0})
+            self.del_objects_by_type(obj_type)
+            for values in current_modifiers:
+                self.add_modifier(m_type, **values)
+
+    @staticmethod
+    def load_modifiers(streams, m_type=XenaModifierType.standard):
+        """ Read all modifiers of list of streams (of any ports) in two pipelined batches - one for all modifiers counts
+            and one for all modifiers values.
+
+        :param streams: list of streams.
+        :param m_type: modifier type - standard or extended.
+        :return: dictionary {stream: {index: object}} of the streams modifiers.
+        """
 
-        for modifier in current_modifiers.values():
-            self.add_modifier(m_type,
-                              mask=modifier.mask, action=modifier.action, repeat=modifier.repeat,
-                              min_val=modifier.min_val, step=modifier.step, max_val=modifier.max_val)
+        modifier_class, obj_type = _modifier_types[m_type]
+        if not streams:
+            return OrderedDict()
+        api = streams[0].api
+        counts = api.get_attribute_multi([(s, modifier_class.count_command) for s in streams])
+        modifiers = []
+        for stream, count in zip(streams, counts):
+            stream.del_objects_by_type(obj_type)
+            modifiers += [modifier_class(stream, index='{}/{}'.format(stream.index, index))
+                          for index in range(int(count))]
+        queries = [(m, command) for m in modifiers for command in modifier_class._info_config_commands]
+        values = api.get_attribute_multi(queries)
+        for modifier, value, range_value in zip(modifiers, values[0::2], values[1::2]):
+            modifier.parse_values(value, range_value)
+        return OrderedDict((s, {m.id: m for m in s.get_objects_by_type(obj_type)}) for s in streams)
 
     #
     # Properties.
     #
 
+    @property
+    def tpld_id(self):
+        """
+        :return: stream TPLD ID, -1 if the stream has no TPLD. Queried once and then cached.
+        """
+        if self._tpld_id is None:
+            ps_tpldid = self.get_attribute('ps_tpldid')
+            self._tpld_id = int(ps_tpldid) if ps_tpldid else -1
+        return self._tpld_id
+
     @property
     def modifiers(self):
         """
         :return: dictionary {index: object} of standard modifiers.
         """
         if not self.get_objects_by_type('modifier'):
-            for index in range(int(self.get_attribute('ps_modifiercount'))):
-                XenaModifier(self, index='{}/{}'.format(self.index, index)).get()
+            self.load_modifiers([self])
         return {s.id: s for s in self.get_objects_by_type('modifier')}
 
     @property
@@ -188,15 +251,52 @@ class XenaStream(XenaObject21):
         """
         if not self.get_objects_by_type('xmodifier'):
             try:
-                for index in range(int(self.get_attribute('ps_modifierextcount'))):
-                    XenaXModifier(self, index='{}/{}'.format(self.index, index)).get()
+                self.load_modifiers([self], XenaModifierType.extended)
             except Exception as _:
                 pass
         return {s.id: s for s in self.get_objects_by_type('xmodifier')}
 
+    #
+    # Private methods.
+    #
+
+    def _get_packet_headers_attributes(self, headers, l4_checksum):
+        """
+        :return: list of (attribute, value) of ps_headerprotocol and ps_packetheader, in the order they must be set.
+        """
+
+        body_handler = headers
+        ps_headerprotocol = []
+        while body_handler:
+            segment = pypacker_2_xena.get(str(body_handler).split('(')[0].lower(), None)
+            if not segment:
+                self.logger.warning('pypacker header {} not in conversion list'.
+                                    format(str(body_handler).split('(')[0].lower()))
+                break
+            ps_headerprotocol.append(segment)
+            if type(body_handler) is Ethernet and body_handler.vlan:
+                for _ in range(len(body_handler.vlan)):
+                    ps_headerprotocol.append('vlan')
+            body_handler = body_handler.body_handler
+        if l4_checksum:
+            l4 = headers.upper_layer.upper_layer
+            l4.sum_au_active = False
+            l4.sum = 0
+            if 'udp' in ps_headerprotocol:
+                ps_headerprotocol[ps_headerprotocol.index('udp')] = 'udpcheck'
+            if 'tcp' in ps_headerprotocol:
+                ps_headerprotocol[ps_headerprotocol.index('tcp')] = 'tcpcheck'
+
+        headers_str = binascii.hexlify(headers.bin())
+        bin_headers = '0x' + headers_str.decode('utf-8')
+        return [('ps_headerprotocol', ' '.join(ps_headerprotocol)), ('ps_packetheader', bin_headers)]
+
 
 class _XenaModifierBase(XenaObject):
 
+    # Chassis default values of new modifier, see sub classes.
+    default_values = OrderedDict()
+
     def __init__(self, objType, parent, index):
         super(_XenaModifierBase, self).__init__(objType=objType, index=index, parent=parent)
 
@@ -210,42 +310,87 @@ class _XenaModifierBase(XenaObject):
             super(_XenaModifierBase, self)._create()
 
     def set(self, **kwargs):
+        self._check_values(kwargs)
         for k, v in kwargs.items():
             setattr(self, k, v)
-        if type(self) == XenaModifier:
-            self.set_attributes(ps_modifier='{} {} {} {}'.format(self.position, self.mask,
-                                                                 self.action.value, self.repeat))
-        else:
-            self.set_attributes(ps_modifierext='{} {} {} {}'.format(self.position, self.mask,
-                                                                    self.action.value, self.repeat))
-        if self.action != XenaModifierAction.random:
-            if type(self) == XenaModifier:
-                self.set_attributes(ps_modifierrange='{} {} {}'.format(self.min_val, self.step, self.max_val))
-            else:
-                self.set_attributes(ps_modifierextrange='{} {} {}'.format(self.min_val, self.step, self.max_val))
+        for attribute, value in self.get_attributes_values():
+            self.set_attributes(**{attribute: value})
 
     def get(self):
-        if type(self) == XenaModifier:
-            position, mask, action, repeat = self.get_attribute('ps_modifier').split()
-        else:
-            position, mask, action, repeat = self.get_attribute('ps_modifierext').split()
+        modifier_command, range_command = self._info_config_commands
+        modifier_value = self.get_attribute(modifier_command)
+        self.parse_values(modifier_value)
+        if self.action != XenaModifierAction.random:
+            self.parse_values(modifier_value, self.get_attribute(range_command))
+
+    def set_values(self, **kwargs):
+        """ Set modifier values locally, without sending them to the chassis.
+
+        :param kwargs: modifier values, values not in kwargs are set to default values.
+        :raises ValueError: if kwargs contain unknown values.
+        """
+
+        self._check_values(kwargs)
+        for value, default in self.default_values.items():
+            setattr(self, value, kwargs.get(value, default))
+
+    def parse_values(self, modifier_value, range_value=None):
+        """ Set modifier values locally from modifier and range commands returned values.
+
+        :param modifier_value: ps_modifier/ps_modifierext value - position mask action repeat.
+        :param range_value: ps_modifierrange/ps_modifierextrange value - min step max. Ignored for random modifiers.
+        """
+
+        position, mask, action, repeat = modifier_value.split()
         self.position = int(position)
         self.mask = '0x{:x}'.format(int(mask, 16))
         self.action = XenaModifierAction(action)
         self.repeat = int(repeat)
-        if self.action != XenaModifierAction.random:
-            if type(self) == XenaModifier:
-                min_val, step, max_val = self.get_attribute('ps_modifierrange').split()
-            else:
-                min_val, step, max_val = self.get_attribute('ps_modifierextrange').split()
+        if range_value and self.action != XenaModifierAction.random:
+            min_val, step, max_val = range_value.split()
             self.min_val = int(min_val)
             self.step = int(step)
             self.max_val = int(max_val)
 
+    def get_attributes_values(self):
+        """
+        :return: list of (attribute, value) that configure the modifier, in the order they must be set.
+        """
+
+        modifier_command, range_command = self._info_config_commands
+        attributes = [(modifier_command, '{} {} {} {}'.format(self.position, self.mask, self.action.value,
+                                                               self.repeat))]
+        if self.action != XenaModifierAction.random:
+            attributes.append((range_command, '{} {} {}'.format(self.min_val, self.step, self.max_val)))
+        return attributes
+
+    def get_values(self):
+        """
+        :return: dictionary {value name: value} of modifier values (position, mask, action, repeat and range), as
+            add_modifier kwargs.
+        """
+
+        return OrderedDict((value, getattr(self, value)) for value in self.default_values if hasattr(self, value))
+
+    def copy_values(self, other):
+        """ Copy modifier values (position, mask, action, repeat and range) from other modifier.
+
+        :param other: modifier to copy values from.
+        """
+
+        for name, value in other.get_values().items():
+            setattr(self, name, value)
+
     #
     # Private methods.
     #
 
+    @classmethod
+    def _check_values(cls, values):
+        unknown = [value for value in values if value not in cls.default_values]
+        if unknown:
+            raise ValueError('Unknown modifier values {}, valid values {}'.format(unknown, list(cls.default_values)))
+
     def _build_index_command(self, command, *arguments):
         module, port, sid, mid = self.index.split('/')
         return ('{}/{} {} [{},{}]' + len(arguments) * ' {}').format(module, port, command, sid, mid, *arguments)
@@ -263,8 +408,12 @@ class _XenaModifierBase(XenaObject):
 
 
 class XenaModifier(_XenaModifierBase):
+    """ Standard 16 bits modifier. """
 
     _info_config_commands = ['ps_modifier', 'ps_modifierrange']
+    count_command = 'ps_modifiercount'
+    default_values = OrderedDict((('position', 0), ('mask', '0xffff0000'), ('action', XenaModifierAction.increment),
+                                  ('repeat', 1), ('min_val', 0), ('step', 1), ('max_val', 0xffff)))
 
     def __init__(self, parent, index):
         """
@@ -275,8 +424,12 @@ class XenaModifier(_XenaModifierBase):
 
 
 class XenaXModifier(_XenaModifierBase):
+    """ Extended 32 bits modifier. """
 
     _info_config_commands = ['ps_modifierext', 'ps_modifierextrange']
+    count_command = 'ps_modifierextcount'
+    default_values = OrderedDict((('position', 0), ('mask', '0xffffffff'), ('action', XenaModifierAction.increment),
+                                  ('repeat', 1), ('min_val', 0), ('step', 1), ('max_val', 0xffffffff)))
 
     def __init__(self, parent, index):
         """
@@ -286,6 +439,9 @@ class XenaXModifier(_XenaModifierBase):
         super(self.__class__, self).__init__(objType='xmodifier', index=index, parent=parent)
 
 
+_modifier_types = {XenaModifierType.standard: (XenaModifier, 'modifier'),
+                   XenaModifierType.extended: (XenaXModifier, 'xmodifier')}
+
 pypacker_2_xena = {'ethernet': 'ethernet',
                    'arp': 'arp',
                    'ip': 'ip',